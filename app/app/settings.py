@@ -48,6 +48,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -93,6 +95,38 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'forest': {
+        'BACKEND': os.environ.get(
+            'FOREST_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('FOREST_CACHE_LOCATION', 'forest'),
+        'TIMEOUT': int(os.environ.get('FOREST_CACHE_TIMEOUT', 3600)),
+    },
+    # Token lookups are cached only in a backend shared by every process,
+    # such as memcached; a per process LocMemCache misses invalidations
+    # made by the others and is safe for a single process only
+    'auth': {
+        'BACKEND': os.environ.get(
+            'AUTH_CACHE_BACKEND',
+            'django.core.cache.backends.dummy.DummyCache'
+        ),
+        'LOCATION': os.environ.get('AUTH_CACHE_LOCATION', 'auth'),
+        'TIMEOUT': int(os.environ.get('AUTH_CACHE_TIMEOUT', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('AUTH_CACHE_MAX_ENTRIES', 10000))
+        }
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -133,3 +167,30 @@ STATIC_URL = '/static/'
 
 # Custom User model
 AUTH_USER_MODEL = 'core.User'
+
+# Keyset pagination of forest list endpoints
+FOREST_PAGE_SIZE = int(os.environ.get('FOREST_PAGE_SIZE', 100))
+FOREST_MAX_PAGE_SIZE = int(os.environ.get('FOREST_MAX_PAGE_SIZE', 1000))
+
+# Worker processes of growth projections
+PROJECTION_WORKERS = int(os.environ.get('PROJECTION_WORKERS',
+                                        os.cpu_count() or 1))
+
+# Background jobs: handlers by kind and worker retry, heartbeat and polling
+# timings
+JOB_HANDLERS = {
+    'projection': 'forest.projection.run_job',
+}
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+JOB_RETRY_DELAY = int(os.environ.get('JOB_RETRY_DELAY', 30))
+JOB_STALE_AFTER = int(os.environ.get('JOB_STALE_AFTER', 300))
+JOB_HEARTBEAT_INTERVAL = float(os.environ.get('JOB_HEARTBEAT_INTERVAL', 30))
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 1))
+
+# Server-Timing headers and slow request logging for API requests
+REQUEST_TIMING = os.environ.get('REQUEST_TIMING', '').lower() in \
+    ('1', 'true', 'yes')
+REQUEST_TIMING_SLOW_MS = int(os.environ.get('REQUEST_TIMING_SLOW_MS', 500))
+
+# Smallest forest response body compressed when the client accepts it
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
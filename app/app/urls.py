@@ -20,4 +20,5 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
     path('api/forest/', include('forest.urls')),
+    path('api/jobs/', include('core.urls')),
 ]
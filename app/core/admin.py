@@ -34,3 +34,8 @@ admin.site.register(models.Project)
 admin.site.register(models.Stand)
 admin.site.register(models.Plot)
 admin.site.register(models.SampleDesign)
+admin.site.register(models.PlotAggregate)
+admin.site.register(models.StandAggregate)
+admin.site.register(models.EquationSet)
+admin.site.register(models.SpeciesEquation)
+admin.site.register(models.Job)
@@ -0,0 +1,153 @@
+import math
+
+from collections import defaultdict
+
+from django.db import connection
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Sum
+
+from core.models import Plot, PlotAggregate, StandAggregate, Tree
+
+
+FIELDS = ('records', 'tree_count', 'dbh_sum', 'dbh_squared_sum')
+
+
+def empty_deltas():
+    """Return an empty mapping of aggregate key to field deltas"""
+    return defaultdict(lambda: [0] * len(FIELDS))
+
+
+def collect(rows, sign=1, deltas=None):
+    """Add (plot_id, symbol_id, count, dbh) rows to aggregate deltas"""
+    deltas = empty_deltas() if deltas is None else deltas
+    for plot_id, symbol_id, count, dbh in rows:
+        delta = deltas[(plot_id, symbol_id)]
+        delta[0] += sign
+        delta[1] += sign * count
+        delta[2] += sign * count * dbh
+        delta[3] += sign * count * dbh * dbh
+
+    return deltas
+
+
+def summarize(trees, sign=1, deltas=None):
+    """Add a tree queryset, grouped in the database, to aggregate deltas"""
+    deltas = empty_deltas() if deltas is None else deltas
+    rows = trees.order_by().values_list('plot_id', 'symbol_id').annotate(
+        records=Count('id'),
+        tree_count=Sum('count'),
+        dbh_sum=Sum(ExpressionWrapper(F('count') * F('dbh'),
+                                      output_field=FloatField())),
+        dbh_squared_sum=Sum(ExpressionWrapper(
+            F('count') * F('dbh') * F('dbh'), output_field=FloatField()))
+    )
+    for plot_id, symbol_id, *values in rows:
+        delta = deltas[(plot_id, symbol_id)]
+        for index, value in enumerate(values):
+            delta[index] += sign * value
+
+    return deltas
+
+
+def plot_stand_deltas(plots, sign=1, deltas=None):
+    """Add the stored aggregates of plots to stand aggregate deltas"""
+    deltas = empty_deltas() if deltas is None else deltas
+    rows = PlotAggregate.objects.filter(plot__in=plots).values_list(
+        'plot__stand_id', 'symbol_id', *FIELDS)
+    for stand_id, symbol_id, *values in rows:
+        delta = deltas[(stand_id, symbol_id)]
+        for index, value in enumerate(values):
+            delta[index] += sign * value
+
+    return deltas
+
+
+def apply_deltas(model, owner_field, deltas, batch_size=1000):
+    """Add deltas to the aggregate rows of a model, creating missing rows
+
+    Rows are upserted with INSERT ... ON CONFLICT so concurrent first
+    writes of the same owner and species add up instead of colliding.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    table = connection.ops.quote_name(model._meta.db_table)
+    owner = connection.ops.quote_name(
+        model._meta.get_field(owner_field).column)
+    columns = [owner, '"symbol_id"'] + [
+        connection.ops.quote_name(field) for field in FIELDS]
+    updates = ', '.join('%s = %s.%s + EXCLUDED.%s' % (
+        column, table, column, column) for column in columns[2:])
+    rows = [(owner_id, symbol_id, *delta)
+            for (owner_id, symbol_id), delta in deltas.items()]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            values = ', '.join(['(%s)' % ', '.join(['%s'] * len(columns))] *
+                               len(batch))
+            cursor.execute(
+                'INSERT INTO %s (%s) VALUES %s ON CONFLICT (%s, "symbol_id") '
+                'DO UPDATE SET %s' % (table, ', '.join(columns), values,
+                                      owner, updates),
+                [value for row in batch for value in row])
+
+    if any(delta[0] < 0 for delta in deltas.values()):
+        model.objects.filter(
+            **{owner_field + '__in': {owner_id for owner_id, _ in deltas}},
+            records__lte=0).delete()
+
+
+def apply_stand_deltas(deltas):
+    """Apply stand level aggregate deltas"""
+    apply_deltas(StandAggregate, 'stand_id', deltas)
+
+
+def apply(deltas):
+    """Apply plot level aggregate deltas to plots and their stands"""
+    deltas = {key: delta for key, delta in deltas.items() if any(delta)}
+    if not deltas:
+        return
+
+    stands = dict(Plot.objects.filter(
+        id__in={plot_id for plot_id, _ in deltas}
+    ).values_list('id', 'stand_id'))
+    stand_deltas = empty_deltas()
+    for (plot_id, symbol_id), delta in deltas.items():
+        stand_delta = stand_deltas[(stands[plot_id], symbol_id)]
+        for index, value in enumerate(delta):
+            stand_delta[index] += value
+
+    apply_deltas(PlotAggregate, 'plot_id', deltas)
+    apply_stand_deltas(stand_deltas)
+
+
+def expected_aggregates():
+    """Return plot and stand aggregates computed from the tree table"""
+    plot_values = summarize(Tree.objects.all())
+    stands = dict(Plot.objects.values_list('id', 'stand_id'))
+    stand_values = empty_deltas()
+    for (plot_id, symbol_id), values in plot_values.items():
+        stand_value = stand_values[(stands[plot_id], symbol_id)]
+        for index, value in enumerate(values):
+            stand_value[index] += value
+
+    return plot_values, stand_values
+
+
+def species_totals(queryset, measurement_system):
+    """Return per species totals of plot or stand aggregate rows"""
+    totals = []
+    for aggregate in queryset.select_related('symbol').order_by('symbol_id'):
+        trees = aggregate.tree_count
+        totals.append({
+            'symbol': aggregate.symbol_id,
+            'symbol_name': aggregate.symbol.symbol,
+            'records': aggregate.records,
+            'tree_count': trees,
+            'mean_dbh': aggregate.dbh_sum / trees if trees else 0,
+            'qmd': math.sqrt(aggregate.dbh_squared_sum / trees)
+            if trees else 0,
+            'basal_area': aggregate.basal_area(measurement_system)
+        })
+
+    return totals
@@ -1,5 +1,17 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, pre_delete
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from rest_framework.authtoken.models import Token
+
+        from core.authentication import token_deleted
+        from core.models import TreeReference, tree_reference_deleting
+
+        post_delete.connect(token_deleted, sender=Token,
+                            dispatch_uid='core.authentication.token_deleted')
+        pre_delete.connect(tree_reference_deleting, sender=TreeReference,
+                           dispatch_uid='core.models.tree_reference_deleting')
@@ -0,0 +1,73 @@
+import hashlib
+
+from django.core.cache import caches
+from django.db import transaction
+
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.settings import api_settings
+
+
+CACHE_ALIAS = 'auth'
+
+
+def get_cache():
+    """Return the cache holding authenticated tokens"""
+    return caches[CACHE_ALIAS]
+
+
+def token_key(key):
+    """Return the cache key of a token, without the token itself"""
+    return 'auth:token:%s' % hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def forget(keys):
+    """Drop tokens from the cache now and again once the change commits
+
+    A request reading the token before the commit may cache the old user
+    meanwhile; the second delete removes that entry.
+    """
+    keys = [token_key(key) for key in keys]
+    get_cache().delete_many(keys)
+    transaction.on_commit(lambda: get_cache().delete_many(keys))
+
+
+def forget_token(key):
+    """Drop a token from the cache"""
+    forget([key])
+
+
+def forget_user(user):
+    """Drop the tokens of a user from the cache"""
+    forget(Token.objects.filter(user=user).values_list('key', flat=True))
+
+
+def token_deleted(sender, instance, **kwargs):
+    """Drop a deleted token from the cache"""
+    forget_token(instance.key)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that keeps token lookups in the auth cache
+
+    Entries expire after the cache timeout and are dropped when the token
+    is deleted or its user is saved, which covers deactivation and
+    password changes. Invalidation only reaches other processes through a
+    shared cache backend, so none is cached by default.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_cache()
+        token = cache.get(token_key(key))
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(token_key(key), token)
+        elif not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+
+        return token.user, token
+
+
+AUTHENTICATION_CLASSES = [CachedTokenAuthentication] + \
+    api_settings.DEFAULT_AUTHENTICATION_CLASSES
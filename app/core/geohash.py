@@ -0,0 +1,54 @@
+BITS = 26
+MAX_CELLS = 64
+
+
+def quantize(value, low, high, bits=BITS):
+    """Return the grid column of a coordinate at the given bit depth"""
+    scaled = int((value - low) / (high - low) * (1 << bits))
+    return min(max(scaled, 0), (1 << bits) - 1)
+
+
+def interleave(x, y, bits=BITS):
+    """Return the Z-order number of a grid column and row"""
+    code = 0
+    for bit in range(bits - 1, -1, -1):
+        code = (code << 2) | ((x >> bit) & 1) << 1 | ((y >> bit) & 1)
+
+    return code
+
+
+def encode(latitude, longitude):
+    """Return the cell of a point
+
+    Cells interleave longitude and latitude bits like a geohash, so the
+    cells sharing leading bits form a rectangle.
+    """
+    return interleave(quantize(longitude, -180, 180),
+                      quantize(latitude, -90, 90))
+
+
+def cover(south, west, north, east, max_cells=MAX_CELLS):
+    """Return half-open cell ranges covering a bounding box
+
+    Uses the finest grid on which the box spans at most max_cells cells
+    and merges neighbouring cells into ranges. The box must not cross the
+    antimeridian.
+    """
+    x0, x1 = quantize(west, -180, 180), quantize(east, -180, 180)
+    y0, y1 = quantize(south, -90, 90), quantize(north, -90, 90)
+    for level in range(BITS, -1, -1):
+        shift = BITS - level
+        columns = range(x0 >> shift, (x1 >> shift) + 1)
+        rows = range(y0 >> shift, (y1 >> shift) + 1)
+        if len(columns) * len(rows) <= max_cells:
+            break
+
+    codes = sorted(interleave(x, y, level) for x in columns for y in rows)
+    ranges = []
+    for code in codes:
+        if ranges and ranges[-1][1] == code:
+            ranges[-1][1] = code + 1
+        else:
+            ranges.append([code, code + 1])
+
+    return [(low << 2 * shift, high << 2 * shift) for low, high in ranges]
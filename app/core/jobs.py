@@ -0,0 +1,179 @@
+import logging
+import os
+import socket
+import threading
+import time
+
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, \
+    transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+
+def worker_name():
+    """Return the name of this worker process"""
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+
+def enqueue(kind, payload=None, max_attempts=None, user=None):
+    """Queue a job, visible to workers once the transaction commits
+
+    Only the user queueing the job may follow it.
+    """
+    if kind not in settings.JOB_HANDLERS:
+        raise ValueError('Unknown job kind %r' % kind)
+
+    return Job.objects.create(
+        kind=kind, payload=payload or {}, user=user,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS)
+
+
+def describe(error):
+    """Return a short description of an exception safe to show clients"""
+    message = str(error).splitlines()[0] if str(error) else ''
+    name = type(error).__name__
+    return ('%s: %s' % (name, message))[:255] if message else name
+
+
+def claim(worker):
+    """Lock and return the next runnable job, or None when idle
+
+    Queued jobs due to run are taken oldest first. Running jobs whose
+    worker stopped reporting are taken over, or failed once they used up
+    their attempts. Rows locked by other workers are skipped.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOB_STALE_AFTER)
+    runnable = Q(status=Job.QUEUED, run_after__lte=now) | \
+        Q(status=Job.RUNNING, heartbeat__lt=stale)
+    with transaction.atomic():
+        for job in Job.objects.select_for_update(skip_locked=True).filter(
+                runnable).order_by('run_after', 'id')[:10]:
+            if job.attempts >= job.max_attempts:
+                job.status = Job.FAILED
+                logger.warning('Job %s failed: worker %s stopped responding',
+                               job.pk, job.worker)
+                job.error = 'The worker stopped responding.'
+                job.finished = now
+                job.save(update_fields=['status', 'error', 'finished'])
+                continue
+
+            job.status = Job.RUNNING
+            job.attempts += 1
+            job.worker = worker
+            job.started = job.heartbeat = now
+            job.finished = None
+            job.save(update_fields=['status', 'attempts', 'worker',
+                                    'started', 'heartbeat', 'finished'])
+            return job
+
+    return None
+
+
+def owned(job):
+    """Return a queryset of the job while this attempt still holds it"""
+    return Job.objects.filter(pk=job.pk, status=Job.RUNNING,
+                              worker=job.worker, attempts=job.attempts)
+
+
+def report(job, progress, message=''):
+    """Record the progress of a running job, between 0 and 1"""
+    job.progress = min(max(progress, 0), 1)
+    job.message = message[:255]
+    owned(job).update(progress=job.progress, message=job.message,
+                      heartbeat=timezone.now())
+
+
+@contextmanager
+def heartbeat(job, interval=None):
+    """Refresh the heartbeat of a job from a thread while the block runs
+
+    Handlers that go quiet for longer than JOB_STALE_AFTER, such as one
+    long computation, would otherwise be taken over and run twice.
+    """
+    interval = settings.JOB_HEARTBEAT_INTERVAL if interval is None \
+        else interval
+    stopped = threading.Event()
+
+    def beat():
+        try:
+            while not stopped.wait(interval):
+                try:
+                    owned(job).update(heartbeat=timezone.now())
+                except DatabaseError:
+                    connection.close()
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def execute(job):
+    """Run a claimed job and record its result, retry or failure
+
+    The worker keeps the heartbeat of the job fresh while the handler
+    runs. Failed attempts are retried after an exponentially growing delay
+    until the job runs out of attempts. Returns True on success.
+    """
+    try:
+        handler = import_string(settings.JOB_HANDLERS[job.kind])
+        with heartbeat(job):
+            result = handler(job, **job.payload)
+    except Exception as error:
+        logger.exception('Job %s failed on attempt %d', job.pk, job.attempts)
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            owned(job).update(status=Job.QUEUED, error=describe(error),
+                              run_after=now + timedelta(seconds=delay))
+        else:
+            owned(job).update(status=Job.FAILED, error=describe(error),
+                              finished=now)
+        return False
+
+    owned(job).update(status=Job.DONE, progress=1, result=result,
+                      finished=timezone.now())
+    return True
+
+
+def work(worker=None, burst=False, interval=None, limit=None):
+    """Claim and run jobs until stopped and return the number run
+
+    A burst worker stops once no job is runnable; otherwise the queue is
+    polled every interval seconds. limit caps the jobs run.
+    """
+    worker = worker or worker_name()
+    interval = settings.JOB_POLL_INTERVAL if interval is None else interval
+    count = 0
+    while limit is None or count < limit:
+        # Drop broken or expired connections between jobs, unless the
+        # worker runs inside a caller's transaction
+        if not connection.in_atomic_block:
+            close_old_connections()
+        job = claim(worker)
+        if job is None:
+            if burst:
+                break
+            time.sleep(interval)
+            continue
+
+        execute(job)
+        count += 1
+
+    return count
@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.synthetic import BATCH_SIZE, generate
+
+
+class Command(BaseCommand):
+    """Django command to generate synthetic forest inventory data"""
+    help = 'Create projects, stands, plots and trees with realistic values'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=1)
+        parser.add_argument('--stands', type=int, default=10,
+                            help='Stands per project')
+        parser.add_argument('--plots', type=int, default=10,
+                            help='Plots per stand')
+        parser.add_argument('--trees', type=int, default=20,
+                            help='Trees per plot')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        counts = generate(options['projects'], options['stands'],
+                          options['plots'], options['trees'],
+                          seed=options['seed'],
+                          batch_size=options['batch_size'])
+        counts['seconds'] = round(time.perf_counter() - start, 3)
+        self.stdout.write(self.style.SUCCESS(
+            'Created %(projects)d projects, %(stands)d stands, '
+            '%(plots)d plots and %(trees)d trees in %(seconds)ss' % counts
+        ))
@@ -0,0 +1,64 @@
+import math
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core import aggregates
+from core.models import PlotAggregate, StandAggregate
+
+
+class Command(BaseCommand):
+    """Django command to rebuild plot and stand aggregates"""
+    help = 'Rebuild plot and stand tree aggregates from the tree table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report aggregates that drifted from the tree table'
+        )
+
+    def handle(self, *args, **options):
+        plot_values, stand_values = aggregates.expected_aggregates()
+        tables = (
+            (PlotAggregate, 'plot_id', plot_values),
+            (StandAggregate, 'stand_id', stand_values)
+        )
+
+        if options['check']:
+            drifted = 0
+            for model, owner_field, expected in tables:
+                count = self.count_drift(model, owner_field, expected)
+                self.stdout.write('%s: %d drifted rows' % (
+                    model.__name__, count))
+                drifted += count
+            if drifted:
+                raise CommandError('Aggregates drifted from the tree table')
+            self.stdout.write(self.style.SUCCESS('Aggregates up to date'))
+            return
+
+        with transaction.atomic():
+            for model, owner_field, expected in tables:
+                model.objects.all().delete()
+                model.objects.bulk_create(
+                    model(**{owner_field: owner_id, 'symbol_id': symbol_id},
+                          **dict(zip(aggregates.FIELDS, values)))
+                    for (owner_id, symbol_id), values in expected.items()
+                )
+        self.stdout.write(self.style.SUCCESS('Aggregates rebuilt'))
+
+    def count_drift(self, model, owner_field, expected):
+        """Return the number of stored rows differing from expected"""
+        stored = {
+            (owner_id, symbol_id): values
+            for owner_id, symbol_id, *values in model.objects.values_list(
+                owner_field, 'symbol_id', *aggregates.FIELDS)
+        }
+        drifted = 0
+        for key in set(stored) | set(expected):
+            actual = stored.get(key, [0] * len(aggregates.FIELDS))
+            wanted = expected.get(key, [0] * len(aggregates.FIELDS))
+            if not all(math.isclose(a, w, rel_tol=1e-9, abs_tol=1e-6)
+                       for a, w in zip(actual, wanted)):
+                drifted += 1
+
+        return drifted
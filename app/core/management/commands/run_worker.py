@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    """Django command to run queued background jobs"""
+    help = 'Claim and run queued background jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no job is ready to run'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=None,
+            help='Seconds to wait between polls of an empty queue'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Exit after running this many jobs'
+        )
+
+    def handle(self, *args, **options):
+        worker = jobs.worker_name()
+        self.stdout.write('Worker %s started' % worker)
+        count = jobs.work(worker, burst=options['burst'],
+                          interval=options['interval'],
+                          limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS('%d jobs run' % count))
@@ -0,0 +1,236 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+import brotli
+
+from django.conf import settings
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence, compress_string
+
+
+logger = logging.getLogger(__name__)
+
+REPEATED_STATEMENTS = 5
+
+
+class QueryRecorder:
+    """Database execute wrapper counting and timing statements"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    def repeated(self, limit=REPEATED_STATEMENTS):
+        """Return the most executed statements run more than once"""
+        return [(sql, count)
+                for sql, count in self.statements.most_common(limit)
+                if count > 1]
+
+
+class RequestTiming:
+    """Timings of a single request split by where the time went
+
+    Serialization is the view time not spent in SQL, since querysets are
+    evaluated lazily while serializers walk them.
+    """
+
+    def __init__(self):
+        self.queries = QueryRecorder()
+        self.start = time.perf_counter()
+        self.namespace = None
+        self.view_start = None
+        self.render_start = None
+        self.serialize = 0.0
+        self.render = 0.0
+        self.total = 0.0
+
+    def mark(self):
+        """Return the current time and SQL time"""
+        return time.perf_counter(), self.queries.duration
+
+    def elapsed(self, since):
+        """Return the time since a mark that was not spent in SQL"""
+        now, sql = self.mark()
+        return (now - since[0]) - (sql - since[1])
+
+    def view_started(self):
+        self.view_start = self.mark()
+
+    def render_started(self):
+        self.render_start = self.mark()
+        if self.view_start is not None:
+            self.serialize = self.elapsed(self.view_start)
+
+    def render_finished(self, response):
+        self.render = self.elapsed(self.render_start)
+
+    def finish(self):
+        if self.view_start is not None and self.render_start is None:
+            self.serialize = self.elapsed(self.view_start)
+        self.total = time.perf_counter() - self.start
+
+    def header(self):
+        """Return the Server-Timing header value"""
+        metrics = [
+            ('db', self.queries.duration,
+             '%d queries' % self.queries.count),
+            ('serialize', self.serialize, None),
+            ('render', self.render, None),
+            ('total', self.total, None),
+        ]
+        return ', '.join(
+            '%s;dur=%.1f' % (name, duration * 1000) +
+            (';desc="%s"' % desc if desc else '')
+            for name, duration, desc in metrics
+        )
+
+
+class RequestTimingMiddleware:
+    """Report SQL, serialization and render time of API requests
+
+    Enabled by the REQUEST_TIMING setting. Requests slower than
+    REQUEST_TIMING_SLOW_MS are logged with their most repeated statements.
+    """
+    namespaces = ('forest', 'user')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.REQUEST_TIMING:
+            return self.get_response(request)
+
+        timing = request.timing = RequestTiming()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(
+                    timing.queries))
+            response = self.get_response(request)
+        timing.finish()
+
+        if timing.namespace in self.namespaces:
+            response['Server-Timing'] = timing.header()
+            if timing.total * 1000 >= settings.REQUEST_TIMING_SLOW_MS:
+                self.log_slow_request(request, timing)
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = getattr(request, 'timing', None)
+        if timing is not None:
+            timing.namespace = request.resolver_match.namespace
+            timing.view_started()
+
+    def process_template_response(self, request, response):
+        timing = getattr(request, 'timing', None)
+        if timing is not None:
+            timing.render_started()
+            response.add_post_render_callback(timing.render_finished)
+
+        return response
+
+    def log_slow_request(self, request, timing):
+        lines = [
+            'Slow request %s %s: %.1fms, %d queries in %.1fms' % (
+                request.method, request.get_full_path(), timing.total * 1000,
+                timing.queries.count, timing.queries.duration * 1000)
+        ]
+        for sql, count in timing.queries.repeated():
+            lines.append('  %dx %s' % (count, sql))
+        logger.warning('\n'.join(lines))
+
+
+def brotli_sequence(sequence):
+    """Yield a brotli stream of the chunks, flushing after each one"""
+    compressor = brotli.Compressor()
+    for chunk in sequence:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+ENCODINGS = {
+    'br': (brotli.compress, brotli_sequence),
+    'gzip': (compress_string, compress_sequence),
+}
+
+
+def accepted_encoding(header):
+    """Return the preferred supported encoding of an Accept-Encoding header"""
+    preferences = {}
+    for item in header.split(','):
+        name, *params = [part.strip() for part in item.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        preferences[name.lower()] = quality
+
+    choices = [
+        (preferences.get(name, preferences.get('*', 0.0)), -index, name)
+        for index, name in enumerate(ENCODINGS)
+    ]
+    quality, index, name = max(choices)
+    return name if quality > 0 else None
+
+
+class CompressionMiddleware:
+    """Compress forest responses with brotli or gzip
+
+    The encoding is negotiated from Accept-Encoding, preferring brotli on
+    equal quality. Bodies smaller than COMPRESSION_MIN_SIZE are sent as is;
+    streamed bodies are compressed chunk by chunk.
+    """
+    namespaces = ('forest',)
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        if match is None or match.namespace not in self.namespaces or \
+                response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = accepted_encoding(
+            request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        compress, compress_stream = ENCODINGS[encoding]
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content)
+        else:
+            if len(response.content) < settings.COMPRESSION_MIN_SIZE:
+                return response
+            compressed = compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        if response.has_header('ETag') and \
+                response['ETag'].startswith('"'):
+            response['ETag'] = 'W/' + response['ETag']
+        response['Content-Encoding'] = encoding
+        return response
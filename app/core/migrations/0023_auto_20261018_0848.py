@@ -0,0 +1,46 @@
+# Generated by Django 2.1.15 on 2026-10-18 08:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_auto_20200128_0133'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlotAggregate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('records', models.IntegerField(default=0)),
+                ('tree_count', models.IntegerField(default=0)),
+                ('dbh_sum', models.FloatField(default=0)),
+                ('dbh_squared_sum', models.FloatField(default=0)),
+                ('plot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aggregates', to='core.Plot')),
+                ('symbol', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.TreeReference')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StandAggregate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('records', models.IntegerField(default=0)),
+                ('tree_count', models.IntegerField(default=0)),
+                ('dbh_sum', models.FloatField(default=0)),
+                ('dbh_squared_sum', models.FloatField(default=0)),
+                ('stand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aggregates', to='core.Stand')),
+                ('symbol', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.TreeReference')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='standaggregate',
+            unique_together={('stand', 'symbol')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='plotaggregate',
+            unique_together={('plot', 'symbol')},
+        ),
+    ]
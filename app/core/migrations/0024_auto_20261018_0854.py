@@ -0,0 +1,23 @@
+# Generated by Django 2.1.15 on 2026-10-18 08:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_auto_20261018_0848'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='modified',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 2.1.15 on 2026-10-18 08:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_auto_20261018_0854'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='plot',
+            index=models.Index(fields=['stand', 'id'], name='plot_stand_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='plot',
+            index=models.Index(fields=['stand', 'number', 'id'], name='plot_stand_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['name'], name='project_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stand',
+            index=models.Index(fields=['project_id', 'id'], name='stand_project_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stand',
+            index=models.Index(fields=['project_id', 'identification', 'id'], name='stand_project_ident_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tree',
+            index=models.Index(fields=['plot', 'symbol', 'id'], name='tree_plot_symbol_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='treereference',
+            index=models.Index(fields=['scientific_name'], name='treeref_scientific_name_idx'),
+        ),
+    ]
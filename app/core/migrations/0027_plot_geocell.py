@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+from core import geohash
+
+
+def locate_plots(apps, schema_editor):
+    Plot = apps.get_model('core', 'Plot')
+    plots = Plot.objects.values_list('id', 'latitude', 'longitude')
+    for pk, latitude, longitude in plots.iterator():
+        Plot.objects.filter(pk=pk).update(
+            geocell=geohash.encode(latitude, longitude))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0026_auto_20261018_0919'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plot',
+            name='geocell',
+            field=models.BigIntegerField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(locate_plots, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='plot',
+            index=models.Index(fields=['geocell'], name='plot_geocell_idx'),
+        ),
+    ]
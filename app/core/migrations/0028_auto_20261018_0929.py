@@ -0,0 +1,46 @@
+# Generated by Django 2.1.15 on 2026-10-18 09:29
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_plot_geocell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquationSet',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('region', models.CharField(blank=True, max_length=255)),
+                ('measurement_system', models.CharField(choices=[('english', 'english'), ('metric', 'metric')], default='english', max_length=8)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SpeciesEquation',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cubic_a', models.FloatField()),
+                ('cubic_b', models.FloatField()),
+                ('board_a', models.FloatField()),
+                ('board_b', models.FloatField()),
+                ('biomass_b0', models.FloatField()),
+                ('biomass_b1', models.FloatField()),
+                ('equation_set', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='equations', to='core.EquationSet')),
+                ('species', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='equations', to='core.TreeReference')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='equation_set',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='projects', to='core.EquationSet'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='speciesequation',
+            unique_together={('equation_set', 'species')},
+        ),
+    ]
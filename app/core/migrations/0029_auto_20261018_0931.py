@@ -0,0 +1,48 @@
+# Generated by Django 2.1.15 on 2026-10-18 09:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_auto_20261018_0929'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Projection',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periods', models.PositiveIntegerField(default=10)),
+                ('period_length', models.PositiveIntegerField(default=5)),
+                ('status', models.CharField(choices=[('pending', 'pending'), ('running', 'running'), ('done', 'done'), ('failed', 'failed')], default='pending', max_length=8)),
+                ('error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('started', models.DateTimeField(blank=True, null=True)),
+                ('finished', models.DateTimeField(blank=True, null=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='projections', to='core.Project')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProjectionResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.PositiveIntegerField()),
+                ('year', models.PositiveIntegerField()),
+                ('trees_per_area', models.FloatField()),
+                ('basal_area', models.FloatField()),
+                ('qmd', models.FloatField()),
+                ('sdi', models.FloatField()),
+                ('mean_height', models.FloatField()),
+                ('mortality', models.FloatField()),
+                ('projection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='results', to='core.Projection')),
+                ('stand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='projection_results', to='core.Stand')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='projectionresult',
+            unique_together={('projection', 'stand', 'period')},
+        ),
+    ]
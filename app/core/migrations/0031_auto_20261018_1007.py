@@ -0,0 +1,107 @@
+# Generated by Django 2.1.15 on 2026-10-18 10:07
+
+from django.db import migrations, models
+
+
+# Rows are stamped with the id of the transaction writing them. A sync
+# cursor is the oldest transaction still running when it is taken, so
+# rows committed later always carry an id at or above it.
+STAMP_FUNCTION = """
+CREATE FUNCTION core_stamp_change_id() RETURNS trigger AS $$
+BEGIN
+    NEW.change_id := txid_current();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+# Version bumps of a project leave its own change id alone
+TRIGGERS = (
+    ('core_project', 'INSERT OR UPDATE OF name, land_owner, date, '
+                     'measurement_system, equation_set_id'),
+    ('core_sampledesign', 'INSERT OR UPDATE'),
+    ('core_stand', 'INSERT OR UPDATE'),
+    ('core_plot', 'INSERT OR UPDATE'),
+    ('core_tree', 'INSERT OR UPDATE'),
+    ('core_tombstone', 'INSERT'),
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_auto_20261018_0936'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='plot',
+            name='plot_stand_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='stand',
+            name='stand_project_updated_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tombstone',
+            name='tombstone_project_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tree',
+            name='tree_plot_updated_idx',
+        ),
+        migrations.AddField(
+            model_name='plot',
+            name='change_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='change_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='sampledesign',
+            name='change_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='stand',
+            name='change_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='change_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tree',
+            name='change_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='plot',
+            index=models.Index(fields=['stand', 'change_id'], name='plot_stand_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stand',
+            index=models.Index(fields=['project_id', 'change_id'], name='stand_project_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['project_id', 'change_id'], name='tombstone_project_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tree',
+            index=models.Index(fields=['plot', 'change_id'], name='tree_plot_change_idx'),
+        ),
+        migrations.RunSQL(
+            STAMP_FUNCTION,
+            'DROP FUNCTION core_stamp_change_id();'
+        ),
+        *(migrations.RunSQL(
+            'CREATE TRIGGER %s_change_id BEFORE %s ON %s FOR EACH ROW '
+            'EXECUTE PROCEDURE core_stamp_change_id();' % (table, events, table),
+            'DROP TRIGGER %s_change_id ON %s;' % (table, table)
+        ) for table, events in TRIGGERS),
+    ]
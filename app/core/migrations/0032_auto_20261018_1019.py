@@ -0,0 +1,33 @@
+# Generated by Django 2.1.15 on 2026-10-18 10:19
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_auto_20261018_1007'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='plot',
+            name='updated_at',
+        ),
+        migrations.RemoveField(
+            model_name='project',
+            name='updated_at',
+        ),
+        migrations.RemoveField(
+            model_name='sampledesign',
+            name='updated_at',
+        ),
+        migrations.RemoveField(
+            model_name='stand',
+            name='updated_at',
+        ),
+        migrations.RemoveField(
+            model_name='tree',
+            name='updated_at',
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.1.15 on 2026-10-18 10:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_auto_20261018_1019'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='project',
+            name='modified',
+        ),
+    ]
@@ -1,7 +1,16 @@
-from django.db import models
+import math
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.fields import JSONField
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
     PermissionsMixin
 
+from core import geohash
+
 
 class UserManager(BaseUserManager):
 
@@ -36,10 +45,34 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = 'email'
 
+    def save(self, *args, **kwargs):
+        """Save user and drop its cached tokens"""
+        from core.authentication import forget_user
+
+        super().save(*args, **kwargs)
+        forget_user(self)
+
+
+class ProjectQuerySet(models.QuerySet):
+
+    def touch(self):
+        """Bump the version of the projects after a change to their data"""
+        return self.update(version=models.F('version') + 1)
+
+    def delete(self):
+        """Delete projects, leaving tombstones for delta sync"""
+        with transaction.atomic(using=self.db):
+            Tombstone.record(self)
+            return super().delete()
+
 
 class Project(models.Model):
     ENG = 'english'
     MET = 'metric'
+    BASAL_AREA_CONSTANT = {
+        ENG: math.pi / 576,
+        MET: math.pi / 40000
+    }
     SYSTEM_CHOICES = [
         (ENG, 'english'),
         (MET, 'metric')
@@ -50,12 +83,75 @@ class Project(models.Model):
     date = models.DateTimeField(auto_now_add=True)
     measurement_system = models.CharField(max_length=8, choices=SYSTEM_CHOICES,
                                           default='metric')
+    version = models.PositiveIntegerField(default=1)
+    change_id = models.BigIntegerField(default=0, editable=False)
+    equation_set = models.ForeignKey('EquationSet', null=True, blank=True,
+                                     on_delete=models.SET_NULL,
+                                     related_name='projects')
+
+    objects = ProjectQuerySet.as_manager()
+    project_lookup = 'id'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['name'], name='project_name_idx')
+        ]
+
+    def save(self, *args, **kwargs):
+        """Save project, bumping its version when it already exists"""
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if not adding:
+            Project.objects.filter(pk=self.pk).touch()
+
+    def delete(self, *args, **kwargs):
+        """Delete project, leaving a tombstone for delta sync"""
+        with transaction.atomic():
+            Tombstone.record(Project.objects.filter(pk=self.pk))
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
 
-class SampleDesign(models.Model):
+class LoadedValuesMixin:
+    """Remember the values a model instance was loaded with"""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def loaded_value(self, attname):
+        """Return the value of a field as loaded from the database"""
+        return getattr(self, '_loaded_values', {}).get(attname)
+
+    def record_move(self, attname):
+        """Leave a tombstone before the object moves to another parent and
+        return whether it moves"""
+        loaded = self.loaded_value(attname)
+        if not self._state.adding and loaded is not None and \
+                loaded != getattr(self, attname):
+            Tombstone.record(type(self).objects.filter(pk=self.pk))
+            return True
+
+        return False
+
+    def record_delete(self):
+        """Leave a tombstone before the object is deleted"""
+        Tombstone.record(type(self).objects.filter(pk=self.pk))
+
+
+def record_descendants_move(*querysets):
+    """Leave tombstones for the descendants of a moving object and restamp
+    them, so the delta of their new project lists them again"""
+    for queryset in querysets:
+        Tombstone.record(queryset)
+        models.QuerySet.update(queryset, change_id=0)
+
+
+class SampleDesign(LoadedValuesMixin, models.Model):
     FRQ = 'FRQ'
     BAF = 'BAF'
     SAMPLE_TYPE_CHOICES = [
@@ -79,21 +175,139 @@ class SampleDesign(models.Model):
                            default=None)
     minv = models.FloatField()
     maxv = models.FloatField()
+    change_id = models.BigIntegerField(default=0, editable=False)
+
+    project_lookup = 'project'
+
+    def save(self, *args, **kwargs):
+        """Save sample design and bump the version of its project"""
+        with transaction.atomic():
+            self.record_move('project_id')
+            super().save(*args, **kwargs)
+            Project.objects.filter(id__in={
+                self.project_id, self.loaded_value('project_id')
+            }).touch()
+        self._loaded_values = {'project_id': self.project_id}
 
+    def delete(self, *args, **kwargs):
+        """Delete sample design and bump the version of its project"""
+        with transaction.atomic():
+            self.record_delete()
+            Project.objects.filter(pk=self.project_id).touch()
+            return super().delete(*args, **kwargs)
 
-class Stand(models.Model):
+
+class Stand(LoadedValuesMixin, models.Model):
     project_id = models.ForeignKey('Project', on_delete=models.CASCADE,
                                    related_name='stands')
     identification = models.IntegerField(unique=True)
     location = models.CharField(max_length=255)
     origin_year = models.IntegerField()
     size = models.FloatField()
+    change_id = models.BigIntegerField(default=0, editable=False)
+
+    project_lookup = 'project_id'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project_id', 'id'],
+                         name='stand_project_id_idx'),
+            models.Index(fields=['project_id', 'identification', 'id'],
+                         name='stand_project_ident_idx'),
+            models.Index(fields=['project_id', 'change_id'],
+                         name='stand_project_change_idx')
+        ]
+
+    def save(self, *args, **kwargs):
+        """Save stand and bump the version of its project"""
+        with transaction.atomic():
+            if self.record_move('project_id_id'):
+                record_descendants_move(
+                    Plot.objects.filter(stand=self.pk),
+                    Tree.objects.filter(plot__stand=self.pk))
+            super().save(*args, **kwargs)
+            Project.objects.filter(id__in={
+                self.project_id_id, self.loaded_value('project_id_id')
+            }).touch()
+        self._loaded_values = {'project_id_id': self.project_id_id}
+
+    def delete(self, *args, **kwargs):
+        """Delete stand and bump the version of its project"""
+        with transaction.atomic():
+            self.record_delete()
+            Project.objects.filter(pk=self.project_id_id).touch()
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return self.location + '::' + str(self.identification)
 
 
-class Plot(models.Model):
+class PlotQuerySet(models.QuerySet):
+    """Plot queryset keeping stand aggregates and cells in step with bulk
+    changes"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Create plots with the cells of their coordinates"""
+        objs = list(objs)
+        for plot in objs:
+            plot.geocell = geohash.encode(plot.latitude, plot.longitude)
+
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def locate(self):
+        """Recompute the cells of plots from their coordinates"""
+        cells = defaultdict(list)
+        for pk, latitude, longitude in self.values_list(
+                'id', 'latitude', 'longitude'):
+            cells[geohash.encode(latitude, longitude)].append(pk)
+        for cell, ids in cells.items():
+            models.QuerySet.update(self.model.objects.filter(id__in=ids),
+                                   geocell=cell)
+
+    def update(self, **kwargs):
+        """Update plots, moving their aggregates when the stand changes"""
+        from core import aggregates
+
+        if 'geocell' not in kwargs and \
+                ('latitude' in kwargs or 'longitude' in kwargs):
+            with transaction.atomic(using=self.db):
+                plots = self.model.objects.filter(
+                    id__in=list(self.values_list('id', flat=True)))
+                rows = plots.update(geocell=0, **kwargs)
+                plots.locate()
+                return rows
+
+        with transaction.atomic(using=self.db):
+            Project.objects.filter(stands__plots__in=self).touch()
+            stand = kwargs.get('stand', kwargs.get('stand_id'))
+            if stand is None:
+                return super().update(**kwargs)
+
+            plots = self.model.objects.filter(
+                id__in=list(self.values_list('id', flat=True)))
+            Tombstone.record(plots)
+            record_descendants_move(Tree.objects.filter(plot__in=plots))
+            deltas = aggregates.plot_stand_deltas(plots, sign=-1)
+            rows = super().update(**kwargs)
+            aggregates.plot_stand_deltas(plots, deltas=deltas)
+            aggregates.apply_stand_deltas(deltas)
+            Project.objects.filter(stands__plots__in=plots).touch()
+
+        return rows
+
+    def delete(self):
+        """Delete plots, removing their trees from stand aggregates"""
+        from core import aggregates
+
+        with transaction.atomic(using=self.db):
+            Tombstone.record(self)
+            Project.objects.filter(stands__plots__in=self).touch()
+            aggregates.apply_stand_deltas(
+                aggregates.plot_stand_deltas(self, sign=-1))
+            return super().delete()
+
+
+class Plot(LoadedValuesMixin, models.Model):
     stand = models.ForeignKey('Stand', on_delete=models.CASCADE,
                               related_name='plots')
     number = models.IntegerField(unique=True)
@@ -101,6 +315,54 @@ class Plot(models.Model):
     longitude = models.FloatField()
     slope = models.FloatField()
     aspect = models.CharField(max_length=255)
+    geocell = models.BigIntegerField(editable=False)
+    change_id = models.BigIntegerField(default=0, editable=False)
+
+    objects = PlotQuerySet.as_manager()
+    project_lookup = 'stand__project_id'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['stand', 'id'], name='plot_stand_id_idx'),
+            models.Index(fields=['stand', 'number', 'id'],
+                         name='plot_stand_number_idx'),
+            models.Index(fields=['stand', 'change_id'],
+                         name='plot_stand_change_idx'),
+            models.Index(fields=['geocell'], name='plot_geocell_idx')
+        ]
+
+    def save(self, *args, **kwargs):
+        """Save plot, moving its aggregates when the stand changes"""
+        from core import aggregates
+
+        stand_id = self.loaded_value('stand_id')
+        self.geocell = geohash.encode(self.latitude, self.longitude)
+        with transaction.atomic():
+            if self._state.adding or stand_id == self.stand_id:
+                super().save(*args, **kwargs)
+            else:
+                self.record_delete()
+                record_descendants_move(Tree.objects.filter(plot=self.pk))
+                plots = Plot.objects.filter(pk=self.pk)
+                deltas = aggregates.plot_stand_deltas(plots, sign=-1)
+                super().save(*args, **kwargs)
+                aggregates.plot_stand_deltas(plots, deltas=deltas)
+                aggregates.apply_stand_deltas(deltas)
+            Project.objects.filter(
+                stands__in={self.stand_id, stand_id}).touch()
+
+        self._loaded_values = {'stand_id': self.stand_id}
+
+    def delete(self, *args, **kwargs):
+        """Delete plot, removing its trees from stand aggregates"""
+        from core import aggregates
+
+        with transaction.atomic():
+            self.record_delete()
+            Project.objects.filter(stands=self.stand_id).touch()
+            aggregates.apply_stand_deltas(aggregates.plot_stand_deltas(
+                Plot.objects.filter(pk=self.pk), sign=-1))
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return str(self.stand) + '::' + str(self.number)
@@ -113,11 +375,143 @@ class TreeReference(models.Model):
     family = models.CharField(max_length=255)
     max_density_index = models.IntegerField(default=None)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['scientific_name'],
+                         name='treeref_scientific_name_idx')
+        ]
+
     def __str__(self):
         return self.scientific_name + '::' + self.common_name
 
 
-class Tree(models.Model):
+def tree_reference_deleting(sender, instance, **kwargs):
+    """Record the trees cascading from a deleted species as gone"""
+    trees = Tree.objects.filter(symbol=instance)
+    Tombstone.record(trees)
+    Project.objects.filter(stands__plots__trees__in=trees).touch()
+
+
+class EquationSet(models.Model):
+    """Regional set of per species volume and biomass equations
+
+    Coefficients are in the units of the set's measurement system.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    region = models.CharField(max_length=255, blank=True)
+    measurement_system = models.CharField(max_length=8,
+                                          choices=Project.SYSTEM_CHOICES,
+                                          default=Project.ENG)
+
+    def save(self, *args, **kwargs):
+        """Save equation set and bump the version of projects using it"""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Project.objects.filter(equation_set=self).touch()
+
+    def delete(self, *args, **kwargs):
+        """Delete equation set and bump the version of projects using it"""
+        with transaction.atomic():
+            Project.objects.filter(equation_set=self).touch()
+            return super().delete(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+
+class SpeciesEquation(models.Model):
+    """Volume and biomass coefficients of a species in an equation set
+
+    Cubic and board foot volumes are a + b * dbh^2 * height; biomass is
+    exp(b0 + b1 * ln(dbh)).
+    """
+    equation_set = models.ForeignKey(EquationSet, on_delete=models.CASCADE,
+                                     related_name='equations')
+    species = models.ForeignKey(TreeReference, on_delete=models.CASCADE,
+                                related_name='equations')
+    cubic_a = models.FloatField()
+    cubic_b = models.FloatField()
+    board_a = models.FloatField()
+    board_b = models.FloatField()
+    biomass_b0 = models.FloatField()
+    biomass_b1 = models.FloatField()
+
+    class Meta:
+        unique_together = ('equation_set', 'species')
+
+    def save(self, *args, **kwargs):
+        """Save equation and bump the version of projects using its set"""
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Project.objects.filter(equation_set=self.equation_set_id).touch()
+
+    def delete(self, *args, **kwargs):
+        """Delete equation and bump the version of projects using its set"""
+        with transaction.atomic():
+            Project.objects.filter(equation_set=self.equation_set_id).touch()
+            return super().delete(*args, **kwargs)
+
+    def __str__(self):
+        return '%s::%s' % (self.equation_set_id, self.species_id)
+
+
+class TreeQuerySet(models.QuerySet):
+    """Tree queryset keeping plot and stand aggregates in step"""
+    AGGREGATE_FIELDS = {'plot', 'plot_id', 'symbol', 'symbol_id', 'count',
+                        'dbh'}
+
+    def bulk_create(self, objs, *args, **kwargs):
+        """Create trees and add them to the aggregates"""
+        from core import aggregates
+
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            aggregates.apply(aggregates.collect(
+                tree.aggregate_values() for tree in objs))
+            Project.objects.filter(
+                stands__plots__in={tree.plot_id for tree in objs}).touch()
+
+        return objs
+
+    def update(self, **kwargs):
+        """Update trees, adjusting aggregates by the changed values"""
+        from core import aggregates
+
+        with transaction.atomic(using=self.db):
+            Project.objects.filter(stands__plots__trees__in=self).touch()
+            if not self.AGGREGATE_FIELDS.intersection(kwargs):
+                return super().update(**kwargs)
+
+            plot = kwargs.get('plot', kwargs.get('plot_id'))
+            if plot is not None:
+                Tombstone.record(self)
+
+            trees = self.model.objects.filter(
+                id__in=list(self.values_list('id', flat=True)))
+            deltas = aggregates.summarize(trees, sign=-1)
+            rows = super().update(**kwargs)
+            aggregates.summarize(trees, deltas=deltas)
+            aggregates.apply(deltas)
+            if plot is not None:
+                Project.objects.filter(stands__plots__trees__in=trees).touch()
+
+        return rows
+
+    def delete(self):
+        """Delete trees and remove them from the aggregates"""
+        from core import aggregates
+
+        with transaction.atomic(using=self.db):
+            Tombstone.record(self)
+            Project.objects.filter(stands__plots__trees__in=self).touch()
+            deltas = aggregates.summarize(self, sign=-1)
+            result = super().delete()
+            aggregates.apply(deltas)
+
+        return result
+
+
+class Tree(LoadedValuesMixin, models.Model):
     plot = models.ForeignKey('Plot', on_delete=models.CASCADE,
                              related_name='trees')
     symbol = models.ForeignKey('TreeReference', on_delete=models.CASCADE)
@@ -125,6 +519,224 @@ class Tree(models.Model):
     dbh = models.FloatField()
     height = models.FloatField()
     live_crown_ratio = models.IntegerField()
+    change_id = models.BigIntegerField(default=0, editable=False)
+
+    objects = TreeQuerySet.as_manager()
+    project_lookup = 'plot__stand__project_id'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['plot', 'symbol', 'id'],
+                         name='tree_plot_symbol_id_idx'),
+            models.Index(fields=['plot', 'change_id'],
+                         name='tree_plot_change_idx')
+        ]
+
+    def aggregate_values(self):
+        """Return the values of the tree that feed the aggregates"""
+        return self.plot_id, self.symbol_id, self.count, self.dbh
+
+    def stored_aggregate_values(self):
+        """Return the aggregate values of the tree as stored"""
+        loaded = getattr(self, '_loaded_values', {})
+        try:
+            return (loaded['plot_id'], loaded['symbol_id'], loaded['count'],
+                    loaded['dbh'])
+        except KeyError:
+            return Tree.objects.filter(pk=self.pk).values_list(
+                'plot_id', 'symbol_id', 'count', 'dbh').first()
+
+    def save(self, *args, **kwargs):
+        """Save tree and adjust the aggregates by the change"""
+        from core import aggregates
+
+        with transaction.atomic():
+            stored = None
+            if not self._state.adding:
+                stored = self.stored_aggregate_values()
+                if stored and stored[0] != self.plot_id:
+                    self.record_delete()
+            super().save(*args, **kwargs)
+            deltas = aggregates.collect([self.aggregate_values()])
+            if stored:
+                aggregates.collect([stored], sign=-1, deltas=deltas)
+            aggregates.apply(deltas)
+            Project.objects.filter(stands__plots__in={
+                self.plot_id, stored[0] if stored else None
+            }).touch()
+
+        self._loaded_values = dict(zip(
+            ('plot_id', 'symbol_id', 'count', 'dbh'),
+            self.aggregate_values()
+        ))
+
+    def delete(self, *args, **kwargs):
+        """Delete tree and remove it from the aggregates"""
+        from core import aggregates
+
+        with transaction.atomic():
+            stored = self.stored_aggregate_values()
+            self.record_delete()
+            Project.objects.filter(stands__plots=self.plot_id).touch()
+            result = super().delete(*args, **kwargs)
+            if stored:
+                aggregates.apply(aggregates.collect([stored], sign=-1))
+
+        return result
 
     def __str__(self):
         return str(self.plot) + '::' + str(self.symbol)
+
+
+class TreeAggregate(models.Model):
+    """Running totals of the trees of one species"""
+    symbol = models.ForeignKey('TreeReference', on_delete=models.CASCADE)
+    records = models.IntegerField(default=0)
+    tree_count = models.IntegerField(default=0)
+    dbh_sum = models.FloatField(default=0)
+    dbh_squared_sum = models.FloatField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def basal_area(self, measurement_system):
+        """Return the summed basal area of the trees"""
+        constant = Project.BASAL_AREA_CONSTANT[measurement_system]
+        return constant * self.dbh_squared_sum
+
+
+class PlotAggregate(TreeAggregate):
+    plot = models.ForeignKey('Plot', on_delete=models.CASCADE,
+                             related_name='aggregates')
+
+    class Meta:
+        unique_together = ('plot', 'symbol')
+
+
+class StandAggregate(TreeAggregate):
+    stand = models.ForeignKey('Stand', on_delete=models.CASCADE,
+                              related_name='aggregates')
+
+    class Meta:
+        unique_together = ('stand', 'symbol')
+
+
+class Tombstone(models.Model):
+    """Record of an object leaving a project, kept for delta sync"""
+    project_id = models.IntegerField()
+    model = models.CharField(max_length=32)
+    object_id = models.IntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    change_id = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project_id', 'change_id'],
+                         name='tombstone_project_change_idx')
+        ]
+
+    @classmethod
+    def record(cls, queryset):
+        """Record the objects of a queryset as gone from their projects"""
+        model = queryset.model
+        deleted_at = timezone.now()
+        cls.objects.bulk_create([
+            cls(project_id=project_id, model=model._meta.model_name,
+                object_id=object_id, deleted_at=deleted_at)
+            for object_id, project_id in queryset.values_list(
+                'pk', model.project_lookup)
+        ])
+
+    def __str__(self):
+        return '%s::%s' % (self.model, self.object_id)
+
+
+class Job(models.Model):
+    """Unit of background work claimed and run by a worker process"""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'queued'),
+        (RUNNING, 'running'),
+        (DONE, 'done'),
+        (FAILED, 'failed')
+    ]
+
+    kind = models.CharField(max_length=64)
+    payload = JSONField(default=dict)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True,
+                             on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES,
+                              default=QUEUED)
+    progress = models.FloatField(default=0)
+    message = models.CharField(max_length=255, blank=True)
+    result = JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=255, blank=True)
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'],
+                         name='job_queue_idx')
+        ]
+
+    def __str__(self):
+        return '%s::%s' % (self.kind, self.id)
+
+
+class Projection(models.Model):
+    """Growth projection run over the stands of a project"""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'pending'),
+        (RUNNING, 'running'),
+        (DONE, 'done'),
+        (FAILED, 'failed')
+    ]
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE,
+                                related_name='projections')
+    periods = models.PositiveIntegerField(default=10)
+    period_length = models.PositiveIntegerField(default=5)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES,
+                              default=PENDING)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    started = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    job = models.ForeignKey(Job, on_delete=models.SET_NULL, null=True,
+                            blank=True, related_name='projections')
+
+    def __str__(self):
+        return '%s::%s' % (self.project_id, self.id)
+
+
+class ProjectionResult(models.Model):
+    """Projected per area statistics of a stand at the end of a period"""
+    projection = models.ForeignKey(Projection, on_delete=models.CASCADE,
+                                   related_name='results')
+    stand = models.ForeignKey(Stand, on_delete=models.CASCADE,
+                              related_name='projection_results')
+    period = models.PositiveIntegerField()
+    year = models.PositiveIntegerField()
+    trees_per_area = models.FloatField()
+    basal_area = models.FloatField()
+    qmd = models.FloatField()
+    sdi = models.FloatField()
+    mean_height = models.FloatField()
+    mortality = models.FloatField()
+
+    class Meta:
+        unique_together = ('projection', 'stand', 'period')
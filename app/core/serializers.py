@@ -0,0 +1,14 @@
+from rest_framework import serializers
+
+from core.models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Serializer for the status and progress of background jobs"""
+
+    class Meta:
+        model = Job
+        fields = ('id', 'kind', 'status', 'progress', 'message', 'result',
+                  'error', 'attempts', 'max_attempts', 'run_after',
+                  'created', 'started', 'finished')
+        read_only_fields = fields
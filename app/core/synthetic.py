@@ -0,0 +1,167 @@
+import math
+import random
+
+from django.db import transaction
+from django.db.models import Max
+
+from core.models import Project, SampleDesign, Stand, Plot, Tree, \
+    TreeReference
+
+
+BATCH_SIZE = 5000
+
+# Pacific Northwest species with USDA PLANTS symbols and maximum stand
+# density index (trees per acre at a 10 inch quadratic mean diameter)
+SPECIES = [
+    ('PSME', 'Pseudotsuga menziesii', 'Douglas-fir', 'Pinaceae', 595),
+    ('TSHE', 'Tsuga heterophylla', 'western hemlock', 'Pinaceae', 800),
+    ('THPL', 'Thuja plicata', 'western redcedar', 'Cupressaceae', 850),
+    ('PIPO', 'Pinus ponderosa', 'ponderosa pine', 'Pinaceae', 450),
+    ('ABGR', 'Abies grandis', 'grand fir', 'Pinaceae', 800),
+    ('PICO', 'Pinus contorta', 'lodgepole pine', 'Pinaceae', 700),
+    ('PISI', 'Picea sitchensis', 'Sitka spruce', 'Pinaceae', 900),
+    ('LAOC', 'Larix occidentalis', 'western larch', 'Pinaceae', 500),
+    ('ALRU2', 'Alnus rubra', 'red alder', 'Betulaceae', 450),
+    ('ACMA3', 'Acer macrophyllum', 'bigleaf maple', 'Sapindaceae', 400),
+    ('QUGA4', 'Quercus garryana', 'Oregon white oak', 'Fagaceae', 360),
+]
+
+# Median diameter (inches) and Chapman-Richards height parameters (feet)
+GROWTH = {
+    'PSME': (14.0, 190.0, 0.035, 1.3),
+    'TSHE': (12.0, 160.0, 0.040, 1.3),
+    'THPL': (15.0, 150.0, 0.030, 1.2),
+    'PIPO': (16.0, 150.0, 0.030, 1.2),
+    'ABGR': (12.0, 160.0, 0.035, 1.3),
+    'PICO': (8.0, 100.0, 0.060, 1.2),
+    'PISI': (18.0, 200.0, 0.030, 1.3),
+    'LAOC': (13.0, 170.0, 0.035, 1.3),
+    'ALRU2': (10.0, 110.0, 0.070, 1.1),
+    'ACMA3': (12.0, 90.0, 0.060, 1.1),
+    'QUGA4': (11.0, 70.0, 0.060, 1.0),
+}
+
+# Fixed plot for small trees and variable radius plot above the break
+DESIGNS = {
+    Project.ENG: [
+        (SampleDesign.FRQ, 20, SampleDesign.DBH, 0.0, 4.9),
+        (SampleDesign.BAF, 20, SampleDesign.DBH, 5.0, 999.0),
+    ],
+    Project.MET: [
+        (SampleDesign.FRQ, 50, SampleDesign.DBH, 0.0, 12.6),
+        (SampleDesign.BAF, 4, SampleDesign.DBH, 12.7, 999.0),
+    ]
+}
+
+ASPECTS = ['N', 'NE', 'E', 'SE', 'S', 'SW', 'W', 'NW']
+INCHES_PER_CM = 2.54
+FEET_PER_METER = 3.28084
+
+
+def species_references():
+    """Return tree references for the generated species, creating them"""
+    references = []
+    for symbol, scientific_name, common_name, family, sdi in SPECIES:
+        reference = TreeReference.objects.filter(symbol=symbol).first()
+        if reference is None:
+            reference = TreeReference.objects.create(
+                symbol=symbol, scientific_name=scientific_name,
+                common_name=common_name, family=family,
+                max_density_index=sdi)
+        references.append(reference)
+
+    return references
+
+
+def tree_size(rng, symbol, measurement_system):
+    """Return a diameter and height drawn for a species"""
+    median, asymptote, rate, shape = GROWTH.get(symbol, GROWTH['PSME'])
+    dbh = max(1.0, rng.lognormvariate(math.log(median), 0.55))
+    height = 4.5 + asymptote * (1 - math.exp(-rate * dbh)) ** shape
+    height *= rng.gauss(1.0, 0.08)
+    if measurement_system == Project.MET:
+        return round(dbh * INCHES_PER_CM, 1), \
+            round(max(1.4, height / FEET_PER_METER), 1)
+
+    return round(dbh, 1), round(max(4.5, height), 1)
+
+
+def next_value(model, field):
+    """Return one more than the largest value of a unique field"""
+    return (model.objects.aggregate(value=Max(field))['value'] or 0) + 1
+
+
+def generate(projects, stands, plots, trees, seed=0, batch_size=BATCH_SIZE):
+    """Create projects with stands per project, plots per stand and trees
+    per plot, returning the number of rows created per model"""
+    rng = random.Random(seed)
+    references = species_references()
+    systems = [Project.ENG, Project.MET]
+
+    with transaction.atomic():
+        project_rows = Project.objects.bulk_create([
+            Project(name='Synthetic project %d' % (index + 1),
+                    land_owner=rng.choice(['BLM', 'USFS', 'State', 'Private']),
+                    measurement_system=systems[index % 2])
+            for index in range(projects)
+        ])
+
+        SampleDesign.objects.bulk_create([
+            SampleDesign(project=project, sample_type=sample_type,
+                         factor=factor, var=var, minv=minv, maxv=maxv)
+            for project in project_rows
+            for sample_type, factor, var, minv, maxv in
+            DESIGNS[project.measurement_system]
+        ])
+
+        identification = next_value(Stand, 'identification')
+        stand_rows = []
+        for project in project_rows:
+            for index in range(stands):
+                stand_rows.append(Stand(
+                    project_id=project, identification=identification,
+                    location='Unit %d' % (index + 1),
+                    origin_year=rng.randint(1900, 2010),
+                    size=round(rng.uniform(5, 200), 1)))
+                identification += 1
+        stand_rows = Stand.objects.bulk_create(stand_rows)
+
+        number = next_value(Plot, 'number')
+        plot_rows = []
+        for stand in stand_rows:
+            latitude = rng.uniform(42.0, 46.0)
+            longitude = rng.uniform(-123.8, -117.0)
+            for index in range(plots):
+                plot_rows.append(Plot(
+                    stand=stand, number=number,
+                    latitude=round(latitude + rng.uniform(-0.01, 0.01), 6),
+                    longitude=round(longitude + rng.uniform(-0.01, 0.01), 6),
+                    slope=round(rng.uniform(0, 60), 1),
+                    aspect=rng.choice(ASPECTS)))
+                number += 1
+        plot_rows = Plot.objects.bulk_create(plot_rows)
+
+        created = 0
+        batch = []
+        for plot in plot_rows:
+            system = plot.stand.project_id.measurement_system
+            weights = [rng.random() ** 2 for reference in references]
+            for index in range(trees):
+                reference = rng.choices(references, weights)[0]
+                dbh, height = tree_size(rng, reference.symbol, system)
+                batch.append(Tree(
+                    plot=plot, symbol=reference, count=1, dbh=dbh,
+                    height=height,
+                    live_crown_ratio=rng.randint(20, 90)))
+                if len(batch) >= batch_size:
+                    created += len(Tree.objects.bulk_create(batch))
+                    batch = []
+        if batch:
+            created += len(Tree.objects.bulk_create(batch))
+
+    return {
+        'projects': len(project_rows),
+        'stands': len(stand_rows),
+        'plots': len(plot_rows),
+        'trees': created
+    }
@@ -0,0 +1,174 @@
+import threading
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections, transaction
+from django.test import TestCase, TransactionTestCase
+
+from core import aggregates
+from core.models import Tree, PlotAggregate, StandAggregate
+from core.tests.test_models import sample_project, sample_stand, \
+    sample_plot, sample_tree_reference
+
+
+def sample_tree(plot, symbol, **params):
+    """Create and return a sample tree"""
+    defaults = {
+        'plot': plot,
+        'symbol': symbol,
+        'count': 2,
+        'dbh': 10,
+        'height': 70,
+        'live_crown_ratio': 40
+    }
+    defaults.update(params)
+
+    return Tree.objects.create(**defaults)
+
+
+class AggregateTests(TestCase):
+
+    def setUp(self):
+        self.stand = sample_stand(sample_project())
+        self.plot = sample_plot(self.stand)
+        self.symbol = sample_tree_reference()
+
+    def plot_aggregate(self, plot=None):
+        return PlotAggregate.objects.get(plot=plot or self.plot,
+                                         symbol=self.symbol)
+
+    def stand_aggregate(self, stand=None):
+        return StandAggregate.objects.get(stand=stand or self.stand,
+                                          symbol=self.symbol)
+
+    def test_create_tree_updates_aggregates(self):
+        """Test creating trees adds them to plot and stand aggregates"""
+        sample_tree(self.plot, self.symbol, count=2, dbh=10)
+        sample_tree(self.plot, self.symbol, count=1, dbh=20)
+
+        aggregate = self.plot_aggregate()
+        self.assertEqual(aggregate.records, 2)
+        self.assertEqual(aggregate.tree_count, 3)
+        self.assertAlmostEqual(aggregate.dbh_sum, 40)
+        self.assertAlmostEqual(aggregate.dbh_squared_sum, 600)
+        self.assertAlmostEqual(aggregate.basal_area('english'),
+                               600 * 3.141592653589793 / 576)
+        self.assertEqual(self.stand_aggregate().tree_count, 3)
+
+    def test_update_tree_moves_aggregates(self):
+        """Test updating a tree adjusts the aggregates it belongs to"""
+        other_plot = sample_plot(self.stand)
+        tree = sample_tree(self.plot, self.symbol, count=2, dbh=10)
+        sample_tree(self.plot, self.symbol, count=1, dbh=20)
+
+        tree = Tree.objects.get(pk=tree.pk)
+        tree.plot = other_plot
+        tree.dbh = 12
+        tree.save()
+
+        self.assertEqual(self.plot_aggregate().tree_count, 1)
+        self.assertAlmostEqual(self.plot_aggregate(other_plot).dbh_sum, 24)
+        self.assertAlmostEqual(self.stand_aggregate().dbh_sum, 44)
+
+    def test_delete_tree_removes_aggregates(self):
+        """Test deleting the last tree removes the aggregate rows"""
+        tree = sample_tree(self.plot, self.symbol)
+
+        tree.delete()
+
+        self.assertFalse(PlotAggregate.objects.exists())
+        self.assertFalse(StandAggregate.objects.exists())
+
+    def test_bulk_paths_update_aggregates(self):
+        """Test bulk create, update and delete maintain aggregates"""
+        Tree.objects.bulk_create([
+            Tree(plot=self.plot, symbol=self.symbol, count=1, dbh=dbh,
+                 height=50, live_crown_ratio=30)
+            for dbh in (5, 10, 15, 20)
+        ])
+        self.assertEqual(self.stand_aggregate().records, 4)
+
+        Tree.objects.filter(dbh__lt=12).update(count=3)
+        self.assertEqual(self.plot_aggregate().tree_count, 8)
+        self.assertAlmostEqual(self.plot_aggregate().dbh_sum, 80)
+
+        Tree.objects.filter(dbh__gt=12).delete()
+        self.assertEqual(self.stand_aggregate().records, 2)
+        self.assertAlmostEqual(self.stand_aggregate().dbh_sum, 45)
+
+    def test_plot_changes_update_stand_aggregates(self):
+        """Test moving and deleting plots adjusts stand aggregates"""
+        other_stand = sample_stand(self.stand.project_id)
+        sample_tree(self.plot, self.symbol, count=2)
+
+        self.plot.stand = other_stand
+        self.plot.save()
+        self.assertFalse(StandAggregate.objects.filter(
+            stand=self.stand).exists())
+        self.assertEqual(self.stand_aggregate(other_stand).tree_count, 2)
+
+        self.plot.delete()
+        self.assertFalse(StandAggregate.objects.exists())
+
+    def test_rebuild_aggregates_command(self):
+        """Test the command detects and repairs drifted aggregates"""
+        sample_tree(self.plot, self.symbol, count=2)
+        PlotAggregate.objects.update(tree_count=99)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_aggregates', check=True, stdout=StringIO())
+
+        call_command('rebuild_aggregates', stdout=StringIO())
+
+        self.assertEqual(self.plot_aggregate().tree_count, 2)
+        call_command('rebuild_aggregates', check=True, stdout=StringIO())
+
+
+class ConcurrentAggregateTests(TransactionTestCase):
+    """Test concurrent writes to the same aggregate rows"""
+
+    def test_concurrent_first_writes(self):
+        """Test two transactions creating the same row both count"""
+        stand = sample_stand(sample_project())
+        plot = sample_plot(stand)
+        symbol = sample_tree_reference()
+        deltas = {(plot.id, symbol.id): [1, 2, 20, 200]}
+        applied, release, failures = threading.Event(), threading.Event(), []
+
+        def first():
+            try:
+                with transaction.atomic():
+                    aggregates.apply(dict(deltas))
+                    applied.set()
+                    release.wait(5)
+            except Exception as error:
+                failures.append(error)
+            finally:
+                applied.set()
+                connections.close_all()
+
+        def second():
+            try:
+                with transaction.atomic():
+                    aggregates.apply(dict(deltas))
+            except Exception as error:
+                failures.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=first),
+                   threading.Thread(target=second)]
+        threads[0].start()
+        applied.wait(5)
+        threads[1].start()
+        threads[1].join(0.5)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(failures, [])
+        aggregate = PlotAggregate.objects.get(plot=plot, symbol=symbol)
+        self.assertEqual((aggregate.records, aggregate.tree_count), (2, 4))
+        self.assertEqual(StandAggregate.objects.get(
+            stand=stand, symbol=symbol).records, 2)
@@ -0,0 +1,133 @@
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core import authentication
+from core.tests.test_models import sample_user
+
+
+ME_URL = reverse('user:me')
+PROJECTS_URL = reverse('forest:project-list')
+AUTH_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'auth': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+             'LOCATION': 'auth-test'},
+}
+
+
+def cached(key):
+    """Return the cached token of a key"""
+    return authentication.get_cache().get(authentication.token_key(key))
+
+
+@override_settings(CACHES=AUTH_CACHES)
+class CachedTokenAuthenticationTest(TestCase):
+    """Test token authentication backed by the auth cache"""
+
+    def setUp(self):
+        authentication.get_cache().clear()
+        self.user = sample_user()
+        self.token = Token.objects.create(user=self.user)
+        self.key = self.token.key
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.key)
+        self.backend = authentication.CachedTokenAuthentication()
+
+    def cached(self):
+        return cached(self.key)
+
+    def test_lookup_cached(self):
+        """Test the token is looked up once and then served from cache"""
+        with self.assertNumQueries(1):
+            self.backend.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, token = self.backend.authenticate_credentials(
+                self.token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_cache_key_hides_token(self):
+        """Test the cache key does not contain the token"""
+        self.assertNotIn(self.token.key,
+                         authentication.token_key(self.key))
+
+    def test_token_deleted(self):
+        """Test deleting a token drops it from the cache"""
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_200_OK)
+
+        self.token.delete()
+
+        self.assertIsNone(self.cached())
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_user_deactivated(self):
+        """Test deactivating a user rejects its cached token"""
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertIsNone(self.cached())
+        self.assertEqual(self.client.get(ME_URL).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_changed(self):
+        """Test changing the password drops the user's cached token"""
+        self.client.get(ME_URL)
+        self.assertIsNotNone(self.cached())
+
+        self.user.set_password('newpassword123')
+        self.user.save()
+
+        self.assertIsNone(self.cached())
+
+    def test_forest_endpoints(self):
+        """Test forest endpoints authenticate with cached tokens"""
+        res = self.client.get(PROJECTS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNotNone(self.cached())
+
+        self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+        res = self.client.get(PROJECTS_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class DefaultAuthCacheTest(TestCase):
+    """Test tokens are not cached without a shared cache backend"""
+
+    def test_lookups_not_cached(self):
+        """Test every lookup reads the token from the database"""
+        token = Token.objects.create(user=sample_user())
+        backend = authentication.CachedTokenAuthentication()
+
+        for attempt in range(2):
+            with self.assertNumQueries(1):
+                backend.authenticate_credentials(token.key)
+
+
+@override_settings(CACHES=AUTH_CACHES)
+class CommittedInvalidationTest(TransactionTestCase):
+    """Test cached tokens are dropped again once user changes commit"""
+
+    def test_recached_before_commit(self):
+        """Test a token cached by a concurrent request before the commit is
+        dropped once the save commits"""
+        authentication.get_cache().clear()
+        user = sample_user()
+        token = Token.objects.create(user=user)
+
+        with transaction.atomic():
+            user.is_active = False
+            user.save()
+            self.assertIsNone(cached(token.key))
+            authentication.get_cache().set(
+                authentication.token_key(token.key), token)
+
+        self.assertIsNone(cached(token.key))
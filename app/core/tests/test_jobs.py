@@ -0,0 +1,242 @@
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Job
+from core.tests.test_models import sample_user
+
+
+HANDLERS = {
+    'add': 'core.tests.test_jobs.add',
+    'flaky': 'core.tests.test_jobs.flaky',
+    'quiet': 'core.tests.test_jobs.quiet',
+}
+
+
+def job_detail_url(job_id):
+    """Return the URL polling a job"""
+    return reverse('core:job-detail', args=[job_id])
+
+
+def add(job, a, b):
+    """Test handler reporting progress and returning a sum"""
+    jobs.report(job, 0.5, 'Adding')
+    return {'sum': a + b}
+
+
+def quiet(job, seconds):
+    """Test handler running without reporting, then trying a takeover"""
+    time.sleep(seconds)
+    return {'taken': jobs.claim('w2') is not None}
+
+
+def flaky(job, failures):
+    """Test handler failing its first attempts"""
+    if job.attempts <= failures:
+        raise RuntimeError('attempt %d failed' % job.attempts)
+    return 'ok'
+
+
+@override_settings(JOB_HANDLERS=HANDLERS, JOB_RETRY_DELAY=10,
+                   JOB_STALE_AFTER=60)
+class JobQueueTest(TestCase):
+    """Test claiming, running and retrying background jobs"""
+
+    def test_enqueue_unknown_kind(self):
+        """Test jobs of kinds without a handler are rejected"""
+        with self.assertRaises(ValueError):
+            jobs.enqueue('missing')
+
+    def test_claim_order(self):
+        """Test due jobs are claimed oldest first and future ones wait"""
+        later = jobs.enqueue('add', {'a': 1, 'b': 2})
+        Job.objects.filter(pk=later.pk).update(
+            run_after=timezone.now() + timedelta(minutes=5))
+        first = jobs.enqueue('add', {'a': 1, 'b': 2})
+        second = jobs.enqueue('add', {'a': 1, 'b': 2})
+
+        self.assertEqual(jobs.claim('w1'), first)
+        claimed = jobs.claim('w2')
+        self.assertEqual(claimed, second)
+        self.assertIsNone(jobs.claim('w3'))
+
+        claimed.refresh_from_db()
+        self.assertEqual(claimed.status, Job.RUNNING)
+        self.assertEqual((claimed.worker, claimed.attempts), ('w2', 1))
+
+    def test_work_runs_jobs(self):
+        """Test a burst worker runs jobs and records results"""
+        job = jobs.enqueue('add', {'a': 2, 'b': 3})
+
+        self.assertEqual(jobs.work('w1', burst=True), 1)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.result, {'sum': 5})
+        self.assertEqual((job.progress, job.message), (1, 'Adding'))
+        self.assertIsNotNone(job.finished)
+
+    def test_retry_with_backoff(self):
+        """Test failed attempts are retried later until attempts run out"""
+        job = jobs.enqueue('flaky', {'failures': 5}, max_attempts=2)
+
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertFalse(jobs.execute(jobs.claim('w1')))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.error, 'RuntimeError: attempt 1 failed')
+        self.assertGreater(job.run_after,
+                           timezone.now() + timedelta(seconds=5))
+        self.assertIsNone(jobs.claim('w1'))
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('core.jobs', 'ERROR'):
+            self.assertFalse(jobs.execute(jobs.claim('w1')))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('attempt 2 failed', job.error)
+
+    def test_retry_succeeds(self):
+        """Test a job failing once succeeds on its next attempt"""
+        job = jobs.enqueue('flaky', {'failures': 1})
+        with self.assertLogs('core.jobs', 'ERROR'):
+            jobs.execute(jobs.claim('w1'))
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+
+        self.assertTrue(jobs.execute(jobs.claim('w1')))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.attempts),
+                         (Job.DONE, 'ok', 2))
+
+    def test_stale_job_taken_over(self):
+        """Test jobs of silent workers are reclaimed or failed"""
+        job = jobs.enqueue('add', {'a': 1, 'b': 1}, max_attempts=2)
+        stale = jobs.claim('w1')
+        Job.objects.filter(pk=job.pk).update(
+            heartbeat=timezone.now() - timedelta(minutes=5))
+
+        retaken = jobs.claim('w2')
+        self.assertEqual((retaken.worker, retaken.attempts), ('w2', 2))
+
+        jobs.report(stale, 0.9)
+        self.assertTrue(jobs.execute(retaken))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.RUNNING, heartbeat=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('core.jobs', 'WARNING'):
+            self.assertIsNone(jobs.claim('w3'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.error, 'The worker stopped responding.')
+
+    def test_run_worker_command(self):
+        """Test the worker command runs queued jobs"""
+        job = jobs.enqueue('add', {'a': 1, 'b': 1})
+        out = StringIO()
+
+        call_command('run_worker', '--burst', stdout=out)
+
+        self.assertIn('1 jobs run', out.getvalue())
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+
+    def test_error_hides_traceback(self):
+        """Test failures store a short message and log the traceback"""
+        job = jobs.enqueue('flaky', {'failures': 1})
+
+        with self.assertLogs('core.jobs', 'ERROR') as logs:
+            jobs.execute(jobs.claim('w1'))
+
+        job.refresh_from_db()
+        self.assertEqual(job.error, 'RuntimeError: attempt 1 failed')
+        self.assertIn('Traceback', logs.output[0])
+
+    def test_poll_job(self):
+        """Test reading the status of a job"""
+        user = sample_user()
+        job = jobs.enqueue('add', {'a': 1, 'b': 1}, user=user)
+        client = APIClient()
+        client.force_authenticate(user)
+
+        res = client.get(job_detail_url(job.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual((res.data['status'], res.data['progress']),
+                         (Job.QUEUED, 0))
+
+        jobs.work('w1', burst=True)
+        res = client.get(job_detail_url(job.id))
+        self.assertEqual((res.data['status'], res.data['result']),
+                         (Job.DONE, {'sum': 2}))
+
+        res = client.get(job_detail_url(job.id + 1))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_poll_job_of_other_user(self):
+        """Test jobs are hidden from other users and anonymous clients"""
+        job = jobs.enqueue('add', {'a': 1, 'b': 1}, user=sample_user())
+        client = APIClient()
+
+        res = client.get(job_detail_url(job.id))
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        client.force_authenticate(sample_user('other@testing.com'))
+        res = client.get(job_detail_url(job.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(JOB_HANDLERS=HANDLERS)
+class JobLockingTest(TransactionTestCase):
+    """Test concurrent workers skip jobs locked by each other"""
+
+    def test_locked_jobs_skipped(self):
+        """Test a job held by one worker is not claimed by another"""
+        if not connection.features.has_select_for_update_skip_locked:
+            self.skipTest('Requires SKIP LOCKED')
+        first = jobs.enqueue('add', {'a': 1, 'b': 1})
+        second = jobs.enqueue('add', {'a': 1, 'b': 1})
+        claimed = {}
+
+        def claim_while_locked():
+            try:
+                claimed['job'] = jobs.claim('w2')
+            finally:
+                connections.close_all()
+
+        with transaction.atomic():
+            Job.objects.select_for_update().get(pk=first.pk)
+            thread = threading.Thread(target=claim_while_locked)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(claimed['job'], second)
+
+
+@override_settings(JOB_HANDLERS=HANDLERS, JOB_STALE_AFTER=0.3,
+                   JOB_HEARTBEAT_INTERVAL=0.05)
+class JobHeartbeatTest(TransactionTestCase):
+    """Test workers keep the jobs they run fresh"""
+
+    def test_quiet_handler_not_taken_over(self):
+        """Test a handler that never reports keeps its job"""
+        job = jobs.enqueue('quiet', {'seconds': 0.8})
+
+        self.assertTrue(jobs.execute(jobs.claim('w1')))
+
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'taken': False})
+        self.assertEqual((job.status, job.attempts), (Job.DONE, 1))
+        self.assertGreater(job.heartbeat,
+                           job.started + timedelta(seconds=0.5))
@@ -0,0 +1,148 @@
+import gzip
+
+import brotli
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.middleware import QueryRecorder, accepted_encoding
+from core.tests.test_models import sample_project, sample_stand
+
+
+PROJECTS_URL = reverse('forest:project-list')
+
+
+@override_settings(REQUEST_TIMING=True, REQUEST_TIMING_SLOW_MS=60000)
+class RequestTimingMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        sample_stand(sample_project())
+
+    def metrics(self, header):
+        """Return Server-Timing metric names mapped to their parameters"""
+        metrics = {}
+        for metric in header.split(', '):
+            name, *params = metric.split(';')
+            metrics[name] = dict(param.split('=', 1) for param in params)
+        return metrics
+
+    def test_server_timing_header(self):
+        """Test API responses report SQL, serializer and render time"""
+        res = self.client.get(PROJECTS_URL)
+
+        metrics = self.metrics(res['Server-Timing'])
+        self.assertEqual(set(metrics),
+                         {'db', 'serialize', 'render', 'total'})
+        self.assertRegex(metrics['db']['desc'], r'"[1-9]\d* queries"')
+        for params in metrics.values():
+            self.assertGreaterEqual(float(params['dur']), 0)
+
+    def test_user_endpoints_timed(self):
+        """Test user endpoints are instrumented"""
+        res = self.client.post(reverse('user:token'), {})
+
+        self.assertIn('Server-Timing', res)
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_disabled(self):
+        """Test no header is sent unless enabled"""
+        res = self.client.get(PROJECTS_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+    def test_other_paths_not_timed(self):
+        """Test requests outside the API are not instrumented"""
+        res = self.client.get('/admin/login/')
+
+        self.assertNotIn('Server-Timing', res)
+
+    @override_settings(REQUEST_TIMING_SLOW_MS=0)
+    def test_slow_request_logged(self):
+        """Test slow requests are logged with their query counts"""
+        with self.assertLogs('core.middleware', level='WARNING') as logs:
+            self.client.get(PROJECTS_URL)
+
+        self.assertIn('Slow request GET %s' % PROJECTS_URL, logs.output[0])
+        self.assertIn('queries', logs.output[0])
+
+    def test_repeated_statements(self):
+        """Test statements executed more than once are reported"""
+        recorder = QueryRecorder()
+
+        def execute(sql, params, many, context):
+            return None
+
+        for sql in ['SELECT 1', 'SELECT 2', 'SELECT 2', 'SELECT 2',
+                    'SELECT 3', 'SELECT 3']:
+            recorder(execute, sql, (), False, {})
+
+        self.assertEqual(recorder.count, 6)
+        self.assertEqual(recorder.repeated(),
+                         [('SELECT 2', 3), ('SELECT 3', 2)])
+
+
+@override_settings(COMPRESSION_MIN_SIZE=200)
+class CompressionMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        for index in range(10):
+            sample_stand(sample_project())
+
+    def test_gzip(self):
+        """Test large responses are gzipped when accepted"""
+        plain = self.client.get(PROJECTS_URL)
+
+        res = self.client.get(PROJECTS_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), plain.content)
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_brotli_preferred(self):
+        """Test brotli is chosen when accepted as well as gzip"""
+        plain = self.client.get(PROJECTS_URL)
+
+        res = self.client.get(PROJECTS_URL,
+                              HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(res.content), plain.content)
+
+    def test_streaming_compressed(self):
+        """Test streamed responses are compressed chunk by chunk"""
+        url = reverse('forest:tree-list')
+        plain = self.client.get(url, HTTP_ACCEPT='application/stream+json')
+
+        res = self.client.get(url, HTTP_ACCEPT='application/stream+json',
+                              HTTP_ACCEPT_ENCODING='br')
+
+        self.assertEqual(res['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(b''.join(res.streaming_content)),
+                         b''.join(plain.streaming_content))
+
+    @override_settings(COMPRESSION_MIN_SIZE=10 ** 6)
+    def test_small_response_uncompressed(self):
+        """Test bodies under the minimum size are sent as is"""
+        res = self.client.get(PROJECTS_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertNotIn('Content-Encoding', res)
+
+    def test_user_endpoints_uncompressed(self):
+        """Test only forest responses are compressed"""
+        res = self.client.post(reverse('user:token'), {},
+                               HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertNotIn('Content-Encoding', res)
+
+    def test_accepted_encoding(self):
+        """Test Accept-Encoding negotiation honours quality values"""
+        self.assertEqual(accepted_encoding('gzip, br'), 'br')
+        self.assertEqual(accepted_encoding('gzip;q=1.0, br;q=0.5'), 'gzip')
+        self.assertEqual(accepted_encoding('br;q=0, gzip'), 'gzip')
+        self.assertEqual(accepted_encoding('*'), 'br')
+        self.assertIsNone(accepted_encoding('identity'))
+        self.assertIsNone(accepted_encoding(''))
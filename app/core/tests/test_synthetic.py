@@ -0,0 +1,62 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Project, SampleDesign, Stand, Plot, Tree, \
+    TreeReference, StandAggregate
+from core.synthetic import SPECIES, generate
+
+
+class SyntheticDataTests(TestCase):
+
+    def test_generate_counts(self):
+        """Test generating the requested number of rows per level"""
+        counts = generate(2, 3, 4, 5, batch_size=7)
+
+        self.assertEqual(counts, {'projects': 2, 'stands': 6, 'plots': 24,
+                                  'trees': 120})
+        self.assertEqual(Tree.objects.count(), 120)
+        self.assertEqual(Plot.objects.filter(trees__isnull=True).count(), 0)
+        self.assertEqual(TreeReference.objects.count(), len(SPECIES))
+
+    def test_generate_sample_designs(self):
+        """Test each project gets a fixed and a variable radius design"""
+        generate(2, 1, 1, 1)
+
+        for project in Project.objects.all():
+            types = sorted(project.sample_design.values_list(
+                'sample_type', flat=True))
+            self.assertEqual(types, [SampleDesign.BAF, SampleDesign.FRQ])
+
+    def test_generate_realistic_values(self):
+        """Test generated trees have plausible sizes"""
+        generate(1, 1, 5, 40, seed=3)
+
+        for tree in Tree.objects.all():
+            self.assertGreater(tree.dbh, 0)
+            self.assertGreater(tree.height, 1)
+            self.assertTrue(20 <= tree.live_crown_ratio <= 90)
+
+    def test_generate_twice(self):
+        """Test repeated runs keep identifications unique"""
+        generate(1, 2, 2, 1)
+        generate(1, 2, 2, 1)
+
+        self.assertEqual(Stand.objects.count(), 4)
+        self.assertEqual(TreeReference.objects.count(), len(SPECIES))
+
+    def test_generate_maintains_aggregates(self):
+        """Test bulk inserted trees are reflected in the aggregates"""
+        generate(1, 2, 2, 3)
+
+        call_command('rebuild_aggregates', check=True, stdout=StringIO())
+        self.assertTrue(StandAggregate.objects.exists())
+
+    def test_generate_forest_command(self):
+        """Test the command reports the created rows"""
+        out = StringIO()
+        call_command('generate_forest', projects=1, stands=1, plots=2,
+                     trees=3, stdout=out)
+
+        self.assertIn('6 trees', out.getvalue())
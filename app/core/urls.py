@@ -0,0 +1,10 @@
+from django.urls import path
+
+from core import views
+
+
+app_name = 'core'
+
+urlpatterns = [
+    path('<int:pk>/', views.JobDetailView.as_view(), name='job-detail'),
+]
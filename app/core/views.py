@@ -0,0 +1,17 @@
+from rest_framework import generics, permissions
+
+from core.authentication import AUTHENTICATION_CLASSES
+from core.models import Job
+from core.serializers import JobSerializer
+
+
+class JobDetailView(generics.RetrieveAPIView):
+    """Poll the status and progress of a background job"""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    authentication_classes = AUTHENTICATION_CLASSES
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def get_queryset(self):
+        """Return the jobs of the authenticated user"""
+        return self.queryset.filter(user=self.request.user)
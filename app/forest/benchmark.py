@@ -0,0 +1,315 @@
+import itertools
+import math
+import platform
+import time
+import tracemalloc
+from collections import namedtuple
+from unittest import mock
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import synthetic
+from core.models import Project, Projection, Stand, Plot, Tree
+
+from forest.cache import get_cache
+from forest.mixins import FastListMixin
+
+
+REPEAT = 20
+LARGE_PAGE = 1000
+STREAM = 'application/stream+json'
+TALLY_HEADER = 'project,stand,plot,symbol,count,dbh,height,live_crown_ratio\n'
+
+Endpoint = namedtuple('Endpoint', ['name', 'method', 'url', 'payload',
+                                   'options'])
+
+
+def parse_size(size):
+    """Return projects, stands, plots and trees from a PxSxPxT string"""
+    try:
+        counts = [int(value) for value in size.lower().split('x')]
+    except ValueError:
+        counts = []
+    if len(counts) != 4 or min(counts) < 1:
+        raise ValueError('Dataset size must look like 1x10x10x20, got %r'
+                         % size)
+
+    return counts
+
+
+def percentile(values, fraction):
+    """Return the nearest rank percentile of sorted values"""
+    index = max(0, math.ceil(fraction * len(values)) - 1)
+    return values[index]
+
+
+def endpoints(user):
+    """Return the endpoints to benchmark against the generated data
+
+    Endpoints that delete rows recreate them in a setup call made before
+    each request, on a scratch stand and plot the other endpoints ignore.
+    """
+    project = Project.objects.order_by('-id').first()
+    stand = project.stands.order_by('id').first()
+    plot = stand.plots.order_by('id').first()
+    tree = plot.trees.select_related('symbol').order_by('id').first()
+    tree_ids = list(plot.trees.order_by('id').values_list('id', flat=True))
+    design = project.sample_design.order_by('id').first()
+    run = Projection.objects.create(project=project)
+    emails = ('benchmark%d@example.com' % index for index in itertools.count())
+    identifications = itertools.count(
+        synthetic.next_value(Stand, 'identification'))
+    numbers = itertools.count(synthetic.next_value(Plot, 'number'))
+    scratch_stand = Stand.objects.create(
+        project_id=project, identification=next(identifications),
+        location='Scratch', origin_year=stand.origin_year, size=stand.size)
+    scratch_plot = Plot.objects.create(
+        stand=stand, number=next(numbers), latitude=plot.latitude,
+        longitude=plot.longitude, slope=plot.slope, aspect=plot.aspect)
+
+    def tally():
+        row = '%d,%d,%d,%s,1,12.5,60,35\n' % (
+            project.id, stand.identification, plot.number, tree.symbol.symbol)
+        sheet = SimpleUploadedFile('tally.csv',
+                                   (TALLY_HEADER + row * 10).encode())
+        return {'file': sheet}
+
+    def trees(with_plot=True):
+        row = {'symbol': tree.symbol_id, 'count': 1, 'dbh': 12.5,
+               'height': 60, 'live_crown_ratio': 35}
+        if with_plot:
+            row['plot'] = plot.id
+        return lambda: [row] * 10
+
+    def document():
+        return {
+            'name': 'Benchmark upload', 'land_owner': 'BLM',
+            'measurement_system': project.measurement_system,
+            'stands': [{
+                'identification': next(identifications),
+                'location': 'Upload', 'origin_year': stand.origin_year,
+                'size': stand.size,
+                'plots': [{
+                    'number': next(numbers), 'latitude': plot.latitude,
+                    'longitude': plot.longitude, 'slope': plot.slope,
+                    'aspect': plot.aspect, 'trees': trees(False)()
+                } for index in range(2)]
+            }]
+        }
+
+    def scratch_trees():
+        Tree.objects.bulk_create([
+            Tree(plot=scratch_plot, symbol_id=tree.symbol_id, count=1,
+                 dbh=12.5, height=60, live_crown_ratio=35)
+            for index in range(10)
+        ])
+
+    def scratch_plots():
+        Plot.objects.create(
+            stand=scratch_stand, number=next(numbers),
+            latitude=plot.latitude, longitude=plot.longitude,
+            slope=plot.slope, aspect=plot.aspect)
+
+    def new_user():
+        return {'email': next(emails), 'password': 'benchmark',
+                'name': 'Benchmark'}
+
+    def forest(name, *args, **kwargs):
+        return Endpoint(name, 'get', reverse('forest:' + name, args=args),
+                        None, kwargs)
+
+    def change(name, method, url_name, payload, query='', **kwargs):
+        url = reverse('forest:' + url_name) + query
+        return Endpoint(name, method, url, payload,
+                        dict(kwargs, format='json'))
+
+    def large_pages(name):
+        url = reverse('forest:' + name) + '?page_size=%d' % LARGE_PAGE
+        return [
+            Endpoint(name + '-%d' % LARGE_PAGE, 'get', url, None, {}),
+            Endpoint(name + '-%d-serializer' % LARGE_PAGE, 'get', url, None,
+                     {'fast_list': False}),
+        ]
+
+    return [
+        forest('project-list'),
+        forest('project-detail', project.id),
+        forest('project-detail', project.id, HTTP_ACCEPT=STREAM)
+        ._replace(name='project-detail-stream'),
+        forest('project-stand-list', project.id),
+        forest('project-summary', project.id),
+        forest('project-stand-table', project.id),
+        forest('project-changes', project.id),
+        Endpoint('project-tally', 'post',
+                 reverse('forest:project-tally', args=[project.id]),
+                 tally, {'format': 'multipart'}),
+        forest('stand-list'),
+        forest('stand-detail', stand.id),
+        forest('stand-summary', stand.id),
+        forest('stand-stand-table', stand.id),
+        forest('stand-aggregates', stand.id),
+        forest('stand-plot-list', stand.id),
+        forest('plot-list'),
+        *large_pages('plot-list'),
+        forest('plot-detail', plot.id),
+        forest('plot-aggregates', plot.id),
+        change('plot-bulk-update', 'patch', 'plot-bulk',
+               lambda: [{'id': plot.id, 'slope': plot.slope}]),
+        change('plot-bulk-delete', 'delete', 'plot-bulk', None,
+               '?stand=%d' % scratch_stand.id, setup=scratch_plots),
+        Endpoint('plot-bulk-trees', 'post',
+                 reverse('forest:plot-bulk-trees', args=[plot.id]),
+                 trees(with_plot=False), {'format': 'json'}),
+        forest('treereference-list'),
+        forest('treereference-detail', tree.symbol_id),
+        forest('tree-list'),
+        *large_pages('tree-list'),
+        forest('tree-list', HTTP_ACCEPT=STREAM)
+        ._replace(name='tree-list-stream'),
+        forest('tree-detail', tree.id),
+        Endpoint('tree-bulk', 'post', reverse('forest:tree-bulk'),
+                 trees(), {'format': 'json'}),
+        change('tree-bulk-update', 'patch', 'tree-bulk',
+               lambda: [{'id': pk, 'height': 60} for pk in tree_ids[:10]]),
+        change('tree-bulk-update-filtered', 'patch', 'tree-bulk',
+               lambda: {'scale': {'height': 1}}, '?plot=%d' % plot.id),
+        change('tree-bulk-delete', 'delete', 'tree-bulk', None,
+               '?plot=%d' % scratch_plot.id, setup=scratch_trees),
+        forest('sampledesign-list'),
+        forest('sampledesign-detail', design.id),
+        change('project-upload', 'post', 'project-upload', document),
+        Endpoint('project-projections', 'post',
+                 reverse('forest:project-projections', args=[project.id]),
+                 lambda: {'periods': 2}, {'format': 'json'}),
+        forest('projection-list'),
+        forest('projection-detail', run.id),
+        forest('cache-stats'),
+        Endpoint('user-create', 'post', reverse('user:create'), new_user,
+                 {}),
+        Endpoint('user-token', 'post', reverse('user:token'),
+                 lambda: {'email': user.email, 'password': 'benchmark'}, {}),
+        Endpoint('user-me', 'get', reverse('user:me'), None,
+                 {'authenticate': True}),
+    ]
+
+
+def prepare(clients, endpoint):
+    """Return a call sending the request of an endpoint
+
+    The setup and payload of the endpoint are built here, outside the
+    timed call. Clients are kept per authentication mode, since switching
+    one client between users logs it out through the session tables.
+    """
+    options = dict(endpoint.options)
+    client = clients[options.pop('authenticate', False)]
+    fast_list = options.pop('fast_list', True)
+    setup = options.pop('setup', None)
+    if setup is not None:
+        setup()
+    payload = endpoint.payload() if endpoint.payload else None
+
+    def send():
+        with mock.patch.object(FastListMixin, 'fast_list', fast_list):
+            response = getattr(client, endpoint.method)(endpoint.url, payload,
+                                                        **options)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            else:
+                response.content
+
+        return response
+
+    return send
+
+
+def sample(clients, endpoint, repeat=REPEAT, cold=False):
+    """Return latency, query count and peak memory of an endpoint
+
+    Cold samples clear the forest response cache before every request, so
+    cached actions are timed as misses instead of hits.
+    """
+    def ready():
+        send = prepare(clients, endpoint)
+        if cold:
+            get_cache().clear()
+        return send
+
+    latencies = []
+    for index in range(repeat):
+        send = ready()
+        start = time.perf_counter()
+        response = send()
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+
+    send = ready()
+    with CaptureQueriesContext(connection) as context:
+        tracemalloc.start()
+        try:
+            send()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(latencies, 0.5), 3),
+        'p90_ms': round(percentile(latencies, 0.9), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'queries': len(context.captured_queries),
+        'peak_memory_bytes': peak
+    }
+
+
+def measure(clients, endpoint, repeat=REPEAT):
+    """Return warm statistics of an endpoint, with cold ones for reads"""
+    prepare(clients, endpoint)()
+    stats = sample(clients, endpoint, repeat)
+    if endpoint.method == 'get':
+        stats['cold'] = sample(clients, endpoint, repeat, cold=True)
+
+    return stats
+
+
+def run_size(size, repeat=REPEAT, seed=0):
+    """Benchmark every endpoint against a generated dataset
+
+    The dataset and everything the endpoints write are rolled back
+    afterwards, leaving the database as it was.
+    """
+    with transaction.atomic():
+        dataset = synthetic.generate(*parse_size(size), seed=seed)
+        user = get_user_model().objects.create_user(
+            email='benchmark@example.com', password='benchmark')
+        get_cache().clear()
+        clients = {False: APIClient(), True: APIClient()}
+        clients[True].force_authenticate(user)
+        results = {
+            endpoint.name: measure(clients, endpoint, repeat)
+            for endpoint in endpoints(user)
+        }
+        transaction.set_rollback(True)
+
+    return {'size': size, 'dataset': dataset, 'endpoints': results}
+
+
+def run(sizes, repeat=REPEAT, seed=0):
+    """Return benchmark results for each dataset size"""
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeat': repeat,
+            'seed': seed
+        },
+        'results': [run_size(size, repeat, seed) for size in sizes]
+    }
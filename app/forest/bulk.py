@@ -0,0 +1,443 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, F, Value, When
+
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+from core.models import Plot, Stand, Tree, TreeReference
+
+from forest import spatial
+from forest.serializers import PlotSerializer, TreeSerializer
+
+
+BATCH_SIZE = 1000
+TRUE_VALUES = ('1', 'true', 'True', 'yes')
+TREE_FILTERS = {
+    'id': 'id__in',
+    'plot': 'plot_id__in',
+    'stand': 'plot__stand_id__in',
+    'project': 'plot__stand__project_id__in',
+    'symbol': 'symbol_id__in'
+}
+PLOT_FILTERS = {
+    'id': 'id__in',
+    'stand': 'stand_id__in',
+    'project': 'stand__project_id__in'
+}
+SPATIAL_FILTERS = ('bbox', 'near')
+OPERATIONS = ('set', 'scale', 'add')
+
+
+class TreeBulkSerializer(serializers.ModelSerializer):
+    """Serializer for one tree of a bulk upload
+
+    Plots and species are resolved from lookups preloaded into the context
+    so validating a row does not query the database. Species may be given
+    by tree reference id or by symbol code.
+    """
+    plot = serializers.IntegerField(required=False)
+    symbol = serializers.CharField()
+
+    class Meta:
+        model = Tree
+        fields = TreeSerializer.Meta.fields
+        read_only_fields = ('id',)
+
+    def validate_plot(self, value):
+        if self.context.get('plot') is not None:
+            return self.context['plot']
+        plot = self.context['plots'].get(value)
+        if plot is None:
+            raise serializers.ValidationError(
+                'Invalid pk "%s" - object does not exist.' % value)
+
+        return plot
+
+    def validate_symbol(self, value):
+        if value not in self.context['symbols']:
+            raise serializers.ValidationError(
+                'Unknown tree reference "%s".' % value)
+        symbol = self.context['symbols'][value]
+        if symbol is None:
+            raise serializers.ValidationError(
+                'Ambiguous tree reference symbol "%s".' % value)
+
+        return symbol
+
+    def validate(self, attrs):
+        plot = self.context.get('plot')
+        if plot is not None:
+            attrs['plot'] = plot
+        elif 'plot' not in attrs:
+            raise serializers.ValidationError(
+                {'plot': ['This field is required.']})
+
+        return attrs
+
+
+class TreeBulkUpdateSerializer(TreeBulkSerializer):
+    """Serializer for the changes to one tree of a bulk update"""
+
+    def validate(self, attrs):
+        return attrs
+
+
+class PlotBulkSerializer(serializers.ModelSerializer):
+    """Serializer for the changes to one plot of a bulk update
+
+    Stands are resolved from a lookup preloaded into the context and plot
+    numbers are checked for the whole batch at once.
+    """
+    stand = serializers.IntegerField()
+    number = serializers.IntegerField()
+
+    class Meta:
+        model = Plot
+        fields = tuple(name for name in PlotSerializer.Meta.fields
+                       if name != 'trees')
+        read_only_fields = ('id',)
+
+    def validate_stand(self, value):
+        stand = self.context['stands'].get(value)
+        if stand is None:
+            raise serializers.ValidationError(
+                'Invalid pk "%s" - object does not exist.' % value)
+
+        return stand
+
+
+def load_plots(rows):
+    """Return the plots referenced by the rows keyed by id"""
+    ids = set()
+    for row in rows:
+        try:
+            ids.add(int(row.get('plot')))
+        except (AttributeError, TypeError, ValueError):
+            continue
+
+    return Plot.objects.in_bulk(ids)
+
+
+def load_symbols(rows):
+    """Return tree references keyed by the id or symbol used in the rows
+
+    Symbols shared by several tree references map to None.
+    """
+    values = set()
+    for row in rows:
+        if isinstance(row, dict) and row.get('symbol') is not None:
+            values.add(str(row['symbol']))
+    ids = {int(value) for value in values if value.isdigit()}
+    codes = values.difference(str(pk) for pk in ids)
+    if not values:
+        return {}
+
+    symbols = {}
+    references = TreeReference.objects.filter(id__in=ids) | \
+        TreeReference.objects.filter(symbol__in=codes)
+    for reference in references:
+        if reference.id in ids:
+            symbols[str(reference.id)] = reference
+        if reference.symbol in codes:
+            symbols[reference.symbol] = None \
+                if reference.symbol in symbols else reference
+
+    return symbols
+
+
+def load_stands(rows):
+    """Return the stands referenced by the rows keyed by id"""
+    ids = set()
+    for row in rows:
+        try:
+            ids.add(int(row.get('stand')))
+        except (AttributeError, TypeError, ValueError):
+            continue
+
+    return Stand.objects.in_bulk(ids)
+
+
+def tree_changes_serializer(rows):
+    """Return a serializer validating tree changes of the rows"""
+    return TreeBulkUpdateSerializer(partial=True, context={
+        'plot': None,
+        'plots': load_plots(rows),
+        'symbols': load_symbols(rows)
+    })
+
+
+def plot_changes_serializer(rows):
+    """Return a serializer validating plot changes of the rows"""
+    return PlotBulkSerializer(partial=True, context={
+        'stands': load_stands(rows)
+    })
+
+
+def ingest_trees(rows, plot=None, allow_partial=False):
+    """Validate rows in one pass and create the valid trees in bulk
+
+    Returns the created trees and a list of per row errors. Nothing is
+    created when any row is invalid unless allow_partial is set.
+    """
+    context = {
+        'plot': plot,
+        'plots': {} if plot is not None else load_plots(rows),
+        'symbols': load_symbols(rows)
+    }
+    trees, errors = [], []
+    for index, row in enumerate(rows):
+        serializer = TreeBulkSerializer(data=row, context=context)
+        if serializer.is_valid():
+            trees.append(Tree(**serializer.validated_data))
+        else:
+            errors.append({'index': index, 'errors': serializer.errors})
+
+    if errors and not allow_partial:
+        return [], errors
+
+    with transaction.atomic():
+        created = Tree.objects.bulk_create(trees, batch_size=BATCH_SIZE)
+
+    return created, errors
+
+
+def ingest_response(request, plot=None):
+    """Return the response to a bulk tree upload request"""
+    if not isinstance(request.data, list):
+        return Response({'detail': 'Expected a list of trees.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    allow_partial = request.query_params.get('partial') in TRUE_VALUES
+    created, errors = ingest_trees(request.data, plot=plot,
+                                   allow_partial=allow_partial)
+    if errors and not created:
+        return Response({'created': [], 'errors': errors},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'created': TreeSerializer(created, many=True).data,
+        'errors': errors
+    }, status=status.HTTP_201_CREATED)
+
+
+def parse_ids(params, name):
+    """Return a comma separated list of ids from the query string"""
+    try:
+        return [int(value) for value in params[name].split(',')]
+    except ValueError:
+        raise serializers.ValidationError({name: [
+            'Expected comma separated ids.']})
+
+
+def select_rows(queryset, params, filters, located=False):
+    """Return the rows a bulk request selects by its query parameters
+
+    filters maps parameter names to id lookups; located plots may also be
+    selected by the spatial parameters. At least one filter is required
+    so that a bare request cannot touch every row.
+    """
+    names = [name for name in filters if name in params]
+    if located:
+        names += [name for name in SPATIAL_FILTERS if name in params]
+    if not names:
+        raise serializers.ValidationError({'detail': (
+            'Select rows with at least one of the %s parameters.' %
+            ', '.join(tuple(filters) + (SPATIAL_FILTERS if located else ())))
+        })
+
+    queryset = queryset.filter(**{
+        filters[name]: parse_ids(params, name)
+        for name in filters if name in params
+    })
+    if located:
+        selected = spatial.filter_queryset(queryset, params)
+        queryset = queryset.model.objects.filter(
+            pk__in=selected.values('pk'))
+
+    return queryset
+
+
+def validate_changes(rows, serializer):
+    """Validate per row changes in one pass with a single serializer
+
+    Returns validated changes keyed by id and a list of per row errors.
+    """
+    changes, errors = {}, []
+    for index, row in enumerate(rows):
+        pk = row.get('id') if isinstance(row, dict) else None
+        if not isinstance(pk, int) or isinstance(pk, bool):
+            errors.append({'index': index, 'errors': {
+                'id': ['This field is required.']}})
+            continue
+        if pk in changes:
+            errors.append({'index': index, 'errors': {
+                'id': ['Duplicate id %s.' % pk]}})
+            continue
+        try:
+            changes[pk] = serializer.run_validation(row)
+        except serializers.ValidationError as error:
+            errors.append({'index': index,
+                           'errors': serializers.as_serializer_error(error)})
+
+    return changes, errors
+
+
+def check_missing(queryset, rows, changes, errors):
+    """Record errors for changed ids that do not exist"""
+    found = set(queryset.filter(pk__in=list(changes))
+                .values_list('pk', flat=True))
+    for index, row in enumerate(rows):
+        if isinstance(row, dict) and row.get('id') in changes and \
+                row['id'] not in found:
+            errors.append({'index': index, 'errors': {
+                'id': ['Not found.']}})
+
+
+def check_numbers(rows, changes, errors):
+    """Record errors for plot numbers repeated or used by other plots"""
+    numbers = {pk: data['number'] for pk, data in changes.items()
+               if 'number' in data}
+    taken = dict(Plot.objects.filter(number__in=set(numbers.values()))
+                 .exclude(pk__in=list(numbers))
+                 .values_list('number', 'pk'))
+    seen = set()
+    for index, row in enumerate(rows):
+        pk = row.get('id') if isinstance(row, dict) else None
+        if pk not in numbers:
+            continue
+        if numbers[pk] in taken or numbers[pk] in seen:
+            errors.append({'index': index, 'errors': {'number': [
+                'plot with this number already exists.']}})
+        seen.add(numbers[pk])
+
+
+def update_cases(queryset, changes, batch_size=BATCH_SIZE):
+    """Apply per row changes in batched UPDATEs and return the rows changed
+
+    Rows changing the same fields are updated together, each field set
+    by a CASE over the ids of the batch, so a batch of like corrections
+    is a single statement.
+    """
+    model = queryset.model
+    groups = defaultdict(list)
+    for pk in sorted(changes):
+        groups[tuple(sorted(changes[pk]))].append(pk)
+
+    updated = 0
+    for names, ids in groups.items():
+        if not names:
+            continue
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            values = {}
+            for name in names:
+                field = model._meta.get_field(name)
+                values[field.attname] = Case(*[
+                    When(pk=pk, then=Value(
+                        getattr(changes[pk][name], 'pk', changes[pk][name]),
+                        output_field=field))
+                    for pk in batch
+                ], default=F(field.attname), output_field=field)
+            updated += queryset.filter(pk__in=batch).update(**values)
+
+    return updated
+
+
+def scalable_fields(serializer):
+    """Return the writable float fields that may be scaled or offset"""
+    model = serializer.Meta.model
+    return {
+        name for name, field in serializer.fields.items()
+        if not field.read_only and isinstance(
+            model._meta.get_field(name), models.FloatField)
+    }
+
+
+def filtered_changes(document, changes_serializer):
+    """Return the update keywords of a set, scale and add document"""
+    if not isinstance(document, dict) or not document or \
+            set(document).difference(OPERATIONS) or \
+            not all(isinstance(value, dict) for value in document.values()):
+        raise serializers.ValidationError({'detail': (
+            'Expected an object of %s changes.' % ', '.join(OPERATIONS))})
+
+    serializer = changes_serializer([document.get('set', {})])
+    values = {}
+    if document.get('set'):
+        if {'id', 'number'}.intersection(document['set']):
+            raise serializers.ValidationError({'set': [
+                'Ids and plot numbers are changed per row.']})
+        values.update(serializer.run_validation(document['set']))
+
+    scalable = scalable_fields(serializer)
+    scale, add = document.get('scale', {}), document.get('add', {})
+    for name in sorted(set(scale) | set(add)):
+        operation = 'scale' if name in scale else 'add'
+        if name not in scalable:
+            raise serializers.ValidationError({operation: [
+                'Only %s can be changed arithmetically.' %
+                ', '.join(sorted(scalable))]})
+        if name in values:
+            raise serializers.ValidationError({operation: [
+                'Field %s is also set.' % name]})
+        factor, offset = scale.get(name, 1), add.get(name, 0)
+        if not all(isinstance(number, (int, float)) and
+                   not isinstance(number, bool)
+                   for number in (factor, offset)):
+            raise serializers.ValidationError({operation: [
+                'Expected a number for %s.' % name]})
+        values[name] = F(name) * factor + offset
+
+    if not values:
+        raise serializers.ValidationError({'detail': 'No changes given.'})
+
+    return values
+
+
+def update_response(request, queryset, changes_serializer, filters,
+                    located=False):
+    """Return the response to a bulk PATCH request
+
+    A list body changes rows by id; an object body sets, scales or offsets
+    fields of the rows selected by the query parameters.
+    """
+    rows = request.data
+    if isinstance(rows, list):
+        changes, errors = validate_changes(rows, changes_serializer(
+            [row for row in rows if isinstance(row, dict)]))
+        check_missing(queryset, rows, changes, errors)
+        if queryset.model is Plot:
+            check_numbers(rows, changes, errors)
+        if errors:
+            return Response({'updated': 0, 'errors': errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+    else:
+        queryset = select_rows(queryset, request.query_params, filters,
+                               located)
+        changes = filtered_changes(rows, changes_serializer)
+
+    try:
+        with transaction.atomic():
+            if isinstance(rows, list):
+                updated = update_cases(queryset, changes)
+            else:
+                updated = queryset.update(**changes)
+    except IntegrityError:
+        return Response({'detail': 'The changes conflict with other rows.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({'updated': updated})
+
+
+def delete_response(request, queryset, filters, located=False):
+    """Return the response to a filtered bulk DELETE request"""
+    queryset = select_rows(queryset, request.query_params, filters, located)
+    with transaction.atomic():
+        total, counts = queryset.delete()
+
+    return Response({'deleted': {
+        label.split('.')[-1].lower(): count
+        for label, count in counts.items()
+    }})
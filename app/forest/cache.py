@@ -0,0 +1,62 @@
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+CACHE_ALIAS = 'forest'
+HITS_KEY = 'forest:stats:hits'
+MISSES_KEY = 'forest:stats:misses'
+FORMATS = ('json', 'msgpack', 'cbor')
+
+
+def get_cache():
+    """Return the cache holding rendered forest responses"""
+    return caches[CACHE_ALIAS]
+
+
+def response_key(basename, etag):
+    """Return the cache key of a rendered response"""
+    return 'forest:response:%s:%s' % (basename, etag.strip('"'))
+
+
+def count(key):
+    """Increment a cache statistics counter"""
+    cache = get_cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, timeout=None)
+
+
+def stats():
+    """Return the hit and miss counters of the response cache"""
+    cache = get_cache()
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0)
+    }
+
+
+def cached_response(key):
+    """Return a cached rendered response, or None on a miss"""
+    cached = get_cache().get(key)
+    if cached is None:
+        count(MISSES_KEY)
+        return None
+
+    count(HITS_KEY)
+    content, content_type = cached
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Cache'] = 'HIT'
+    return response
+
+
+def store_response(key, response, request, renderer_context):
+    """Render a response and store its content in the cache"""
+    response.accepted_renderer = request.accepted_renderer
+    response.accepted_media_type = request.accepted_media_type
+    response.renderer_context = renderer_context
+    response.render()
+    get_cache().set(key, (response.content, response['Content-Type']))
+    response['X-Cache'] = 'MISS'
+    return response
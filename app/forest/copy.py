@@ -0,0 +1,49 @@
+import csv
+import io
+
+from django.db import connection
+
+from core import aggregates
+from core.models import Tree
+
+
+BATCH_SIZE = 1000
+TREE_COLUMNS = ('plot_id', 'symbol_id', 'count', 'dbh', 'height',
+                'live_crown_ratio')
+
+
+def use_copy():
+    """Return whether the database supports COPY FROM STDIN"""
+    return connection.vendor == 'postgresql'
+
+
+def copy_trees(rows):
+    """Write tuples of TREE_COLUMNS values to the tree table with COPY"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    sql = 'COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (
+        connection.ops.quote_name(Tree._meta.db_table),
+        ', '.join(connection.ops.quote_name(c) for c in TREE_COLUMNS)
+    )
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, buffer)
+
+
+def write_trees(rows, deltas=None):
+    """Write tuples of TREE_COLUMNS values to the tree table
+
+    Rows are streamed with COPY where the database supports it, and their
+    changes to the aggregates are added to the returned deltas for the
+    caller to apply. Elsewhere they are bulk created, which keeps the
+    aggregates and project versions in step by itself.
+    """
+    deltas = aggregates.empty_deltas() if deltas is None else deltas
+    if use_copy():
+        copy_trees(rows)
+        return aggregates.collect((row[:4] for row in rows), deltas=deltas)
+
+    Tree.objects.bulk_create(
+        [Tree(**dict(zip(TREE_COLUMNS, row))) for row in rows],
+        batch_size=BATCH_SIZE)
+    return deltas
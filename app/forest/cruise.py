@@ -0,0 +1,337 @@
+import numpy as np
+
+from django.db import connection
+from django.db.models import Count
+
+from core.models import Project, SampleDesign, Stand, Tree, TreeReference
+
+from forest import equations
+
+
+BASAL_AREA_CONSTANT = Project.BASAL_AREA_CONSTANT
+SDI_REFERENCE_DIAMETER = {
+    Project.ENG: 10.0,
+    Project.MET: 25.4
+}
+SDI_EXPONENT = 1.605
+AREA_UNIT = {
+    Project.ENG: 'acre',
+    Project.MET: 'hectare'
+}
+DIAMETER_UNIT = {
+    Project.ENG: 'inch',
+    Project.MET: 'cm'
+}
+DIAMETER_CLASS_WIDTH = {
+    Project.ENG: 2.0,
+    Project.MET: 5.0
+}
+# Open ended top class of stand tables, so a mistyped diameter cannot
+# widen every table by thousands of empty classes
+DIAMETER_CLASS_TOP = {
+    Project.ENG: 60.0,
+    Project.MET: 150.0
+}
+
+
+def tree_basal_area(dbh, measurement_system):
+    """Return the basal area of trees with the given diameters"""
+    return BASAL_AREA_CONSTANT[measurement_system] * dbh ** 2
+
+
+def expansion_factors(designs, dbh, height, basal_area):
+    """Return trees per unit area represented by each tallied tree
+
+    Each tree is expanded by the first sample design whose variable range
+    contains it: FRQ designs use the factor as a fixed plot expansion, BAF
+    designs divide the basal area factor by the tree's basal area.
+    """
+    factors = np.zeros(len(dbh))
+    unassigned = np.ones(len(dbh), dtype=bool)
+    for design in designs:
+        values = dbh if design.var == SampleDesign.DBH else height
+        selected = unassigned & (values >= design.minv) & \
+            (values <= design.maxv)
+        if design.sample_type == SampleDesign.BAF:
+            selected &= basal_area > 0
+            factors[selected] = design.factor / basal_area[selected]
+        else:
+            factors[selected] = design.factor
+        unassigned &= ~selected
+
+    return factors
+
+
+def stand_statistics(trees, basal_area, dbh_squared, measurement_system):
+    """Return density statistics from per area sums"""
+    trees = np.asarray(trees, dtype=float)
+    qmd = np.sqrt(np.divide(dbh_squared, trees, out=np.zeros_like(trees),
+                            where=trees > 0))
+    reference = SDI_REFERENCE_DIAMETER[measurement_system]
+    sdi = trees * (qmd / reference) ** SDI_EXPONENT
+
+    return {
+        'trees_per_area': trees,
+        'basal_area': np.asarray(basal_area, dtype=float),
+        'qmd': qmd,
+        'sdi': sdi
+    }
+
+
+def load_trees(trees, *extra):
+    """Return the tree columns of a queryset, and any extra fields, as
+    arrays in a single query"""
+    columns = ('plot__stand_id', 'symbol_id', 'count', 'dbh', 'height') + \
+        extra
+    queryset = trees.order_by().values_list(*columns)
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = np.array(cursor.fetchall(), dtype=float).reshape(
+            -1, len(columns))
+
+    arrays = {
+        'stand': rows[:, 0].astype(np.int64),
+        'species': rows[:, 1].astype(np.int64),
+        'count': rows[:, 2],
+        'dbh': rows[:, 3],
+        'height': rows[:, 4]
+    }
+    arrays.update({name: rows[:, 5 + index]
+                   for index, name in enumerate(extra)})
+    return arrays
+
+
+def load_stands(stands):
+    """Return stand ids, plot counts and sizes as arrays ordered by id"""
+    rows = np.array(list(
+        stands.order_by('id').annotate(plot_count=Count('plots'))
+        .values_list('id', 'plot_count', 'size')
+    ), dtype=float).reshape(-1, 3)
+
+    return {
+        'id': rows[:, 0].astype(np.int64),
+        'plot_count': rows[:, 1],
+        'size': rows[:, 2]
+    }
+
+
+def per_area_factors(trees, stands, designs, system, weights=None):
+    """Return trees per unit area and basal area of each tallied tree
+
+    Expanded trees are averaged over the plots of their stand and scaled
+    by the weight of the stand, if any.
+    """
+    dbh = trees['dbh']
+    basal_area = tree_basal_area(dbh, system)
+    per_area = expansion_factors(designs, dbh, trees['height'], basal_area)
+    position = np.searchsorted(stands['id'], trees['stand'])
+    per_area *= trees['count'] / np.maximum(stands['plot_count'], 1)[position]
+    if weights is not None:
+        per_area *= weights[position]
+
+    return per_area, basal_area
+
+
+def symbol_names(species):
+    """Return the symbols of tree reference ids"""
+    return dict(TreeReference.objects.filter(
+        id__in=species.tolist()).values_list('id', 'symbol'))
+
+
+def tree_yields(project, trees):
+    """Return per tree volume and biomass, or None without equations"""
+    if project.equation_set is None:
+        return None
+
+    return equations.evaluate(project.equation_set, trees['species'],
+                              trees['dbh'], trees['height'],
+                              project.measurement_system)
+
+
+def project_units(system):
+    """Return the units of per area values in a measurement system"""
+    return {
+        'measurement_system': system,
+        'area_unit': AREA_UNIT[system],
+        'volume_unit': equations.VOLUME_UNIT[system],
+        'biomass_unit': equations.BIOMASS_UNIT[system]
+    }
+
+
+def summarize(trees, per_area, basal_area, yields, system):
+    """Return per species and total statistics of expanded trees"""
+    dbh = trees['dbh']
+    species, index = np.unique(trees['species'], return_inverse=True)
+    sums = (
+        np.bincount(index, weights=per_area, minlength=len(species)),
+        np.bincount(index, weights=per_area * basal_area,
+                    minlength=len(species)),
+        np.bincount(index, weights=per_area * dbh ** 2,
+                    minlength=len(species))
+    )
+    by_species = stand_statistics(*sums, measurement_system=system)
+    total = stand_statistics(*(column.sum() for column in sums),
+                             measurement_system=system)
+    for name in equations.YIELDS:
+        if yields is None:
+            by_species[name] = [None] * len(species)
+            total[name] = None
+            continue
+        by_species[name] = np.bincount(index, weights=per_area * yields[name],
+                                       minlength=len(species))
+        total[name] = by_species[name].sum()
+
+    symbols = symbol_names(species)
+    species_rows = []
+    for position, species_id in enumerate(species.tolist()):
+        row = {'symbol': species_id, 'symbol_name': symbols[species_id]}
+        row.update({key: as_float(value[position])
+                    for key, value in by_species.items()})
+        species_rows.append(row)
+
+    return {
+        'species': species_rows,
+        'total': {key: as_float(value) for key, value in total.items()}
+    }
+
+
+def as_float(value):
+    """Return a numpy scalar as a float, keeping missing values"""
+    return None if value is None else float(value)
+
+
+def stand_weights(stands):
+    """Return stand weights proportional to size, or equal without sizes"""
+    area = stands['size'].sum()
+    if area > 0:
+        return stands['size'] / area
+
+    return np.full(len(stands['id']), 1 / max(len(stands['id']), 1))
+
+
+def stand_summary(stand):
+    """Return per species and total cruise statistics for a stand"""
+    project = stand.project_id
+    system = project.measurement_system
+    designs = list(project.sample_design.order_by('id'))
+    stands = load_stands(Stand.objects.filter(pk=stand.pk))
+    trees = load_trees(Tree.objects.filter(plot__stand=stand))
+    per_area, basal_area = per_area_factors(trees, stands, designs, system)
+
+    summary = {'stand': stand.id}
+    summary.update(project_units(system))
+    summary['plot_count'] = int(stands['plot_count'].sum())
+    summary.update(summarize(trees, per_area, basal_area,
+                             tree_yields(project, trees), system))
+    return summary
+
+
+def project_summary(project):
+    """Return per species and total cruise statistics for a project
+
+    Per area values of the stands are averaged weighted by stand size, or
+    equally when no stand has a size.
+    """
+    system = project.measurement_system
+    designs = list(project.sample_design.order_by('id'))
+    stands = load_stands(project.stands.all())
+    trees = load_trees(Tree.objects.filter(plot__stand__project_id=project))
+    per_area, basal_area = per_area_factors(trees, stands, designs, system,
+                                            stand_weights(stands))
+
+    summary = {'project': project.id}
+    summary.update(project_units(system))
+    summary.update({'area': float(stands['size'].sum()),
+                    'stand_count': len(stands['id']),
+                    'plot_count': int(stands['plot_count'].sum())})
+    summary.update(summarize(trees, per_area, basal_area,
+                             tree_yields(project, trees), system))
+    return summary
+
+
+def diameter_classes(dbh, width):
+    """Return the class of each diameter, classes centred on multiples of
+    the class width"""
+    return np.floor(dbh / width + 0.5).astype(np.int64)
+
+
+def diameter_table(trees, per_area, basal_area, yields, system):
+    """Return stand and stock tables of trees by species and diameter class
+
+    Each table holds a row per species with a value per diameter class,
+    from the smallest to the largest class tallied. The top class holds
+    every larger tree as well. Volume and biomass tables need an equation
+    set.
+    """
+    width = DIAMETER_CLASS_WIDTH[system]
+    top = DIAMETER_CLASS_TOP[system]
+    classes = np.clip(diameter_classes(trees['dbh'], width), 0,
+                      int(round(top / width)))
+    species, index = np.unique(trees['species'], return_inverse=True)
+    low = classes.min() if len(classes) else 0
+    columns = classes.max() - low + 1 if len(classes) else 0
+    cells = index * columns + classes - low
+    shape = (len(species), columns)
+    weights = [('trees_per_area', per_area),
+               ('basal_area', per_area * basal_area)]
+    if yields is not None:
+        weights.extend((name, per_area * yields[name])
+                       for name in equations.YIELDS)
+    tables = {
+        name: np.bincount(cells, weights=values,
+                          minlength=shape[0] * shape[1]).reshape(shape)
+        for name, values in weights
+    }
+
+    symbols = symbol_names(species)
+    species_rows = []
+    for position, species_id in enumerate(species.tolist()):
+        row = {'symbol': species_id, 'symbol_name': symbols[species_id]}
+        row.update({name: table[position].tolist()
+                    for name, table in tables.items()})
+        species_rows.append(row)
+
+    table = project_units(system)
+    table.update({
+        'diameter_unit': DIAMETER_UNIT[system],
+        'class_width': width,
+        'top_class': top,
+        'classes': ((low + np.arange(columns)) * width).tolist(),
+        'species': species_rows,
+        'total': {name: table.sum(axis=0).tolist()
+                  for name, table in tables.items()}
+    })
+    return table
+
+
+def stand_table(stand):
+    """Return the stand and stock tables of a stand"""
+    project = stand.project_id
+    system = project.measurement_system
+    designs = list(project.sample_design.order_by('id'))
+    stands = load_stands(Stand.objects.filter(pk=stand.pk))
+    trees = load_trees(Tree.objects.filter(plot__stand=stand))
+    per_area, basal_area = per_area_factors(trees, stands, designs, system)
+
+    table = {'stand': stand.id}
+    table.update(diameter_table(trees, per_area, basal_area,
+                                tree_yields(project, trees), system))
+    return table
+
+
+def project_table(project):
+    """Return the stand and stock tables of a project, with stands
+    weighted as in project_summary"""
+    system = project.measurement_system
+    designs = list(project.sample_design.order_by('id'))
+    stands = load_stands(project.stands.all())
+    trees = load_trees(Tree.objects.filter(plot__stand__project_id=project))
+    per_area, basal_area = per_area_factors(trees, stands, designs, system,
+                                            stand_weights(stands))
+
+    table = {'project': project.id, 'area': float(stands['size'].sum()),
+             'stand_count': len(stands['id'])}
+    table.update(diameter_table(trees, per_area, basal_area,
+                                tree_yields(project, trees), system))
+    return table
@@ -0,0 +1,70 @@
+import numpy as np
+
+from core.models import Project
+
+
+COEFFICIENTS = ('cubic_a', 'cubic_b', 'board_a', 'board_b', 'biomass_b0',
+                'biomass_b1')
+YIELDS = ('cubic_volume', 'board_feet', 'biomass')
+VOLUME_UNIT = {
+    Project.ENG: 'cubic_foot',
+    Project.MET: 'cubic_meter'
+}
+BIOMASS_UNIT = {
+    Project.ENG: 'pound',
+    Project.MET: 'kilogram'
+}
+# Metric value of one unit of each measurement system
+DIAMETER_SCALE = {Project.ENG: 2.54, Project.MET: 1.0}
+HEIGHT_SCALE = {Project.ENG: 0.3048, Project.MET: 1.0}
+VOLUME_SCALE = {Project.ENG: 0.0283168, Project.MET: 1.0}
+BIOMASS_SCALE = {Project.ENG: 0.453592, Project.MET: 1.0}
+
+
+def convert(values, scale, source, target):
+    """Return values in the units of the target measurement system"""
+    if source == target:
+        return values
+
+    return values * (scale[source] / scale[target])
+
+
+def load_coefficients(equation_set):
+    """Return the species ids and coefficient rows of an equation set"""
+    rows = list(equation_set.equations.order_by('species_id')
+                .values_list('species_id', *COEFFICIENTS))
+    table = np.array(rows, dtype=float).reshape(-1, len(COEFFICIENTS) + 1)
+
+    return table[:, 0].astype(np.int64), table[:, 1:]
+
+
+def evaluate(equation_set, species, dbh, height, system):
+    """Return per tree cubic volume, board feet and biomass arrays
+
+    Inputs and outputs are in the units of the given measurement system.
+    Trees of species without an equation in the set yield zero.
+    """
+    ids, coefficients = load_coefficients(equation_set)
+    if not len(ids):
+        return {name: np.zeros(len(species)) for name in YIELDS}
+
+    position = np.minimum(np.searchsorted(ids, species), len(ids) - 1)
+    matched = ids[position] == species
+    cubic_a, cubic_b, board_a, board_b, b0, b1 = coefficients[position].T
+
+    units = equation_set.measurement_system
+    dbh = convert(dbh, DIAMETER_SCALE, system, units)
+    height = convert(height, HEIGHT_SCALE, system, units)
+    size = dbh ** 2 * height
+    cubic = np.maximum(cubic_a + cubic_b * size, 0)
+    board = np.maximum(board_a + board_b * size, 0)
+    with np.errstate(divide='ignore'):
+        biomass = np.where(dbh > 0, np.exp(b0 + b1 * np.log(dbh)), 0)
+
+    return {
+        'cubic_volume': np.where(matched, convert(
+            cubic, VOLUME_SCALE, units, system), 0),
+        'board_feet': np.where(matched, board, 0),
+        'biomass': np.where(matched, convert(
+            biomass, BIOMASS_SCALE, units, system), 0)
+    }
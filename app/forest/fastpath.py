@@ -0,0 +1,119 @@
+from django.core.exceptions import FieldDoesNotExist
+
+from rest_framework import relations, serializers
+
+
+class Unsupported(Exception):
+    """Raised for serializer fields the fast path cannot produce"""
+
+
+class FastListSerializer:
+    """Serialize value rows with the field mapping of a model serializer
+
+    Plain model fields and primary key relations read their column from
+    values_list() rows and go through the field's own to_representation,
+    so the output matches the serializer. Reverse relations rendered as
+    primary key lists are loaded with one query per page.
+    """
+
+    def __init__(self, serializer):
+        self.model = serializer.Meta.model
+        self.fields = [
+            self.compile_field(name, field)
+            for name, field in serializer.fields.items()
+            if not field.write_only
+        ]
+        self.columns = [attname for name, attname, convert, relation
+                        in self.fields if relation is None]
+
+    def compile_field(self, name, field):
+        """Return the name, column, converter and reverse relation"""
+        if isinstance(field, (serializers.BaseSerializer,
+                              serializers.SerializerMethodField)) or \
+                '.' in field.source or field.source == '*':
+            raise Unsupported(name)
+
+        try:
+            model_field = self.model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise Unsupported(name)
+
+        if isinstance(field, relations.ManyRelatedField):
+            if not model_field.one_to_many or not isinstance(
+                    field.child_relation, relations.PrimaryKeyRelatedField):
+                raise Unsupported(name)
+            return name, None, None, model_field
+
+        if not model_field.concrete or model_field.many_to_many:
+            raise Unsupported(name)
+        if isinstance(field, relations.PrimaryKeyRelatedField) and \
+                field.pk_field is None:
+            return name, model_field.attname, None, None
+        if isinstance(field, relations.RelatedField):
+            raise Unsupported(name)
+
+        return name, model_field.attname, field.to_representation, None
+
+    @classmethod
+    def compile(cls, serializer):
+        """Return a fast serializer, or None when a field is unsupported"""
+        try:
+            return cls(serializer)
+        except Unsupported:
+            return None
+
+    def get_queryset(self, queryset):
+        """Return named value rows with the serialized and ordering columns"""
+        opts = self.model._meta
+        columns = list(self.columns)
+        for item in list(queryset.query.order_by) + ['pk']:
+            name = item.lstrip('-')
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+            if field.attname not in columns:
+                columns.append(field.attname)
+
+        return queryset.prefetch_related(None).values_list(*columns,
+                                                           named=True)
+
+    def related_ids(self, relation, ids):
+        """Return the related primary keys of each parent"""
+        related = {pk: [] for pk in ids}
+        rows = relation.related_model._default_manager.filter(**{
+            relation.field.name + '__in': ids
+        }).values_list(relation.field.attname, 'pk')
+        for parent, pk in rows:
+            related[parent].append(pk)
+
+        return related
+
+    def to_representation(self, rows):
+        """Return the serialized rows"""
+        pk = self.model._meta.pk.attname
+        ids = [getattr(row, pk) for row in rows]
+        related = {
+            name: self.related_ids(relation, ids)
+            for name, attname, convert, relation in self.fields
+            if relation is not None
+        }
+
+        data = []
+        for row in rows:
+            item = {}
+            for name, attname, convert, relation in self.fields:
+                if relation is not None:
+                    item[name] = related[name][getattr(row, pk)]
+                    continue
+                value = getattr(row, attname)
+                item[name] = value if value is None or convert is None \
+                    else convert(value)
+            data.append(item)
+
+        return data
+
+    def to_columns(self, rows):
+        """Return the serialized rows as one array per field"""
+        data = self.to_representation(rows)
+        return {
+            name: [item[name] for item in data]
+            for name, attname, convert, relation in self.fields
+        }
@@ -0,0 +1,83 @@
+from rest_framework.exceptions import ParseError
+
+
+def join(path, name):
+    """Return the path of a nested relation"""
+    return path + '.' + name if path else name
+
+
+def ancestors(item):
+    """Yield a dotted path and every path above it"""
+    parts = item.split('.')
+    for index in range(1, len(parts) + 1):
+        yield '.'.join(parts[:index])
+
+
+class FieldPlan:
+    """Fields and nested relations a client asked for
+
+    fields selects fields per level with dotted paths such as
+    stands.plots.latitude, which also selects the relations above them.
+    expand lists the nested relations to serialize in full and depth
+    expands every relation up to that many levels; relations that are not
+    expanded are returned as primary keys. Without expand or depth every
+    relation is expanded.
+    """
+
+    def __init__(self, fields=None, expand=None, depth=None):
+        self.fields = {}
+        for item in fields or ():
+            parts = item.split('.')
+            for index, name in enumerate(parts):
+                self.fields.setdefault('.'.join(parts[:index]), set()) \
+                    .add(name)
+
+        self.expand = set()
+        for item in expand or ():
+            self.expand.update(ancestors(item))
+        if expand is not None or depth is not None:
+            for path in self.fields:
+                if path:
+                    self.expand.update(ancestors(path))
+
+        self.depth = depth
+        self.limited = expand is not None or depth is not None
+
+    @classmethod
+    def from_request(cls, request):
+        """Return the plan of a request, or None when it asks for none"""
+        params = request.query_params
+
+        def names(param):
+            if param not in params:
+                return None
+            return [name.strip() for name in params[param].split(',')
+                    if name.strip()]
+
+        depth = params.get('depth')
+        if depth is not None:
+            try:
+                depth = int(depth)
+            except ValueError:
+                depth = -1
+            if depth < 0:
+                raise ParseError('depth must be a non-negative integer.')
+
+        fields, expand = names('fields'), names('expand')
+        if fields is None and expand is None and depth is None:
+            return None
+
+        return cls(fields=fields, expand=expand, depth=depth)
+
+    def fields_for(self, path):
+        """Return the field names requested at a level, None for all"""
+        return self.fields.get(path)
+
+    def expands(self, path):
+        """Return whether a nested relation is serialized in full"""
+        if not self.limited or path in self.expand:
+            return True
+        if self.depth is not None:
+            return path.count('.') < self.depth
+
+        return False
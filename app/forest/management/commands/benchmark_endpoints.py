@@ -0,0 +1,48 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from forest.benchmark import REPEAT, parse_size, run
+
+
+SIZES = ['1x2x5x10', '1x5x10x20', '2x10x20x30']
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the forest and user endpoints"""
+    help = 'Benchmark every endpoint against generated datasets of ' \
+        'several sizes (projects x stands x plots x trees) and write JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', action='append', dest='sizes',
+                            help='Dataset size such as 1x10x10x20; repeat '
+                                 'for several sizes')
+        parser.add_argument('--repeat', type=int, default=REPEAT)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', default='benchmark.json')
+
+    def handle(self, *args, **options):
+        sizes = options['sizes'] or SIZES
+        try:
+            for size in sizes:
+                parse_size(size)
+        except ValueError as error:
+            raise CommandError(error)
+
+        report = run(sizes, repeat=options['repeat'], seed=options['seed'])
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+            output.write('\n')
+
+        for result in report['results']:
+            self.stdout.write(result['size'])
+            for name, stats in sorted(result['endpoints'].items()):
+                line = '  %-26s %4d  p50 %8.2fms  p99 %8.2fms  %3d queries' \
+                    % (name, stats['status'], stats['p50_ms'],
+                       stats['p99_ms'], stats['queries'])
+                if 'cold' in stats:
+                    line += '  cold p50 %8.2fms  %3d queries' % (
+                        stats['cold']['p50_ms'], stats['cold']['queries'])
+                self.stdout.write(line)
+        self.stdout.write(self.style.SUCCESS(
+            'Wrote %s' % options['output']))
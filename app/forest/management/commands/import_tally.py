@@ -0,0 +1,38 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from forest.tally import BATCH_SIZE, TallyImporter
+
+
+class Command(BaseCommand):
+    """Django command to import CSV tally sheets"""
+    help = 'Import trees from a CSV tally sheet ("-" reads standard input)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--project', type=int,
+                            help='Project of rows without a project column')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        importer = TallyImporter(project_id=options['project'],
+                                 batch_size=options['batch_size'])
+        try:
+            if options['path'] == '-':
+                report = importer.run(io.TextIOWrapper(
+                    sys.stdin.buffer, encoding='utf-8-sig', newline=''))
+            else:
+                with open(options['path'], encoding='utf-8-sig',
+                          newline='') as stream:
+                    report = importer.run(stream)
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+
+        for error in report['errors']:
+            self.stderr.write('line %(line)d: %(error)s' % error)
+        self.stdout.write(self.style.SUCCESS(
+            'Imported %(created)d of %(rows)d rows in %(seconds)ss '
+            '(%(rows_per_second)d rows/sec), %(error_count)d errors' % report
+        ))
@@ -0,0 +1,153 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from core.models import Project
+
+from forest import cache
+from forest.fastpath import FastListSerializer
+from forest.fieldsets import FieldPlan
+
+
+class ProjectVersionMixin:
+    """Answer conditional GETs from the version of the owning project
+
+    version_lookup relates projects to the objects of the viewset. Nested
+    list routes name the URL kwarg and lookup identifying their project.
+    Rendered bodies for the actions in cache_actions are kept in the forest
+    cache under the entity tag, so any write to the project subtree makes
+    its cached responses unreachable. No Last-Modified is sent, since its
+    one second resolution would answer 304 across writes in that second.
+    """
+    version_lookup = 'pk'
+    version_list_kwarg = None
+    version_list_lookup = 'pk'
+    cache_actions = ()
+
+    def get_version_filter(self):
+        """Return the project filter for the current request"""
+        if self.action == 'list':
+            if self.version_list_kwarg is None:
+                return None
+            return {self.version_list_lookup:
+                    self.kwargs[self.version_list_kwarg]}
+
+        return {self.version_lookup: self.kwargs[self.lookup_field]}
+
+    def get_project_version(self):
+        """Return the id and version of the project"""
+        version_filter = self.get_version_filter()
+        if version_filter is None:
+            return None
+
+        try:
+            versions = list(Project.objects.filter(**version_filter)
+                            .values_list('id', 'version')[:1])
+        except (TypeError, ValueError):
+            return None
+
+        return versions[0] if versions else None
+
+    def get_etag(self, request, project_id, version):
+        """Return the entity tag of the representation"""
+        key = '%s:%s:%s:%s' % (project_id, version,
+                               request.accepted_media_type,
+                               request.get_full_path())
+        return '"%s"' % hashlib.md5(key.encode('utf-8')).hexdigest()
+
+    def conditional(self, handler, request, *args, **kwargs):
+        """Return 304 for unchanged projects before running the handler"""
+        project_version = self.get_project_version()
+        if project_version is None:
+            return handler(request, *args, **kwargs)
+
+        project_id, version = project_version
+        etag = self.get_etag(request, project_id, version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = self.cached_handler(handler, etag, request, *args,
+                                           **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+
+        return response
+
+    def cached_handler(self, handler, etag, request, *args, **kwargs):
+        """Return the handler response, served from cache when possible"""
+        if self.action not in self.cache_actions or \
+                request.accepted_renderer.format not in cache.FORMATS:
+            return handler(request, *args, **kwargs)
+
+        key = cache.response_key(self.basename, etag)
+        response = cache.cached_response(key)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200:
+                cache.store_response(key, response, request,
+                                     self.get_renderer_context())
+
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+
+class FieldPlanMixin:
+    """Shape read responses with the fields, expand and depth parameters"""
+
+    def get_field_plan(self):
+        """Return the field plan of the request, if any"""
+        if not hasattr(self, '_field_plan'):
+            self._field_plan = None
+            if self.request.method in SAFE_METHODS:
+                self._field_plan = FieldPlan.from_request(self.request)
+
+        return self._field_plan
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['field_plan'] = self.get_field_plan()
+        return context
+
+    def setup_eager_loading(self, queryset):
+        """Load only the relations and columns the response needs"""
+        return self.get_serializer_class().setup_eager_loading(
+            queryset, self.get_field_plan())
+
+
+class FastListMixin:
+    """Serve list actions from value rows instead of model instances
+
+    Falls back to the regular list when the serializer has fields the
+    fast path cannot produce. With columnar_list, ?layout=columns returns
+    one array per field instead of one object per row.
+    """
+    fast_list = True
+    columnar_list = False
+
+    def list(self, request, *args, **kwargs):
+        fast = None
+        if self.fast_list:
+            fast = FastListSerializer.compile(self.get_serializer())
+        if fast is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = fast.get_queryset(
+            self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        if self.columnar_list and \
+                request.query_params.get('layout') == 'columns':
+            data = fast.to_columns(rows)
+        else:
+            data = fast.to_representation(rows)
+
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
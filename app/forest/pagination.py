@@ -0,0 +1,143 @@
+import json
+from base64 import b64decode, b64encode
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+Cursor = namedtuple('Cursor', ['reverse', 'position'])
+Key = namedtuple('Key', ['name', 'descending', 'attname', 'field'])
+
+
+class KeysetPagination(CursorPagination):
+    """Paginate over the queryset ordering with id as tiebreaker
+
+    The cursor carries the ordering values of the last row seen, so every
+    page is a range scan that seeks past that row instead of counting or
+    skipping the rows before it.
+    """
+    page_size = settings.FOREST_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.FOREST_MAX_PAGE_SIZE
+
+    def get_keys(self, queryset):
+        """Return the ordering keys of the queryset ending with id"""
+        opts = queryset.model._meta
+        keys = []
+        for item in queryset.query.order_by:
+            name = item.lstrip('-')
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+            keys.append(Key(name, item.startswith('-'), field.attname,
+                            field))
+            if field.primary_key:
+                return keys
+
+        descending = keys[0].descending if keys else False
+        keys.append(Key('id', descending, opts.pk.attname, opts.pk))
+        return keys
+
+    def get_ordering(self, reverse):
+        """Return order_by arguments for the keys"""
+        return [
+            ('-' if key.descending != reverse else '') + key.name
+            for key in self.keys
+        ]
+
+    def seek(self, position, reverse):
+        """Return the filter for rows after position in the key order"""
+        condition = Q()
+        for index, key in enumerate(self.keys):
+            lookup = 'lt' if key.descending != reverse else 'gt'
+            term = Q(**{'%s__%s' % (key.name, lookup): position[index]})
+            for previous, value in zip(self.keys[:index], position):
+                term &= Q(**{previous.name: value})
+            condition |= term
+
+        first = self.keys[0]
+        bound = 'lte' if first.descending != reverse else 'gte'
+        return Q(**{'%s__%s' % (first.name, bound): position[0]}) & condition
+
+    def get_position(self, row):
+        """Return the key values of a row"""
+        return [getattr(row, key.attname) for key in self.keys]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.keys = self.get_keys(queryset)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor.reverse
+
+        queryset = queryset.order_by(*self.get_ordering(reverse))
+        if self.cursor.position is not None:
+            queryset = queryset.filter(self.seek(self.cursor.position,
+                                                 reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        started = self.cursor.position is not None
+        self.has_next = started if reverse else has_more
+        self.has_previous = has_more if reverse else started
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+
+        return self.encode_cursor(
+            Cursor(False, self.get_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+
+        return self.encode_cursor(
+            Cursor(True, self.get_position(self.page[0])))
+
+    def decode_cursor(self, request):
+        """Return the cursor of the request with its values coerced"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return Cursor(False, None)
+
+        try:
+            tokens = json.loads(b64decode(encoded.encode('ascii')))
+            cursor = Cursor(bool(tokens['r']), list(tokens['p']))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if len(cursor.position) != len(self.keys):
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            position = [key.field.to_python(value)
+                        for key, value in zip(self.keys, cursor.position)]
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+
+        return Cursor(cursor.reverse, position)
+
+    def encode_cursor(self, cursor):
+        """Return the URL of the page after a cursor"""
+        tokens = {'r': int(cursor.reverse), 'p': cursor.position}
+        encoded = b64encode(json.dumps(
+            tokens, cls=DjangoJSONEncoder).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   encoded)
@@ -0,0 +1,39 @@
+import msgpack
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.settings import api_settings
+
+from forest import renderers
+from forest.renderers import cbor2
+
+
+class MessagePackParser(BaseParser):
+    """Parses MessagePack-serialized data"""
+    media_type = 'application/msgpack'
+    renderer_class = renderers.MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as exc:
+            raise ParseError('MessagePack parse error - %s' % exc)
+
+
+class CBORParser(BaseParser):
+    """Parses CBOR-serialized data"""
+    media_type = 'application/cbor'
+    renderer_class = renderers.CBORRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return cbor2.loads(stream.read())
+        except (ValueError, cbor2.CBORDecodeError) as exc:
+            raise ParseError('CBOR parse error - %s' % exc)
+
+
+BINARY_PARSER_CLASSES = [MessagePackParser]
+if cbor2 is not None:
+    BINARY_PARSER_CLASSES.append(CBORParser)
+
+PARSER_CLASSES = api_settings.DEFAULT_PARSER_CLASSES + BINARY_PARSER_CLASSES
@@ -0,0 +1,271 @@
+import logging
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core import jobs
+from core.models import Project, Projection, ProjectionResult, Tree, \
+    TreeReference
+
+from forest import cruise
+
+
+logger = logging.getLogger(__name__)
+
+
+# Growth is stepped yearly in metric units: cm, m and trees per hectare
+DIAMETER_SCALE = {Project.ENG: 2.54, Project.MET: 1.0}
+HEIGHT_SCALE = {Project.ENG: 0.3048, Project.MET: 1.0}
+AREA_SCALE = {Project.ENG: 2.47105, Project.MET: 1.0}
+BREAST_HEIGHT = 1.37
+# Peaked diameter growth in cm per year, slowed by crown and competition
+DIAMETER_GROWTH_MAX = 0.9
+DIAMETER_GROWTH_PEAK = 35.0
+BAL_COEFFICIENT = 0.012
+DENSITY_COEFFICIENT = 0.6
+# Height over diameter curve in meters
+HEIGHT_MAX = 48.0
+HEIGHT_RATE = 0.03
+HEIGHT_SHAPE = 1.2
+# Yearly background mortality, higher for small trees
+MORTALITY_BASE = 0.004
+MORTALITY_SMALL = 0.03
+MORTALITY_SMALL_SCALE = 8.0
+# Self thinning keeps the stand below this share of its maximum SDI
+THINNING_LIMIT = 0.85
+DEFAULT_MAX_DENSITY_INDEX = 450
+CROWN_RATE = 0.1
+MAX_PERIODS = 40
+MAX_PERIOD_LENGTH = 20
+
+
+def stand_max_density(species, basal_area, max_density):
+    """Return the maximum SDI per hectare of a stand
+
+    Species maxima (per acre, as stored on tree references) are weighted
+    by the basal area share of each species.
+    """
+    limits = np.array([max_density.get(s) or DEFAULT_MAX_DENSITY_INDEX
+                       for s in species.tolist()], dtype=float)
+    total = basal_area.sum()
+    weights = basal_area / total if total > 0 else \
+        np.full(len(limits), 1 / max(len(limits), 1))
+
+    return float((limits * weights).sum()) * AREA_SCALE[Project.ENG]
+
+
+def height_curve(dbh):
+    """Return the height of an average tree of the given diameters"""
+    return BREAST_HEIGHT + HEIGHT_MAX * \
+        (1 - np.exp(-HEIGHT_RATE * dbh)) ** HEIGHT_SHAPE
+
+
+def density_index(dbh, density):
+    """Return the summed Reineke SDI per hectare of a tree list"""
+    return float((density * (dbh / 25.4) ** cruise.SDI_EXPONENT).sum())
+
+
+def basal_area_larger(dbh, density):
+    """Return the basal area per hectare of trees larger than each tree"""
+    order = np.argsort(-dbh, kind='stable')
+    basal_area = np.pi / 40000 * dbh ** 2 * density
+    larger = np.empty_like(dbh)
+    larger[order] = np.cumsum(basal_area[order]) - basal_area[order]
+
+    return larger
+
+
+def self_thinning(dbh, density, limit):
+    """Return the density removed to keep SDI at or below the limit
+
+    Mortality falls on trees by their diameter rank, the smallest first.
+    """
+    size = (dbh / 25.4) ** cruise.SDI_EXPONENT
+    index = density * size
+    excess = float(index.sum()) - limit
+    if excess <= 0 or not len(dbh):
+        return np.zeros_like(density)
+
+    weight = np.empty_like(dbh)
+    weight[np.argsort(dbh, kind='stable')] = \
+        1 - np.arange(len(dbh)) / len(dbh)
+    low, high = 0.0, 1 / weight.min()
+    for _ in range(50):
+        share = (low + high) / 2
+        if (index * np.minimum(weight * share, 1)).sum() < excess:
+            low = share
+        else:
+            high = share
+
+    return density * np.minimum(weight * high, 1)
+
+
+def grow(state, limit):
+    """Advance a tree list one year in place and return its mortality"""
+    dbh, height, crown, density = (state['dbh'], state['height'],
+                                   state['crown'], state['density'])
+    relative_density = min(density_index(dbh, density) / limit, 1)
+    growth = DIAMETER_GROWTH_MAX * dbh / DIAMETER_GROWTH_PEAK * \
+        np.exp(1 - dbh / DIAMETER_GROWTH_PEAK)
+    growth *= np.sqrt(np.clip(crown / 100, 0.05, 1))
+    growth *= np.exp(-BAL_COEFFICIENT * basal_area_larger(dbh, density))
+    growth *= 1 - DENSITY_COEFFICIENT * relative_density
+
+    ratio = (height - BREAST_HEIGHT) / (height_curve(dbh) - BREAST_HEIGHT)
+    new_dbh = dbh + np.maximum(growth, 0)
+    new_height = BREAST_HEIGHT + np.clip(ratio, 0.2, 2) * \
+        (height_curve(new_dbh) - BREAST_HEIGHT)
+    state['height'] = np.maximum(height, new_height)
+    state['dbh'] = new_dbh
+
+    target = np.clip(90 - 60 * relative_density, 15, 90)
+    state['crown'] = crown + CROWN_RATE * (target - crown)
+
+    rate = MORTALITY_BASE + MORTALITY_SMALL * \
+        np.exp(-new_dbh / MORTALITY_SMALL_SCALE)
+    killed = density * rate
+    killed += self_thinning(new_dbh, density - killed, limit * THINNING_LIMIT)
+    state['density'] = density - killed
+
+    return float(killed.sum())
+
+
+def period_statistics(state, system):
+    """Return per area statistics of a tree list in project units"""
+    dbh = state['dbh'] / DIAMETER_SCALE[system]
+    density = state['density'] / AREA_SCALE[system]
+    trees = density.sum()
+    statistics = cruise.stand_statistics(
+        trees, (cruise.tree_basal_area(dbh, system) * density).sum(),
+        (dbh ** 2 * density).sum(), system)
+    mean_height = (state['height'] * density).sum() / trees if trees else 0
+
+    result = {key: float(value) for key, value in statistics.items()}
+    result['mean_height'] = float(mean_height / HEIGHT_SCALE[system])
+    return result
+
+
+def project_stand(inputs, periods, period_length, system):
+    """Return the statistics of a stand at the start and end of each period
+
+    inputs holds the stand's tree arrays in project units along with the
+    trees per area each record represents and the stand's maximum SDI.
+    """
+    state = {
+        'dbh': inputs['dbh'] * DIAMETER_SCALE[system],
+        'height': np.maximum(inputs['height'] * HEIGHT_SCALE[system],
+                             BREAST_HEIGHT + 0.1),
+        'crown': inputs['crown'].astype(float),
+        'density': inputs['per_area'] * AREA_SCALE[system]
+    }
+    limit = inputs['max_density']
+
+    rows = []
+    for period in range(periods + 1):
+        mortality = 0.0
+        if period:
+            for year in range(period_length):
+                mortality += grow(state, limit)
+        row = period_statistics(state, system)
+        row.update({'period': period, 'year': period * period_length,
+                    'mortality': mortality / AREA_SCALE[system]})
+        rows.append(row)
+
+    return rows
+
+
+def stand_inputs(project):
+    """Return the projection inputs of each stand of a project by id"""
+    system = project.measurement_system
+    designs = list(project.sample_design.order_by('id'))
+    stands = cruise.load_stands(project.stands.all())
+    columns = cruise.load_trees(
+        Tree.objects.filter(plot__stand__project_id=project),
+        'live_crown_ratio')
+    per_area, basal_area = cruise.per_area_factors(columns, stands, designs,
+                                                   system)
+    max_density = dict(TreeReference.objects.filter(
+        id__in=np.unique(columns['species']).tolist()
+    ).values_list('id', 'max_density_index'))
+
+    inputs = {}
+    for stand_id in stands['id'].tolist():
+        selected = columns['stand'] == stand_id
+        inputs[stand_id] = {
+            'dbh': columns['dbh'][selected],
+            'height': columns['height'][selected],
+            'crown': columns['live_crown_ratio'][selected],
+            'per_area': per_area[selected],
+            'max_density': stand_max_density(
+                columns['species'][selected],
+                (basal_area * per_area)[selected], max_density)
+        }
+
+    return inputs
+
+
+def run(projection, report=None):
+    """Project every stand of a projection's project and store results
+
+    report, when given, is called with the share of stands projected.
+    """
+    Projection.objects.filter(pk=projection.pk).update(
+        status=Projection.RUNNING, started=timezone.now())
+    try:
+        project = projection.project
+        inputs = stand_inputs(project)
+        arguments = (projection.periods, projection.period_length,
+                     project.measurement_system)
+        workers = min(settings.PROJECTION_WORKERS, len(inputs))
+        results = {}
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(project_stand, values, *arguments): stand_id
+                    for stand_id, values in inputs.items()
+                }
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+                    if report:
+                        report(len(results) / len(inputs))
+        else:
+            for stand_id, values in inputs.items():
+                results[stand_id] = project_stand(values, *arguments)
+                if report:
+                    report(len(results) / len(inputs))
+
+        with transaction.atomic():
+            ProjectionResult.objects.filter(projection=projection).delete()
+            ProjectionResult.objects.bulk_create([
+                ProjectionResult(projection=projection, stand_id=stand_id,
+                                 **row)
+                for stand_id in sorted(results) for row in results[stand_id]
+            ])
+            Projection.objects.filter(pk=projection.pk).update(
+                status=Projection.DONE, finished=timezone.now())
+    except Exception as error:
+        logger.exception('Projection %s failed', projection.pk)
+        Projection.objects.filter(pk=projection.pk).update(
+            status=Projection.FAILED, finished=timezone.now(),
+            error=jobs.describe(error))
+        raise
+
+
+def run_job(job, projection):
+    """Job handler running the projection with the given id"""
+    run(Projection.objects.select_related('project').get(pk=projection),
+        report=lambda share: jobs.report(job, share, 'Projecting stands'))
+
+    return {'projection': projection}
+
+
+def start(projection, user=None):
+    """Queue a projection to be run by a job worker followed by user"""
+    projection.job = jobs.enqueue('projection', {'projection': projection.pk},
+                                  user=user)
+    projection.save(update_fields=['job'])
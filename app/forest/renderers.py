@@ -0,0 +1,58 @@
+import msgpack
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+class StreamingJSONRenderer(JSONRenderer):
+    """Renderer selecting incremental JSON output for large responses"""
+    media_type = 'application/stream+json'
+    format = 'stream'
+
+
+def encode_default(obj):
+    """Encode values binary formats lack natively as JSON would"""
+    return JSONEncoder().default(obj)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renderer which serializes to MessagePack"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return msgpack.packb(data, default=encode_default, use_bin_type=True)
+
+
+class CBORRenderer(BaseRenderer):
+    """Renderer which serializes to CBOR"""
+    media_type = 'application/cbor'
+    format = 'cbor'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return cbor2.dumps(data, default=lambda encoder, value:
+                           encoder.encode(encode_default(value)))
+
+
+BINARY_RENDERER_CLASSES = [MessagePackRenderer]
+if cbor2 is not None:
+    BINARY_RENDERER_CLASSES.append(CBORRenderer)
+
+RENDERER_CLASSES = api_settings.DEFAULT_RENDERER_CLASSES + \
+    BINARY_RENDERER_CLASSES
@@ -1,15 +1,144 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+
 from rest_framework import serializers
 
 from core.models import Project, Stand, Plot, Tree, TreeReference, \
-    SampleDesign
+    SampleDesign, Projection, ProjectionResult
+
+from forest import projection
+from forest.fieldsets import join
+
+
+class EagerLoadingMixin:
+    """Build a prefetch plan from a serializer and its nested serializers
+
+    A FieldPlan in the serializer context trims the fields and collapses
+    nested relations to primary keys; the same plan limits the prefetches
+    and the columns loaded. The last part of each prefetch lookup names
+    the field it serves.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        plan = self.context.get('field_plan')
+        if plan is not None:
+            self.apply_field_plan(plan, self.context.get('field_path', ''))
+
+    def apply_field_plan(self, plan, path):
+        """Drop unrequested fields and collapse unexpanded relations"""
+        requested = plan.fields_for(path)
+        if requested is not None:
+            unknown = requested - set(self.fields)
+            if unknown:
+                raise serializers.ValidationError({'fields': [
+                    'Unknown field "%s".' % join(path, name)
+                    for name in sorted(unknown)
+                ]})
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+        for name in self.get_nested_serializers():
+            if name in self.fields and not plan.expands(join(path, name)):
+                self.fields[name] = serializers.PrimaryKeyRelatedField(
+                    many=True, read_only=True)
+
+    def nested_context(self, name):
+        """Return the context of the serializer nested under a field"""
+        return dict(self.context,
+                    field_path=join(self.context.get('field_path', ''), name))
+
+    @classmethod
+    def get_nested_serializers(cls):
+        """Return a mapping of related name to nested serializer class"""
+        return {}
+
+    @classmethod
+    def get_only_fields(cls, requested, *required):
+        """Return the model fields to load for the requested fields"""
+        model = cls.Meta.model
+        names = set(required) | set(cls.select_related_fields)
+        names.add(model._meta.pk.name)
+        for name in cls.Meta.fields if requested is None else requested:
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.concrete and not field.many_to_many:
+                names.add(name)
+
+        return sorted(names)
+
+    @classmethod
+    def get_prefetch_lookups(cls, prefix='', plan=None, path=''):
+        """Return the prefetch lookups needed to serialize the object tree"""
+        if plan is not None:
+            return list(cls.get_planned_prefetches(prefix, plan, path)
+                        .values())
+
+        lookups = [prefix + field for field in cls.prefetch_related_fields]
+        for name, serializer in cls.get_nested_serializers().items():
+            lookup = prefix + name
+            lookups.append(lookup)
+            lookups.extend(serializer.get_prefetch_lookups(lookup + '__'))
+
+        return list(dict.fromkeys(lookups))
+
+    @classmethod
+    def get_planned_prefetches(cls, prefix, plan, path):
+        """Return prefetches by lookup for the fields a plan requests"""
+        requested = plan.fields_for(path)
+        nested = cls.get_nested_serializers()
+        prefetches = {}
+        for lookup in cls.prefetch_related_fields:
+            name = lookup.split('__')[-1]
+            if requested is None or name in requested:
+                prefetches[prefix + lookup] = prefix + lookup
+
+        for name, serializer in nested.items():
+            if requested is not None and name not in requested:
+                continue
+            lookup = prefix + name
+            relation = cls.Meta.model._meta.get_field(name)
+            parent = relation.field.name
+            if not plan.expands(join(path, name)):
+                queryset = serializer.Meta.model.objects.only('pk', parent)
+                prefetches[lookup] = Prefetch(lookup, queryset=queryset)
+                continue
+
+            columns = serializer.get_only_fields(
+                plan.fields_for(join(path, name)), parent)
+            prefetches[lookup] = Prefetch(
+                lookup, queryset=serializer.Meta.model.objects.only(*columns))
+            prefetches.update(serializer.get_planned_prefetches(
+                lookup + '__', plan, join(path, name)))
+
+        return prefetches
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, plan=None):
+        """Apply the prefetch plan to a queryset"""
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if plan is not None and plan.fields_for('') is not None:
+            ordering = [item.lstrip('-') for item in queryset.query.order_by]
+            queryset = queryset.only(*cls.get_only_fields(
+                plan.fields_for(''), *ordering))
+
+        return queryset.prefetch_related(
+            *cls.get_prefetch_lookups(plan=plan))
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """Serializer for project objects"""
+    prefetch_related_fields = ('stands', 'sample_design')
+
     class Meta:
         model = Project
-        fields = ('id', 'name', 'land_owner',
-                  'date', 'measurement_system', 'stands', 'sample_design')
+        fields = ('id', 'name', 'land_owner', 'date', 'measurement_system',
+                  'equation_set', 'stands', 'sample_design')
         read_only_fields = ('id', 'stands', 'sample_design',)
 
 
@@ -18,16 +147,24 @@ class ProjectDetailSerializer(ProjectSerializer):
     stands = serializers.SerializerMethodField()
     sample_design = serializers.SerializerMethodField()
 
+    @classmethod
+    def get_nested_serializers(cls):
+        return {'stands': StandDetailSerializer}
+
     def get_stands(self, obj):
         queryset = obj.stands.all()
-        return StandDetailSerializer(queryset, many=True, read_only=True).data
+        return StandDetailSerializer(
+            queryset, many=True, read_only=True,
+            context=self.nested_context('stands')).data
 
     def get_sample_design(self, obj):
         queryset = obj.sample_design.all()
-        return SampleDesignSerializer(queryset, many=True, read_only=True).data
+        return SampleDesignSerializer(
+            queryset, many=True, read_only=True,
+            context=self.nested_context('sample_design')).data
 
 
-class SampleDesignSerializer(serializers.ModelSerializer):
+class SampleDesignSerializer(EagerLoadingMixin, serializers.ModelSerializer):
 
     class Meta:
         model = SampleDesign
@@ -36,8 +173,9 @@ class SampleDesignSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class StandSerializer(serializers.ModelSerializer):
+class StandSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """Serializer for stand objects"""
+    prefetch_related_fields = ('plots',)
 
     class Meta:
         model = Stand
@@ -50,13 +188,39 @@ class StandDetailSerializer(StandSerializer):
     """Serializer for stand detail objects"""
     plots = serializers.SerializerMethodField()
 
+    @classmethod
+    def get_nested_serializers(cls):
+        return {'plots': PlotDetailSerializer}
+
     def get_plots(self, obj):
         queryset = obj.plots.all()
-        return PlotDetailSerializer(queryset, many=True, read_only=True).data
+        return PlotDetailSerializer(
+            queryset, many=True, read_only=True,
+            context=self.nested_context('plots')).data
+
+
+class StandSampleDesignSerializer(StandSerializer):
+    """Serializer for stand objects with their project's sample design"""
+    select_related_fields = ('project_id',)
+    prefetch_related_fields = ('plots', 'project_id__sample_design')
+    sample_design = serializers.SerializerMethodField()
+    measurement_system = serializers.CharField(
+        source='project_id.measurement_system', read_only=True)
 
+    class Meta(StandSerializer.Meta):
+        fields = StandSerializer.Meta.fields + ('sample_design',
+                                                'measurement_system')
 
-class PlotSerializer(serializers.ModelSerializer):
+    def get_sample_design(self, obj):
+        queryset = obj.project_id.sample_design.all()
+        return SampleDesignSerializer(
+            queryset, many=True, read_only=True,
+            context=self.nested_context('sample_design')).data
+
+
+class PlotSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """Serializer for plot objects"""
+    prefetch_related_fields = ('trees',)
 
     class Meta:
         model = Plot
@@ -69,12 +233,19 @@ class PlotDetailSerializer(PlotSerializer):
     """Serializer for plot detail objects"""
     trees = serializers.SerializerMethodField()
 
+    @classmethod
+    def get_nested_serializers(cls):
+        return {'trees': TreeSerializer}
+
     def get_trees(self, obj):
         queryset = obj.trees.all()
-        return TreeSerializer(queryset, many=True, read_only=True).data
+        return TreeSerializer(
+            queryset, many=True, read_only=True,
+            context=self.nested_context('trees')).data
 
 
-class TreeReferenceSerializer(serializers.ModelSerializer):
+class TreeReferenceSerializer(EagerLoadingMixin,
+                              serializers.ModelSerializer):
     """Serializer for tree reference objects"""
 
     class Meta:
@@ -84,7 +255,7 @@ class TreeReferenceSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class TreeSerializer(serializers.ModelSerializer):
+class TreeSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     """Serializer for tree object"""
 
     class Meta:
@@ -92,3 +263,36 @@ class TreeSerializer(serializers.ModelSerializer):
         fields = ('id', 'plot', 'symbol', 'count',
                   'dbh', 'height', 'live_crown_ratio')
         read_only_fields = ('id',)
+
+
+class ProjectionResultSerializer(serializers.ModelSerializer):
+    """Serializer for projected stand statistics"""
+
+    class Meta:
+        model = ProjectionResult
+        fields = ('stand', 'period', 'year', 'trees_per_area', 'basal_area',
+                  'qmd', 'sdi', 'mean_height', 'mortality')
+        read_only_fields = fields
+
+
+class ProjectionSerializer(serializers.ModelSerializer):
+    """Serializer for growth projection runs"""
+    periods = serializers.IntegerField(
+        min_value=1, max_value=projection.MAX_PERIODS, default=10)
+    period_length = serializers.IntegerField(
+        min_value=1, max_value=projection.MAX_PERIOD_LENGTH, default=5)
+
+    class Meta:
+        model = Projection
+        fields = ('id', 'project', 'periods', 'period_length', 'status',
+                  'error', 'created', 'started', 'finished', 'job')
+        read_only_fields = ('id', 'project', 'status', 'error', 'created',
+                            'started', 'finished', 'job')
+
+
+class ProjectionDetailSerializer(ProjectionSerializer):
+    """Serializer for growth projection runs with their results"""
+    results = ProjectionResultSerializer(many=True, read_only=True)
+
+    class Meta(ProjectionSerializer.Meta):
+        fields = ProjectionSerializer.Meta.fields + ('results',)
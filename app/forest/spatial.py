@@ -0,0 +1,115 @@
+import math
+
+from django.db.models import F, Q
+from django.db.models.functions import Least
+
+from rest_framework.exceptions import ValidationError
+
+from core import geohash
+
+
+METERS_PER_DEGREE = 111320.0
+
+
+def parse_numbers(params, name, count):
+    """Return a comma separated list of numbers from the query string"""
+    try:
+        numbers = [float(n) for n in params[name].split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(map(math.isfinite, numbers)):
+        raise ValidationError({name: [
+            'Expected %d comma separated numbers.' % count]})
+
+    return numbers
+
+
+def parse_bbox(params):
+    """Return south, west, north and east of the bbox parameter
+
+    The box is given as west,south,east,north in degrees; a west edge
+    east of the east edge crosses the antimeridian.
+    """
+    west, south, east, north = parse_numbers(params, 'bbox', 4)
+    if not (-90 <= south <= north <= 90 and
+            -180 <= west <= 180 and -180 <= east <= 180):
+        raise ValidationError({'bbox': ['Invalid bounding box.']})
+
+    return south, west, north, east
+
+
+def parse_near(params):
+    """Return latitude, longitude and radius in meters of a near query"""
+    latitude, longitude = parse_numbers(params, 'near', 2)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValidationError({'near': ['Invalid point.']})
+    if 'radius' not in params:
+        raise ValidationError({'radius': ['This parameter is required.']})
+    radius, = parse_numbers(params, 'radius', 1)
+    if radius <= 0:
+        raise ValidationError({'radius': ['Must be positive.']})
+
+    return latitude, longitude, radius
+
+
+def in_box(south, west, north, east):
+    """Return a filter for the plots inside a bounding box
+
+    Cell ranges select candidates through the geocell index and the
+    coordinate bounds drop the candidates outside the box.
+    """
+    boxes = [(west, east)] if west <= east else [(west, 180), (-180, east)]
+    condition = Q()
+    for low, high in boxes:
+        cells = Q()
+        for start, stop in geohash.cover(south, low, north, high):
+            cells |= Q(geocell__gte=start, geocell__lt=stop)
+        condition |= cells & Q(longitude__gte=low, longitude__lte=high)
+
+    return condition & Q(latitude__gte=south, latitude__lte=north)
+
+
+def filter_bbox(queryset, south, west, north, east):
+    """Return the plots inside a bounding box"""
+    return queryset.filter(in_box(south, west, north, east))
+
+
+def filter_near(queryset, latitude, longitude, radius):
+    """Return the plots within a radius in meters of a point
+
+    Distances use the equirectangular approximation around the point,
+    which is accurate to well under a percent for radii of up to a few
+    hundred kilometers away from the poles.
+    """
+    scale = math.cos(math.radians(latitude))
+    degrees = radius / METERS_PER_DEGREE
+    south = max(latitude - degrees, -90)
+    north = min(latitude + degrees, 90)
+    if scale * 180 <= degrees or north == 90 or south == -90:
+        west, east = -180, 180
+    else:
+        west = longitude - degrees / scale
+        east = longitude + degrees / scale
+        west += 360 if west < -180 else 0
+        east -= 360 if east > 180 else 0
+
+    queryset = filter_bbox(queryset, south, west, north, east)
+    offsets = [F('longitude') - longitude]
+    if west > east:
+        offsets += [offsets[0] + 360, offsets[0] - 360]
+    across = [offset * offset for offset in offsets]
+    across = Least(*across) if len(across) > 1 else across[0]
+    along = (F('latitude') - latitude) * (F('latitude') - latitude)
+    return queryset.annotate(
+        near_distance=across * scale * scale + along
+    ).filter(near_distance__lte=degrees * degrees)
+
+
+def filter_queryset(queryset, params):
+    """Apply the bbox and near parameters of a request to plots"""
+    if 'bbox' in params:
+        queryset = filter_bbox(queryset, *parse_bbox(params))
+    if 'near' in params:
+        queryset = filter_near(queryset, *parse_near(params))
+
+    return queryset
@@ -0,0 +1,135 @@
+from django.http import StreamingHttpResponse
+
+from core.models import Plot, Tree
+
+from forest import serializers
+from forest.renderers import StreamingJSONRenderer
+
+
+CHUNK_SIZE = 2000
+BUFFER_SIZE = 64 * 1024
+
+
+def is_streaming(request):
+    """Return whether the client negotiated a streaming response"""
+    renderer = getattr(request, 'accepted_renderer', None)
+    return isinstance(renderer, StreamingJSONRenderer)
+
+
+def flat_serializer(serializer_class, *nested):
+    """Return a serializer for the fields not nested under the object"""
+    fields = tuple(f for f in serializer_class.Meta.fields if f not in nested)
+    meta = type('Meta', (serializer_class.Meta,), {'fields': fields})
+    return type(serializer_class.__name__, (serializer_class,),
+                {'Meta': meta})()
+
+
+class ChildRows:
+    """Walk rows ordered by parent id alongside their ordered parents"""
+
+    def __init__(self, rows, parent_field):
+        self.rows = iter(rows)
+        self.parent_field = parent_field
+        self.current = next(self.rows, None)
+
+    def take(self, parent_id):
+        """Yield the rows belonging to the given parent"""
+        while (self.current is not None and
+               getattr(self.current, self.parent_field) == parent_id):
+            yield self.current
+            self.current = next(self.rows, None)
+
+
+def buffered(pieces, size=BUFFER_SIZE):
+    """Join small rendered pieces into larger chunks"""
+    buffer, length = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+
+    if buffer:
+        yield b''.join(buffer)
+
+
+def open_object(renderer, data, key):
+    """Render an object up to the opening bracket of its nested list"""
+    head = renderer.render(data)[:-1]
+    if data:
+        head += b','
+
+    return head + renderer.render(key) + b':['
+
+
+def project_pieces(project, renderer):
+    """Yield the project detail representation piece by piece"""
+    project_serializer = flat_serializer(serializers.ProjectSerializer,
+                                         'stands', 'sample_design')
+    stand_serializer = flat_serializer(serializers.StandSerializer, 'plots')
+    plot_serializer = flat_serializer(serializers.PlotSerializer, 'trees')
+    tree_serializer = serializers.TreeSerializer()
+
+    stands = project.stands.order_by('id').iterator(chunk_size=CHUNK_SIZE)
+    plots = ChildRows(
+        Plot.objects.filter(stand__project_id=project)
+        .order_by('stand_id', 'id')
+        .iterator(chunk_size=CHUNK_SIZE),
+        'stand_id'
+    )
+    trees = ChildRows(
+        Tree.objects.filter(plot__stand__project_id=project)
+        .order_by('plot__stand_id', 'plot_id', 'id')
+        .iterator(chunk_size=CHUNK_SIZE),
+        'plot_id'
+    )
+
+    yield open_object(renderer, project_serializer.to_representation(project),
+                      'stands')
+    for stand_index, stand in enumerate(stands):
+        if stand_index:
+            yield b','
+        yield open_object(renderer, stand_serializer.to_representation(stand),
+                          'plots')
+        for plot_index, plot in enumerate(plots.take(stand.id)):
+            if plot_index:
+                yield b','
+            yield open_object(renderer,
+                              plot_serializer.to_representation(plot),
+                              'trees')
+            for tree_index, tree in enumerate(trees.take(plot.id)):
+                if tree_index:
+                    yield b','
+                yield renderer.render(tree_serializer.to_representation(tree))
+            yield b']}'
+        yield b']}'
+
+    sample_design = serializers.SampleDesignSerializer(
+        project.sample_design.all(), many=True).data
+    yield b'],' + renderer.render('sample_design') + b':'
+    yield renderer.render(sample_design) + b'}'
+
+
+def list_pieces(queryset, serializer, renderer):
+    """Yield a list representation piece by piece"""
+    yield b'['
+    for index, obj in enumerate(queryset.iterator(chunk_size=CHUNK_SIZE)):
+        if index:
+            yield b','
+        yield renderer.render(serializer.to_representation(obj))
+    yield b']'
+
+
+def stream_project(project, renderer):
+    """Return a streaming response for project detail"""
+    return StreamingHttpResponse(buffered(project_pieces(project, renderer)),
+                                 content_type='application/json')
+
+
+def stream_list(queryset, serializer, renderer):
+    """Return a streaming response for a list of objects"""
+    return StreamingHttpResponse(
+        buffered(list_pieces(queryset, serializer, renderer)),
+        content_type='application/json'
+    )
@@ -0,0 +1,116 @@
+import base64
+import binascii
+
+from django.db import connection
+
+from core.models import Plot, Project, SampleDesign, Stand, Tombstone, \
+    Tree
+
+from forest import serializers
+from forest.fastpath import FastListSerializer
+from forest.streaming import flat_serializer
+
+
+def current_cursor():
+    """Return the change id every later commit is stamped at or above
+
+    Rows carry the id of the transaction that last wrote them. The oldest
+    transaction still running bounds the ids of everything yet to commit,
+    however long it runs, so rows seen before are replayed at worst and
+    clients apply changes as upserts.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT txid_snapshot_xmin(txid_current_snapshot())')
+        return cursor.fetchone()[0]
+
+
+def encode_cursor(change_id):
+    """Return the opaque sync cursor for a change id"""
+    return base64.urlsafe_b64encode(
+        str(change_id).encode('ascii')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Return the change id of a sync cursor"""
+    try:
+        change_id = int(base64.urlsafe_b64decode(
+            cursor.encode('ascii')).decode('ascii'))
+    except (binascii.Error, UnicodeError, ValueError):
+        change_id = None
+    if change_id is None or change_id < 0:
+        raise ValueError('Invalid cursor.')
+
+    return change_id
+
+
+def sections():
+    """Return the name, model and flat serializer of each level"""
+    return (
+        ('sample_designs', SampleDesign,
+         serializers.SampleDesignSerializer()),
+        ('stands', Stand,
+         flat_serializer(serializers.StandSerializer, 'plots')),
+        ('plots', Plot,
+         flat_serializer(serializers.PlotSerializer, 'trees')),
+        ('trees', Tree, serializers.TreeSerializer()),
+    )
+
+
+def changed_rows(queryset, serializer):
+    """Return the serialized objects of a queryset"""
+    fast = FastListSerializer.compile(serializer)
+    if fast is None:
+        return [serializer.to_representation(obj) for obj in queryset]
+
+    return fast.to_representation(list(fast.get_queryset(queryset)))
+
+
+def deleted_ids(project, since):
+    """Return the ids of objects gone from the project, by model name"""
+    gone = {}
+    for model, object_id in Tombstone.objects.filter(
+            project_id=project.pk, change_id__gte=since
+    ).values_list('model', 'object_id'):
+        gone.setdefault(model, set()).add(object_id)
+
+    return gone
+
+
+def project_changes(project, since=None):
+    """Return the objects of a project inserted, updated or deleted since a
+    cursor, or all of them without one
+
+    A deleted stand or plot implies the deletion of everything below it,
+    so its children are not listed. Objects moved to another project are
+    reported as deleted here and as updated in their new project.
+    """
+    cursor = current_cursor()
+    project_serializer = flat_serializer(serializers.ProjectSerializer,
+                                         'stands', 'sample_design')
+    changes = {
+        'cursor': encode_cursor(cursor),
+        'project': None,
+        'deleted': {}
+    }
+    # Every row, the project included, is read after the cursor is taken
+    projects = Project.objects.filter(pk=project.pk)
+    if since is not None:
+        projects = projects.filter(change_id__gte=since)
+    for row in projects:
+        changes['project'] = project_serializer.to_representation(row)
+
+    gone = {} if since is None else deleted_ids(project, since)
+    for name, model, serializer in sections():
+        lookup = {model.project_lookup: project.pk}
+        queryset = model.objects.filter(**lookup).order_by('id')
+        if since is not None:
+            queryset = queryset.filter(change_id__gte=since)
+        changes[name] = changed_rows(queryset, serializer)
+
+        ids = gone.get(model._meta.model_name, set())
+        if ids:
+            ids -= set(model.objects.filter(id__in=ids, **lookup)
+                       .values_list('id', flat=True))
+        changes['deleted'][name] = sorted(ids)
+
+    return changes
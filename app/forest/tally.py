@@ -0,0 +1,142 @@
+import csv
+import time
+
+from django.db import transaction
+
+from core import aggregates
+from core.models import Plot, Project, TreeReference
+
+from forest import copy
+
+
+BATCH_SIZE = 10000
+MAX_REPORTED_ERRORS = 100
+REQUIRED_COLUMNS = ('plot', 'symbol', 'count', 'dbh', 'height',
+                    'live_crown_ratio')
+
+
+class TallyImporter:
+    """Load the tree rows of CSV tally sheets into the tree table
+
+    Each row names a tree's project, stand and plot number along with its
+    species symbol and measurements. Species and plots are resolved from
+    in memory maps; rows are written with COPY on PostgreSQL and with
+    batched bulk_create elsewhere.
+    """
+
+    def __init__(self, project_id=None, batch_size=BATCH_SIZE):
+        self.project_id = project_id
+        self.batch_size = batch_size
+        self.symbols = self.load_symbols()
+        self.plots = {}
+        self.deltas = aggregates.empty_deltas()
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    @staticmethod
+    def load_symbols():
+        """Return tree reference ids keyed by id and by unique symbol"""
+        symbols = {}
+        for pk, symbol in TreeReference.objects.values_list('id', 'symbol'):
+            symbols[str(pk)] = pk
+            symbols[symbol] = None if symbol in symbols else pk
+
+        return symbols
+
+    def project_plots(self, project_id):
+        """Return the project's plots as number to (id, stand) mapping"""
+        if project_id not in self.plots:
+            self.plots[project_id] = {
+                number: (pk, stand)
+                for number, pk, stand in Plot.objects.filter(
+                    stand__project_id=project_id
+                ).values_list('number', 'id', 'stand__identification')
+            }
+
+        return self.plots[project_id]
+
+    def parse(self, record):
+        """Return the tree table values of a tally sheet record"""
+        missing = [name for name in REQUIRED_COLUMNS
+                   if record.get(name) is None]
+        if missing:
+            raise ValueError('missing values for %s' % ', '.join(missing))
+
+        try:
+            project_id = int((record.get('project') or '').strip() or
+                             self.project_id)
+        except (TypeError, ValueError):
+            raise ValueError('invalid project "%s"' % record.get('project'))
+        if self.project_id is not None and project_id != self.project_id:
+            raise ValueError('project %s is not being imported' % project_id)
+
+        try:
+            plot_number = int(record['plot'])
+            plot_id, stand = self.project_plots(project_id)[plot_number]
+        except (KeyError, ValueError):
+            raise ValueError('unknown plot "%s"' % record['plot'])
+        if (record.get('stand') or '').strip() and \
+                record['stand'].strip() != str(stand):
+            raise ValueError('plot %s is not in stand %s' % (
+                plot_number, record['stand']))
+
+        symbol_id = self.symbols.get(record['symbol'].strip())
+        if symbol_id is None:
+            raise ValueError('unknown or ambiguous symbol "%s"' %
+                             record['symbol'])
+
+        try:
+            return (plot_id, symbol_id, int(record['count']),
+                    float(record['dbh']), float(record['height']),
+                    int(record['live_crown_ratio']))
+        except ValueError as error:
+            raise ValueError('invalid measurement: %s' % error)
+
+    def add_error(self, line, message):
+        """Record an invalid row"""
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def load(self, rows):
+        """Write a batch of parsed rows to the tree table"""
+        copy.write_trees(rows, deltas=self.deltas)
+        self.created += len(rows)
+
+    def run(self, stream):
+        """Import a CSV text stream and return a report of the import"""
+        start = time.time()
+        reader = csv.DictReader(stream)
+        missing = set(REQUIRED_COLUMNS).difference(reader.fieldnames or ())
+        if missing:
+            raise ValueError('Missing columns: %s' % ', '.join(
+                sorted(missing)))
+
+        with transaction.atomic():
+            batch = []
+            for record in reader:
+                self.rows += 1
+                try:
+                    batch.append(self.parse(record))
+                except ValueError as error:
+                    self.add_error(reader.line_num, str(error))
+                if len(batch) >= self.batch_size:
+                    self.load(batch)
+                    batch = []
+            if batch:
+                self.load(batch)
+            aggregates.apply(self.deltas)
+            if self.created:
+                Project.objects.filter(id__in=self.plots).touch()
+
+        seconds = time.time() - start
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.rows / seconds) if seconds else 0
+        }
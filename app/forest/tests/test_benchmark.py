@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Tree
+
+from forest.benchmark import parse_size, percentile, run_size
+from forest.mixins import FastListMixin
+
+
+class BenchmarkTest(TestCase):
+    """Test the endpoint benchmark suite"""
+
+    def test_parse_size(self):
+        """Test dataset sizes are parsed from PxSxPxT strings"""
+        self.assertEqual(parse_size('1x2x3x4'), [1, 2, 3, 4])
+        with self.assertRaises(ValueError):
+            parse_size('1x2x3')
+        with self.assertRaises(ValueError):
+            parse_size('1x0x3x4')
+
+    def test_percentile(self):
+        """Test nearest rank percentiles"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.9), 7)
+
+    def test_run_size(self):
+        """Test every endpoint succeeds and the data is rolled back"""
+        result = run_size('1x2x2x3', repeat=1)
+
+        self.assertEqual(result['dataset']['trees'], 12)
+        self.assertIn('user-me', result['endpoints'])
+        self.assertIn('tree-list-stream', result['endpoints'])
+        for name in ('project-summary', 'project-upload', 'tree-bulk-update',
+                     'tree-bulk-delete', 'plot-bulk-delete',
+                     'projection-detail'):
+            self.assertIn(name, result['endpoints'])
+        for name, stats in result['endpoints'].items():
+            self.assertLess(stats['status'], 400, name)
+            self.assertGreater(stats['peak_memory_bytes'], 0, name)
+            if 'cold' in stats:
+                self.assertLess(stats['cold']['status'], 400, name)
+        self.assertFalse(Tree.objects.exists())
+        self.assertTrue(FastListMixin.fast_list)
+
+    def test_cold_detail_misses_cache(self):
+        """Test cold samples of cached details run the serializer queries"""
+        result = run_size('1x1x1x2', repeat=1)
+
+        detail = result['endpoints']['project-detail']
+        self.assertGreater(detail['cold']['queries'], detail['queries'])
+
+    def test_no_session_queries(self):
+        """Test switching authentication does not log clients out"""
+        with CaptureQueriesContext(connection) as context:
+            run_size('1x1x1x2', repeat=1)
+
+        self.assertFalse([query for query in context.captured_queries
+                          if 'django_session' in query['sql']])
+
+    def test_benchmark_command(self):
+        """Test the command writes a JSON report"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.json')
+            call_command('benchmark_endpoints', sizes=['1x1x1x2'], repeat=1,
+                         output=path, stdout=StringIO())
+            with open(path) as report:
+                report = json.load(report)
+
+        self.assertEqual(report['results'][0]['size'], '1x1x1x2')
+        self.assertIn('p99_ms', report['results'][0]['endpoints']
+                      ['project-detail'])
+
+    def test_benchmark_command_invalid_size(self):
+        """Test invalid sizes are rejected"""
+        with self.assertRaises(CommandError):
+            call_command('benchmark_endpoints', sizes=['big'],
+                         stdout=StringIO())
@@ -0,0 +1,331 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import geohash
+from core.models import Plot, Tree, PlotAggregate, StandAggregate, \
+    Tombstone
+
+from forest.tests.test_projects_api import sample_project, sample_stand, \
+    sample_plot, sample_tree, sample_tree_reference
+
+
+BULK_TREE_URL = reverse('forest:tree-bulk')
+BULK_PLOT_URL = reverse('forest:plot-bulk')
+
+
+def plot_bulk_trees_url(plot_id):
+    """Return a plot bulk trees URL"""
+    return reverse('forest:plot-bulk-trees', args=[plot_id])
+
+
+def update_statements(queries, table):
+    """Return the captured UPDATE statements of a table"""
+    return [query for query in queries.captured_queries
+            if query['sql'].startswith('UPDATE "%s"' % table)]
+
+
+def tree_payload(plot, symbol, **params):
+    """Return a tree upload row"""
+    defaults = {
+        'plot': plot,
+        'symbol': symbol,
+        'count': 1,
+        'dbh': 12.5,
+        'height': 60,
+        'live_crown_ratio': 35
+    }
+    defaults.update(params)
+
+    return defaults
+
+
+class BulkTreeApiTest(TestCase):
+    """Test bulk tree upload API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.plot = sample_plot(sample_stand(sample_project()))
+        self.fir = sample_tree_reference(symbol='PSME')
+        self.pine = sample_tree_reference(symbol='PIPO')
+
+    def test_bulk_create_trees(self):
+        """Test creating trees by id and symbol"""
+        payload = [tree_payload(self.plot.id, self.fir.id, dbh=dbh)
+                   for dbh in range(10, 30)]
+        payload.append(tree_payload(self.plot.id, 'PIPO'))
+
+        res = self.client.post(BULK_TREE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['created']), 21)
+        self.assertEqual(Tree.objects.filter(symbol=self.pine).count(), 1)
+        self.assertEqual(PlotAggregate.objects.get(symbol=self.fir).records,
+                         20)
+
+    def test_bulk_create_query_count_constant(self):
+        """Test upload queries do not grow with the number of rows"""
+        small_plot = sample_plot(self.plot.stand)
+        large_plot = sample_plot(sample_stand(sample_project()))
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(BULK_TREE_URL, [
+                tree_payload(small_plot.id, 'PSME') for _ in range(2)
+            ], format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(BULK_TREE_URL, [
+                tree_payload(large_plot.id, 'PSME') for _ in range(200)
+            ], format='json')
+
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(large_plot.trees.count(), 200)
+
+    def test_bulk_create_invalid_rows_rejected(self):
+        """Test an invalid row rejects the whole upload by default"""
+        payload = [
+            tree_payload(self.plot.id, self.fir.id),
+            tree_payload(self.plot.id, 'UNKNOWN'),
+            tree_payload(999999, self.fir.id)
+        ]
+
+        res = self.client.post(BULK_TREE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['index'] for error in res.data['errors']],
+                         [1, 2])
+        self.assertFalse(Tree.objects.exists())
+
+    def test_bulk_create_partial(self):
+        """Test valid rows are created when partial uploads are allowed"""
+        payload = [
+            tree_payload(self.plot.id, self.fir.id),
+            tree_payload(self.plot.id, self.fir.id, dbh='wide')
+        ]
+
+        res = self.client.post(BULK_TREE_URL + '?partial=true', payload,
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['created']), 1)
+        self.assertIn('dbh', res.data['errors'][0]['errors'])
+        self.assertEqual(Tree.objects.count(), 1)
+
+    def test_bulk_create_ambiguous_symbol(self):
+        """Test symbols shared by several references are rejected"""
+        sample_tree_reference(symbol='PSME')
+
+        res = self.client.post(
+            BULK_TREE_URL, [tree_payload(self.plot.id, 'PSME')],
+            format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_plot_bulk_create_trees(self):
+        """Test creating trees for a plot without repeating its id"""
+        payload = [tree_payload(None, 'PIPO'), tree_payload(None, 'PSME')]
+        for row in payload:
+            row.pop('plot')
+
+        res = self.client.post(plot_bulk_trees_url(self.plot.id), payload,
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.plot.trees.count(), 2)
+
+    def test_bulk_create_requires_list(self):
+        """Test uploading a single object is rejected"""
+        res = self.client.post(BULK_TREE_URL,
+                               tree_payload(self.plot.id, self.fir.id),
+                               format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkTreeEditApiTest(TestCase):
+    """Test bulk tree update and delete API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        stand = sample_stand(sample_project())
+        self.plot = sample_plot(stand)
+        self.other = sample_plot(stand)
+        self.fir = sample_tree_reference(symbol='PSME')
+        self.pine = sample_tree_reference(symbol='PIPO')
+        self.trees = [sample_tree(self.plot, self.fir, count=1, dbh=dbh,
+                                  height=50)
+                      for dbh in range(10, 30)]
+        self.others = [sample_tree(self.other, self.fir, count=1, height=50)
+                       for i in range(3)]
+
+    def test_update_rows(self):
+        """Test per row changes are applied with one statement"""
+        payload = [{'id': tree.id, 'height': 60 + i, 'dbh': tree.dbh + 1}
+                   for i, tree in enumerate(self.trees)]
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(BULK_TREE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 20})
+        self.assertEqual(len(update_statements(queries, 'core_tree')), 1)
+        heights = dict(Tree.objects.values_list('id', 'height'))
+        self.assertEqual(heights[self.trees[5].id], 65)
+        self.assertEqual(heights[self.others[0].id], 50)
+        aggregate = PlotAggregate.objects.get(plot=self.plot)
+        self.assertEqual(aggregate.dbh_sum, sum(range(11, 31)))
+
+    def test_update_rows_invalid(self):
+        """Test invalid, unknown and repeated rows change nothing"""
+        payload = [
+            {'id': self.trees[0].id, 'height': 'tall'},
+            {'id': self.trees[1].id, 'height': 70},
+            {'id': self.trees[1].id, 'height': 71},
+            {'id': 0, 'height': 70},
+            {'height': 70}
+        ]
+
+        res = self.client.patch(BULK_TREE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sorted(error['index']
+                                for error in res.data['errors']),
+                         [0, 2, 3, 4])
+        self.assertFalse(Tree.objects.exclude(height=50).exists())
+
+    def test_move_rows(self):
+        """Test moving some trees updates aggregates and tombstones"""
+        moved = self.trees[:2]
+        payload = [{'id': tree.id, 'plot': self.other.id} for tree in moved]
+        payload.append({'id': self.trees[2].id, 'symbol': 'PIPO'})
+
+        res = self.client.patch(BULK_TREE_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.other.trees.count(), 5)
+        self.assertEqual(Tree.objects.get(pk=self.trees[2].id).symbol,
+                         self.pine)
+        self.assertEqual(PlotAggregate.objects.get(
+            plot=self.plot, symbol=self.fir).records, 17)
+        self.assertEqual(set(Tombstone.objects.filter(
+            model='tree').values_list('object_id', flat=True)),
+            {tree.id for tree in moved})
+
+    def test_update_filtered(self):
+        """Test scaling and setting the fields of filtered trees"""
+        res = self.client.patch(
+            BULK_TREE_URL + '?plot=%d' % self.plot.id,
+            {'scale': {'height': 1.1}, 'add': {'dbh': 0.5},
+             'set': {'live_crown_ratio': 55}},
+            format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 20})
+        tree = Tree.objects.get(pk=self.trees[0].id)
+        self.assertAlmostEqual(tree.height, 55)
+        self.assertEqual((tree.dbh, tree.live_crown_ratio), (10.5, 55))
+        self.assertEqual(Tree.objects.get(pk=self.others[0].id).height, 50)
+
+    def test_update_filtered_invalid(self):
+        """Test unfiltered and malformed filtered updates are rejected"""
+        for url, payload in (
+                (BULK_TREE_URL, {'set': {'height': 1}}),
+                (BULK_TREE_URL + '?plot=x', {'set': {'height': 1}}),
+                (BULK_TREE_URL + '?plot=1', {'scale': {'count': 2}}),
+                (BULK_TREE_URL + '?plot=1', {'scale': {'height': 'a'}}),
+                (BULK_TREE_URL + '?plot=1', {'set': {'height': 1},
+                                             'add': {'height': 1}}),
+                (BULK_TREE_URL + '?plot=1', {'set': {'symbol': 'NOPE'}}),
+                (BULK_TREE_URL + '?plot=1', {'drop': {}}),
+                (BULK_TREE_URL + '?plot=1', {})):
+            res = self.client.patch(url, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST,
+                             (url, payload))
+
+        self.assertFalse(Tree.objects.exclude(height=50).exists())
+
+    def test_delete_filtered(self):
+        """Test deleting the trees of a plot and species"""
+        res = self.client.delete(BULK_TREE_URL + '?plot=%d&symbol=%d' % (
+            self.plot.id, self.fir.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['deleted']['tree'], 20)
+        self.assertFalse(self.plot.trees.exists())
+        self.assertEqual(self.other.trees.count(), 3)
+        self.assertFalse(PlotAggregate.objects.filter(
+            plot=self.plot).exists())
+
+    def test_delete_requires_filter(self):
+        """Test a bulk delete without filters is rejected"""
+        res = self.client.delete(BULK_TREE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tree.objects.count(), 23)
+
+
+class BulkPlotEditApiTest(TestCase):
+    """Test bulk plot update and delete API"""
+
+    def setUp(self):
+        self.client = APIClient()
+        project = sample_project()
+        self.stand = sample_stand(project)
+        self.target = sample_stand(project)
+        self.fir = sample_tree_reference(symbol='PSME')
+        self.plots = [sample_plot(self.stand, latitude=45 + i, longitude=-122)
+                      for i in range(4)]
+        for plot in self.plots:
+            sample_tree(plot, self.fir, count=2)
+
+    def test_update_rows(self):
+        """Test per row plot changes keep cells current"""
+        payload = [{'id': plot.id, 'latitude': 10 + i, 'slope': 3}
+                   for i, plot in enumerate(self.plots)]
+
+        res = self.client.patch(BULK_PLOT_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'updated': 4})
+        plot = Plot.objects.get(pk=self.plots[2].id)
+        self.assertEqual((plot.latitude, plot.slope), (12, 3))
+        self.assertEqual(plot.geocell, geohash.encode(12, -122))
+
+    def test_update_rows_number_conflict(self):
+        """Test plot numbers taken by other plots are rejected"""
+        payload = [{'id': self.plots[0].id,
+                    'number': self.plots[1].number}]
+
+        res = self.client.patch(BULK_PLOT_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('number', res.data['errors'][0]['errors'])
+
+    def test_move_filtered(self):
+        """Test moving filtered plots to another stand"""
+        ids = '%d,%d' % (self.plots[0].id, self.plots[1].id)
+        res = self.client.patch(BULK_PLOT_URL + '?id=' + ids,
+                                {'set': {'stand': self.target.id}},
+                                format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.target.plots.count(), 2)
+        self.assertEqual(StandAggregate.objects.get(
+            stand=self.target).tree_count, 4)
+        self.assertEqual(StandAggregate.objects.get(
+            stand=self.stand).tree_count, 4)
+
+    def test_delete_in_bbox(self):
+        """Test deleting the plots inside a bounding box"""
+        res = self.client.delete(BULK_PLOT_URL + '?bbox=-123,44.5,-121,46.5')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['deleted']['plot'], 2)
+        self.assertEqual(res.data['deleted']['tree'], 2)
+        self.assertEqual(sorted(self.stand.plots.values_list(
+            'id', flat=True)), [self.plots[2].id, self.plots[3].id])
+        self.assertEqual(StandAggregate.objects.get(
+            stand=self.stand).records, 2)
@@ -0,0 +1,89 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from forest.cache import get_cache
+from forest.tests.test_projects_api import project_detail_url, \
+    stand_detail_url, sample_project, sample_stand, sample_plot, \
+    sample_tree, sample_tree_reference
+
+
+CACHE_STATS_URL = reverse('forest:cache-stats')
+
+
+class ResponseCacheTest(TestCase):
+    """Test the rendered response cache of detail endpoints"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.project = sample_project()
+        self.stand = sample_stand(self.project)
+        self.plot = sample_plot(self.stand)
+        self.tree_reference = sample_tree_reference()
+        sample_tree(self.plot, self.tree_reference)
+
+    def test_project_detail_served_from_cache(self):
+        """Test a repeated project detail is served without serializing"""
+        url = project_detail_url(self.project.id)
+        res = self.client.get(url)
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(url)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.content, res.content)
+        self.assertEqual(cached['Content-Type'], res['Content-Type'])
+        self.assertEqual(cached['ETag'], res['ETag'])
+
+    def test_stand_detail_served_from_cache(self):
+        """Test a repeated stand detail is served from cache"""
+        url = stand_detail_url(self.stand.id)
+        res = self.client.get(url)
+        cached = self.client.get(url)
+
+        self.assertEqual(cached['X-Cache'], 'HIT')
+        self.assertEqual(cached.content, res.content)
+
+    def test_subtree_write_invalidates(self):
+        """Test a tree write invalidates its project and stand only"""
+        other = sample_stand(sample_project(name='Other'))
+        urls = [
+            project_detail_url(self.project.id),
+            stand_detail_url(self.stand.id),
+            stand_detail_url(other.id)
+        ]
+        for url in urls:
+            self.client.get(url)
+
+        sample_tree(self.plot, self.tree_reference)
+
+        results = [self.client.get(url)['X-Cache'] for url in urls]
+        self.assertEqual(results, ['MISS', 'MISS', 'HIT'])
+        res = self.client.get(urls[0])
+        self.assertEqual(
+            len(res.json()['stands'][0]['plots'][0]['trees']), 2)
+
+    def test_cache_stats(self):
+        """Test hit and miss counters are reported"""
+        url = project_detail_url(self.project.id)
+        self.client.get(url)
+        self.client.get(url)
+        self.client.get(url)
+
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {'hits': 2, 'misses': 1})
+
+    def test_browsable_api_not_cached(self):
+        """Test only JSON renderings are cached"""
+        url = project_detail_url(self.project.id)
+        self.client.get(url, HTTP_ACCEPT='text/html')
+        res = self.client.get(url, HTTP_ACCEPT='text/html')
+
+        self.assertNotIn('X-Cache', res)
@@ -0,0 +1,121 @@
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Project, Tree, Tombstone
+
+from forest.tests.test_projects_api import project_detail_url, \
+    stand_detail_url, stand_plots_url, sample_project, sample_stand, \
+    sample_plot, sample_tree, sample_tree_reference, sample_sample_design
+
+
+def tree_detail_url(tree_id):
+    """Return a tree detail URL"""
+    return reverse('forest:tree-detail', args=[tree_id])
+
+
+class ConditionalGetTest(TestCase):
+    """Test conditional GETs keyed on project versions"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = sample_project()
+        self.stand = sample_stand(self.project)
+        self.plot = sample_plot(self.stand)
+        self.tree_reference = sample_tree_reference()
+
+    def version(self):
+        return Project.objects.get(pk=self.project.pk).version
+
+    def test_project_detail_not_modified(self):
+        """Test an unchanged project answers 304 without serializing"""
+        url = project_detail_url(self.project.id)
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Last-Modified', res)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_if_modified_since_alone_not_answered(self):
+        """Test modification dates cannot hide writes in the same second"""
+        url = project_detail_url(self.project.id)
+        self.client.get(url)
+        sample_tree(self.plot, self.tree_reference)
+
+        res = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_tree_reference_delete_bumps_version(self):
+        """Test deleting a species touches projects holding its trees"""
+        tree = sample_tree(self.plot, self.tree_reference)
+        url = project_detail_url(self.project.id)
+        etag = self.client.get(url)['ETag']
+        version = self.version()
+
+        self.tree_reference.delete()
+
+        self.assertGreater(self.version(), version)
+        self.assertTrue(Tombstone.objects.filter(
+            project_id=self.project.id, model='tree',
+            object_id=tree.id).exists())
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_tree_change_invalidates_project_etag(self):
+        """Test writes below a project change its entity tag"""
+        url = project_detail_url(self.project.id)
+        etag = self.client.get(url)['ETag']
+
+        sample_tree(self.plot, self.tree_reference)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_writes_bump_project_version(self):
+        """Test every level of the project subtree bumps its version"""
+        changes = [
+            lambda: sample_stand(self.project),
+            lambda: sample_plot(self.stand),
+            lambda: sample_sample_design(self.project),
+            lambda: sample_tree(self.plot, self.tree_reference),
+            lambda: Tree.objects.update(height=80),
+            lambda: Tree.objects.bulk_create([
+                Tree(plot=self.plot, symbol=self.tree_reference, count=1,
+                     dbh=5, height=20, live_crown_ratio=30)
+            ]),
+            lambda: Tree.objects.all().delete(),
+            lambda: self.plot.delete()
+        ]
+        for change in changes:
+            version = self.version()
+            change()
+            self.assertGreater(self.version(), version)
+
+    def test_nested_and_child_routes_conditional(self):
+        """Test stand, plot list and tree routes honour If-None-Match"""
+        tree = sample_tree(self.plot, self.tree_reference)
+        for url in (stand_detail_url(self.stand.id),
+                    stand_plots_url(self.stand.id),
+                    tree_detail_url(tree.id)):
+            etag = self.client.get(url)['ETag']
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_other_project_change_keeps_etag(self):
+        """Test changes to another project do not change the entity tag"""
+        url = project_detail_url(self.project.id)
+        etag = self.client.get(url)['ETag']
+
+        sample_stand(sample_project())
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
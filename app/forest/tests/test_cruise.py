@@ -0,0 +1,392 @@
+import numpy as np
+
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import EquationSet, Project, SampleDesign, SpeciesEquation
+
+from forest import cruise, equations
+from forest.cache import get_cache
+from forest.tests.test_projects_api import sample_project, sample_stand, \
+    sample_plot, sample_tree, sample_tree_reference, sample_sample_design
+
+
+def stand_summary_url(stand_id):
+    """Return a stand summary URL"""
+    return reverse('forest:stand-summary', args=[stand_id])
+
+
+def project_summary_url(project_id):
+    """Return a project summary URL"""
+    return reverse('forest:project-summary', args=[project_id])
+
+
+def sample_equation(equation_set, species, **params):
+    """Create and return a sample species equation"""
+    defaults = {
+        'cubic_a': 0,
+        'cubic_b': 0.002,
+        'board_a': -10,
+        'board_b': 0.01,
+        'biomass_b0': -2.0,
+        'biomass_b1': 2.4
+    }
+    defaults.update(params)
+
+    return SpeciesEquation.objects.create(
+        equation_set=equation_set, species=species, **defaults)
+
+
+def stand_table_url(stand_id):
+    """Return a stand table URL"""
+    return reverse('forest:stand-stand-table', args=[stand_id])
+
+
+def project_table_url(project_id):
+    """Return a project stand table URL"""
+    return reverse('forest:project-stand-table', args=[project_id])
+
+
+class CruiseCalculationTest(TestCase):
+    """Test cruise expansion and statistics"""
+
+    def test_tree_basal_area(self):
+        """Test basal area in english and metric units"""
+        dbh = np.array([10.0, 25.4])
+
+        english = cruise.tree_basal_area(dbh, 'english')
+        metric = cruise.tree_basal_area(dbh, 'metric')
+
+        self.assertAlmostEqual(english[0], 0.5454, places=4)
+        self.assertAlmostEqual(metric[1], 0.05067, places=5)
+
+    def test_expansion_factors_by_design_range(self):
+        """Test trees are expanded by the design covering them"""
+        designs = [
+            SampleDesign(sample_type='FRQ', factor=10, var='DBH',
+                         minv=0, maxv=5),
+            SampleDesign(sample_type='BAF', factor=20, var='DBH',
+                         minv=5, maxv=40)
+        ]
+        dbh = np.array([2.0, 10.0, 50.0])
+        basal_area = cruise.tree_basal_area(dbh, 'english')
+
+        factors = cruise.expansion_factors(designs, dbh, np.zeros(3),
+                                           basal_area)
+
+        self.assertAlmostEqual(factors[0], 10)
+        self.assertAlmostEqual(factors[1], 20 / basal_area[1])
+        self.assertEqual(factors[2], 0)
+
+    def test_diameter_classes(self):
+        """Test diameters fall in classes centred on the class width"""
+        dbh = np.array([0.5, 0.99, 1.0, 9.9, 10.99, 11.0])
+
+        classes = cruise.diameter_classes(dbh, 2.0)
+
+        self.assertEqual(classes.tolist(), [0, 0, 1, 5, 5, 6])
+
+
+class StandSummaryApiTest(TestCase):
+    """Test the stand summary API"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_baf_stand_summary(self):
+        """Test prism cruise statistics for a stand"""
+        project = sample_project(measurement_system='english')
+        sample_sample_design(project, sample_type='BAF', factor=20,
+                             var='DBH', minv=0, maxv=100)
+        stand = sample_stand(project)
+        fir = sample_tree_reference(symbol='PSME')
+        pine = sample_tree_reference(symbol='PIPO')
+        plot = sample_plot(stand)
+        sample_plot(stand)
+        sample_tree(plot, fir, count=1, dbh=10)
+        sample_tree(plot, pine, count=2, dbh=20)
+
+        res = self.client.get(stand_summary_url(stand.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['plot_count'], 2)
+        self.assertEqual(res.data['area_unit'], 'acre')
+        species = {row['symbol_name']: row for row in res.data['species']}
+        self.assertAlmostEqual(species['PSME']['basal_area'], 10)
+        self.assertAlmostEqual(species['PIPO']['basal_area'], 20)
+        self.assertAlmostEqual(species['PSME']['qmd'], 10)
+        self.assertAlmostEqual(species['PSME']['trees_per_area'],
+                               10 / (np.pi / 576 * 100))
+        self.assertAlmostEqual(res.data['total']['basal_area'], 30)
+        total_tpa = res.data['total']['trees_per_area']
+        self.assertAlmostEqual(
+            res.data['total']['sdi'],
+            total_tpa * (res.data['total']['qmd'] / 10) ** 1.605
+        )
+
+    def test_frq_stand_summary_metric(self):
+        """Test fixed area cruise statistics in metric units"""
+        project = sample_project(measurement_system='metric')
+        sample_sample_design(project, sample_type='FRQ', factor=25,
+                             var='DBH', minv=0, maxv=200)
+        stand = sample_stand(project)
+        plot = sample_plot(stand)
+        sample_tree(plot, sample_tree_reference(), count=4, dbh=30)
+
+        res = self.client.get(stand_summary_url(stand.id))
+
+        self.assertEqual(res.data['area_unit'], 'hectare')
+        self.assertAlmostEqual(res.data['total']['trees_per_area'], 100)
+        self.assertAlmostEqual(res.data['total']['qmd'], 30)
+        self.assertAlmostEqual(res.data['total']['basal_area'],
+                               100 * np.pi / 40000 * 900)
+
+    def test_empty_stand_summary(self):
+        """Test summary of a stand without trees"""
+        stand = sample_stand(sample_project())
+
+        res = self.client.get(stand_summary_url(stand.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['species'], [])
+        self.assertEqual(res.data['total']['trees_per_area'], 0)
+
+
+class StandTableApiTest(TestCase):
+    """Test the stand and project stand table APIs"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = sample_project(measurement_system='english')
+        sample_sample_design(self.project, sample_type='FRQ', factor=10,
+                             var='DBH', minv=0, maxv=100)
+        self.fir = sample_tree_reference(symbol='PSME')
+        self.pine = sample_tree_reference(symbol='PIPO')
+
+    def test_stand_table(self):
+        """Test trees per acre and basal area by species and 2 inch class"""
+        stand = sample_stand(self.project)
+        plot = sample_plot(stand)
+        sample_plot(stand)
+        sample_tree(plot, self.fir, count=2, dbh=10.5)
+        sample_tree(plot, self.fir, count=1, dbh=13.9)
+        sample_tree(plot, self.pine, count=4, dbh=9.2)
+
+        res = self.client.get(stand_table_url(stand.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['diameter_unit'], 'inch')
+        self.assertEqual(res.data['classes'], [10.0, 12.0, 14.0])
+        species = {row['symbol_name']: row for row in res.data['species']}
+        self.assertEqual(species['PSME']['trees_per_area'], [10, 0, 5])
+        self.assertEqual(species['PIPO']['trees_per_area'], [20, 0, 0])
+        self.assertEqual(res.data['total']['trees_per_area'], [30, 0, 5])
+        self.assertAlmostEqual(species['PSME']['basal_area'][2],
+                               5 * np.pi / 576 * 13.9 ** 2)
+
+    def test_stand_table_outlier(self):
+        """Test a mistyped diameter falls in the open ended top class"""
+        project = sample_project(measurement_system='english')
+        sample_sample_design(project, sample_type='FRQ', factor=10,
+                             var='DBH', minv=0, maxv=10000)
+        stand = sample_stand(project)
+        plot = sample_plot(stand)
+        sample_tree(plot, self.fir, count=1, dbh=56)
+        sample_tree(plot, self.fir, count=1, dbh=9999)
+
+        res = self.client.get(stand_table_url(stand.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['top_class'], 60.0)
+        self.assertEqual(res.data['classes'], [56.0, 58.0, 60.0])
+        self.assertEqual(res.data['total']['trees_per_area'], [10, 0, 10])
+
+    def test_metric_stand_table(self):
+        """Test metric projects use 5 cm classes"""
+        project = sample_project(measurement_system='metric')
+        sample_sample_design(project, sample_type='FRQ', factor=25,
+                             var='DBH', minv=0, maxv=200)
+        stand = sample_stand(project)
+        sample_tree(sample_plot(stand), self.fir, count=1, dbh=32)
+
+        res = self.client.get(stand_table_url(stand.id))
+
+        self.assertEqual(res.data['diameter_unit'], 'cm')
+        self.assertEqual(res.data['classes'], [30.0])
+        self.assertEqual(res.data['total']['trees_per_area'], [25])
+
+    def test_project_table_weighted_by_stand_size(self):
+        """Test project tables average stands weighted by their size"""
+        small = sample_stand(self.project, size=10)
+        large = sample_stand(self.project, size=30)
+        sample_tree(sample_plot(small), self.fir, count=4, dbh=10)
+        sample_tree(sample_plot(large), self.fir, count=8, dbh=10)
+
+        with self.assertNumQueries(6):
+            res = self.client.get(project_table_url(self.project.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['stand_count'], 2)
+        self.assertEqual(res.data['area'], 40)
+        self.assertEqual(res.data['total']['trees_per_area'],
+                         [(40 * 10 + 80 * 30) / 40])
+
+    def test_empty_stand_table(self):
+        """Test the table of a stand without trees"""
+        stand = sample_stand(self.project)
+
+        res = self.client.get(stand_table_url(stand.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['classes'], [])
+        self.assertEqual(res.data['species'], [])
+
+
+class EquationEngineTest(TestCase):
+    """Test vectorized volume and biomass equations"""
+
+    def setUp(self):
+        self.fir = sample_tree_reference(symbol='PSME')
+        self.pine = sample_tree_reference(symbol='PIPO')
+        self.equation_set = EquationSet.objects.create(
+            name='Test', measurement_system='english')
+        sample_equation(self.equation_set, self.fir)
+
+    def test_evaluate(self):
+        """Test per tree yields and zero for species without equations"""
+        species = np.array([self.fir.id, self.pine.id, self.fir.id])
+        dbh = np.array([10.0, 10.0, 1.0])
+        height = np.array([100.0, 100.0, 10.0])
+
+        yields = equations.evaluate(self.equation_set, species, dbh, height,
+                                    'english')
+
+        self.assertAlmostEqual(yields['cubic_volume'][0], 20)
+        self.assertAlmostEqual(yields['board_feet'][0], 90)
+        self.assertAlmostEqual(yields['biomass'][0],
+                               np.exp(-2.0 + 2.4 * np.log(10)))
+        self.assertEqual(yields['cubic_volume'][1], 0)
+        self.assertEqual(yields['board_feet'][2], 0)
+
+    def test_evaluate_converts_units(self):
+        """Test metric trees are converted to the units of the set"""
+        yields = equations.evaluate(
+            self.equation_set, np.array([self.fir.id]),
+            np.array([25.4]), np.array([30.48]), 'metric')
+
+        self.assertAlmostEqual(yields['cubic_volume'][0], 20 * 0.0283168)
+        self.assertAlmostEqual(yields['biomass'][0],
+                               np.exp(-2.0 + 2.4 * np.log(10)) * 0.453592)
+
+    def test_equation_change_bumps_project_version(self):
+        """Test editing an equation invalidates projects using the set"""
+        project = sample_project(equation_set=self.equation_set)
+        version = Project.objects.get(pk=project.pk).version
+
+        sample_equation(self.equation_set, self.pine)
+
+        self.assertGreater(Project.objects.get(pk=project.pk).version,
+                           version)
+
+
+class YieldSummaryApiTest(TestCase):
+    """Test volume and biomass on summary and stand table endpoints"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.fir = sample_tree_reference(symbol='PSME')
+        self.equation_set = EquationSet.objects.create(
+            name='Test', measurement_system='english')
+        self.equation = sample_equation(self.equation_set, self.fir)
+        self.project = sample_project(measurement_system='english',
+                                      equation_set=self.equation_set)
+        sample_sample_design(self.project, sample_type='FRQ', factor=10,
+                             var='DBH', minv=0, maxv=100)
+        self.stand = sample_stand(self.project, size=20)
+        sample_tree(sample_plot(self.stand), self.fir, count=2, dbh=10,
+                    height=100)
+
+    def test_stand_summary_yields(self):
+        """Test volume per acre on the stand summary"""
+        res = self.client.get(stand_summary_url(self.stand.id))
+
+        self.assertEqual(res.data['volume_unit'], 'cubic_foot')
+        self.assertAlmostEqual(res.data['total']['cubic_volume'], 20 * 20)
+        self.assertAlmostEqual(res.data['total']['board_feet'], 20 * 90)
+        self.assertAlmostEqual(res.data['species'][0]['cubic_volume'], 400)
+
+    def test_project_summary(self):
+        """Test the project summary averages its stands"""
+        stand = sample_stand(self.project, size=20)
+        sample_plot(stand)
+
+        res = self.client.get(project_summary_url(self.project.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['stand_count'], 2)
+        self.assertAlmostEqual(res.data['total']['trees_per_area'], 10)
+        self.assertAlmostEqual(res.data['total']['cubic_volume'], 200)
+
+    def test_summary_without_equations(self):
+        """Test yields are missing when the project has no equation set"""
+        stand = sample_stand(sample_project())
+
+        res = self.client.get(stand_summary_url(stand.id))
+
+        self.assertIsNone(res.data['total']['cubic_volume'])
+
+    def test_stock_table_yields(self):
+        """Test volume per acre by diameter class"""
+        res = self.client.get(stand_table_url(self.stand.id))
+
+        self.assertEqual(res.data['total']['cubic_volume'], [400])
+        self.assertAlmostEqual(res.data['total']['biomass'][0],
+                               20 * np.exp(-2.0 + 2.4 * np.log(10)))
+
+    def test_summary_cached_until_change(self):
+        """Test summaries are cached until the equations change"""
+        url = project_summary_url(self.project.id)
+        first = self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        self.equation.cubic_b = 0.004
+        self.equation.save()
+
+        res = self.client.get(url)
+        self.assertNotEqual(res['ETag'], first['ETag'])
+        self.assertAlmostEqual(res.data['total']['cubic_volume'],
+                               2 * first.data['total']['cubic_volume'])
+
+
+class AggregateTotalsApiTest(TestCase):
+    """Test serving per species totals from the aggregate tables"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.stand = sample_stand(sample_project(measurement_system='english'))
+        self.plot = sample_plot(self.stand)
+        self.fir = sample_tree_reference(symbol='PSME')
+        sample_tree(self.plot, self.fir, count=2, dbh=10)
+        sample_tree(sample_plot(self.stand), self.fir, count=1, dbh=20)
+
+    def test_stand_and_plot_totals(self):
+        """Test totals match the trees of the stand and the plot"""
+        res = self.client.get(reverse('forest:stand-aggregates',
+                                      args=[self.stand.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        totals, = res.data
+        self.assertEqual((totals['symbol'], totals['symbol_name']),
+                         (self.fir.id, 'PSME'))
+        self.assertEqual((totals['records'], totals['tree_count']), (2, 3))
+        self.assertAlmostEqual(totals['mean_dbh'], 40 / 3)
+        self.assertAlmostEqual(totals['qmd'], np.sqrt(600 / 3))
+        self.assertAlmostEqual(totals['basal_area'], 600 * np.pi / 576)
+
+        res = self.client.get(reverse('forest:plot-aggregates',
+                                      args=[self.plot.id]))
+        self.assertEqual(res.data[0]['tree_count'], 2)
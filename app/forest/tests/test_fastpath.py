@@ -0,0 +1,70 @@
+from unittest import mock
+
+from django.test import TestCase
+
+from rest_framework.test import APIClient
+
+from forest.fastpath import FastListSerializer
+from forest.mixins import FastListMixin
+from forest.serializers import PlotSerializer, StandSampleDesignSerializer
+from forest.tests.test_projects_api import PLOT_URL, TREE_URL, \
+    stand_plots_url, sample_project, sample_stand, sample_plot, \
+    sample_tree, sample_tree_reference
+
+
+class FastListTest(TestCase):
+    """Test the value row list path matches the serializers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.stand = sample_stand(sample_project())
+        symbols = [sample_tree_reference(), sample_tree_reference()]
+        for index in range(3):
+            plot = sample_plot(self.stand, aspect='N%d' % index)
+            for symbol in symbols:
+                sample_tree(plot, symbol, dbh=10.25 + index)
+        sample_plot(self.stand)
+
+    def assertSameContent(self, url, params=None):
+        """Assert the fast and regular paths render the same bytes"""
+        fast = self.client.get(url, params)
+        with mock.patch.object(FastListMixin, 'fast_list', False):
+            regular = self.client.get(url, params)
+
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, regular.content)
+        return fast
+
+    def test_tree_list(self):
+        """Test the tree list matches the serializer"""
+        self.assertSameContent(TREE_URL)
+
+    def test_tree_list_pages(self):
+        """Test later tree pages match the serializer"""
+        res = self.assertSameContent(TREE_URL, {'page_size': 4})
+        self.assertSameContent(res.data['next'])
+
+    def test_plot_list(self):
+        """Test plots with their tree ids match, including empty plots"""
+        res = self.assertSameContent(PLOT_URL)
+
+        self.assertIn([], [plot['trees'] for plot in res.data['results']])
+
+    def test_stand_plots(self):
+        """Test the plots of a stand match the serializer"""
+        self.assertSameContent(stand_plots_url(self.stand.id))
+
+    def test_fields(self):
+        """Test field selections match the serializer"""
+        self.assertSameContent(PLOT_URL, {'fields': 'id,latitude,trees'})
+
+    def test_plot_list_query_count(self):
+        """Test plots and their tree ids take one query each"""
+        with self.assertNumQueries(2):
+            self.client.get(PLOT_URL)
+
+    def test_unsupported_fields(self):
+        """Test serializers with computed fields are not compiled"""
+        self.assertIsNotNone(FastListSerializer.compile(PlotSerializer()))
+        self.assertIsNone(
+            FastListSerializer.compile(StandSampleDesignSerializer()))
@@ -0,0 +1,99 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from forest.tests.test_projects_api import PLOT_URL, project_detail_url, \
+    sample_project, sample_stand, sample_plot, sample_tree, \
+    sample_tree_reference
+
+
+class SparseFieldsetTest(TestCase):
+    """Test the fields, expand and depth query parameters"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = sample_project()
+        self.stand = sample_stand(self.project)
+        self.plot = sample_plot(self.stand)
+        self.tree = sample_tree(self.plot, sample_tree_reference())
+        self.url = project_detail_url(self.project.id)
+
+    def test_plot_fields(self):
+        """Test plots are returned and loaded with the requested columns"""
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(PLOT_URL,
+                                  {'fields': 'id,latitude,longitude'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [{
+            'id': self.plot.id,
+            'latitude': self.plot.latitude,
+            'longitude': self.plot.longitude
+        }])
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertNotIn('slope', context.captured_queries[0]['sql'])
+
+    def test_depth(self):
+        """Test depth expands relations down to the given level"""
+        res = self.client.get(self.url, {'depth': 2})
+
+        plot = res.data['stands'][0]['plots'][0]
+        self.assertEqual(plot['number'], self.plot.number)
+        self.assertEqual(plot['trees'], [self.tree.id])
+
+    def test_depth_zero(self):
+        """Test depth zero returns nested relations as primary keys"""
+        res = self.client.get(self.url, {'depth': 0})
+
+        self.assertEqual(res.data['stands'], [self.stand.id])
+        self.assertEqual(res.data['name'], self.project.name)
+
+    def test_expand(self):
+        """Test only the listed relations are expanded"""
+        res = self.client.get(self.url, {'expand': 'stands'})
+
+        self.assertEqual(res.data['stands'][0]['plots'], [self.plot.id])
+
+    def test_nested_fields(self):
+        """Test dotted fields select nested fields and their relations"""
+        with CaptureQueriesContext(connection) as context:
+            res = self.client.get(
+                self.url, {'fields': 'id,stands.id,stands.plots.latitude'})
+
+        self.assertEqual(res.data, {
+            'id': self.project.id,
+            'stands': [{
+                'id': self.stand.id,
+                'plots': [{'latitude': self.plot.latitude}]
+            }]
+        })
+        sql = ' '.join(query['sql'] for query in context.captured_queries)
+        self.assertNotIn('core_tree', sql)
+        self.assertNotIn('core_sampledesign', sql)
+        self.assertNotIn('"core_stand"."location"', sql)
+
+    def test_fields_with_depth(self):
+        """Test fields of relations beyond depth expand them"""
+        res = self.client.get(self.url, {
+            'depth': 0, 'fields': 'stands.plots.number'})
+
+        self.assertEqual(res.data, {
+            'stands': [{'plots': [{'number': self.plot.number}]}]
+        })
+
+    def test_unknown_field(self):
+        """Test unknown fields are rejected"""
+        res = self.client.get(self.url, {'fields': 'id,stands.nope'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['fields'], ['Unknown field "stands.nope".'])
+
+    def test_invalid_depth(self):
+        """Test depth must be a non-negative integer"""
+        for depth in ['-1', 'deep']:
+            res = self.client.get(self.url, {'depth': depth})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,96 @@
+import json
+from unittest import skipUnless
+
+import msgpack
+
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from forest.renderers import cbor2
+from forest.tests.test_projects_api import PROJECTS_URL, TREE_URL, \
+    project_detail_url, sample_project, sample_stand, sample_plot, \
+    sample_tree, sample_tree_reference
+
+
+class BinaryFormatTest(TestCase):
+    """Test MessagePack and CBOR request and response bodies"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = sample_project()
+        plot = sample_plot(sample_stand(self.project))
+        sample_tree(plot, sample_tree_reference())
+        self.url = project_detail_url(self.project.id)
+
+    def test_msgpack_response(self):
+        """Test MessagePack bodies hold the same data as JSON"""
+        expected = json.loads(self.client.get(self.url).content)
+
+        res = self.client.get(self.url, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(res.content, raw=False), expected)
+        self.assertLess(len(res.content), len(json.dumps(expected)))
+
+    def test_msgpack_request(self):
+        """Test creating a project from a MessagePack body"""
+        payload = msgpack.packb({'name': 'Packed', 'land_owner': 'BLM'})
+
+        res = self.client.post(PROJECTS_URL, payload,
+                               content_type='application/msgpack')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['name'], 'Packed')
+
+    def test_invalid_msgpack_request(self):
+        """Test malformed MessagePack bodies are rejected"""
+        res = self.client.post(PROJECTS_URL, b'\xc1',
+                               content_type='application/msgpack')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(cbor2, 'Requires cbor2')
+    def test_cbor_response(self):
+        """Test CBOR bodies hold the same data as JSON"""
+        expected = json.loads(self.client.get(self.url).content)
+
+        res = self.client.get(self.url, HTTP_ACCEPT='application/cbor')
+
+        self.assertEqual(res['Content-Type'], 'application/cbor')
+        self.assertEqual(cbor2.loads(res.content), expected)
+
+
+class ColumnarTreeListTest(TestCase):
+    """Test the columnar tree table layout"""
+
+    def setUp(self):
+        self.client = APIClient()
+        plot = sample_plot(sample_stand(sample_project()))
+        symbol = sample_tree_reference()
+        for index in range(20):
+            sample_tree(plot, symbol, dbh=10 + index)
+
+    def test_columns(self):
+        """Test columns hold the values of the row layout"""
+        rows = self.client.get(TREE_URL, {'page_size': 5})
+
+        res = self.client.get(TREE_URL, {'page_size': 5,
+                                         'layout': 'columns'})
+
+        columns = res.data['results']
+        self.assertEqual(list(columns), list(rows.data['results'][0]))
+        self.assertEqual(
+            [dict(zip(columns, values)) for values in zip(*columns.values())],
+            rows.data['results'])
+        self.assertIn('layout=columns', res.data['next'])
+
+    def test_columns_smaller(self):
+        """Test the columnar layout shrinks the payload"""
+        rows = self.client.get(TREE_URL)
+
+        res = self.client.get(TREE_URL, {'layout': 'columns'})
+
+        self.assertLess(len(res.content), len(rows.content) * 0.6)
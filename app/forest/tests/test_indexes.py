@@ -0,0 +1,96 @@
+import json
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.test import APIClient
+
+from forest.tests.test_projects_api import PROJECTS_URL, STAND_URL, \
+    PLOT_URL, TREE_REFERENCE_URL, TREE_URL, project_stands_url, \
+    stand_plots_url, sample_project, sample_stand, sample_plot, \
+    sample_tree, sample_tree_reference
+
+
+def plan_nodes(plan):
+    """Yield every node of an EXPLAIN plan"""
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL')
+class ListQueryPlanTest(TestCase):
+    """Test list queries are served by indexes without sorting
+
+    Sequential scans are disabled while explaining, so a query without a
+    matching index shows up as a Seq Scan or Sort node however small the
+    seeded tables are.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = sample_project()
+        self.stand = sample_stand(self.project)
+        symbol = sample_tree_reference()
+        for i in range(3):
+            plot = sample_plot(self.stand)
+            sample_tree(plot, symbol)
+            sample_tree(plot, symbol)
+
+    def explain(self, sql):
+        """Return the plan of a query with sequential scans disabled"""
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+            result = cursor.fetchone()[0]
+            cursor.execute('SET LOCAL enable_seqscan = on')
+
+        if isinstance(result, str):
+            result = json.loads(result)
+        return result[0]['Plan']
+
+    def assertIndexedQueries(self, url, params=None):
+        """Assert the queries of a request avoid scans and sorts"""
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(url, params)
+
+        for query in context.captured_queries:
+            plan = self.explain(query['sql'])
+            nodes = [node['Node Type'] for node in plan_nodes(plan)]
+            self.assertNotIn('Seq Scan', nodes, query['sql'])
+            self.assertNotIn('Sort', nodes, query['sql'])
+
+    def test_project_list(self):
+        """Test the project list is served by indexes"""
+        self.assertIndexedQueries(PROJECTS_URL)
+
+    def test_tree_reference_list(self):
+        """Test the tree reference list is served by indexes"""
+        self.assertIndexedQueries(TREE_REFERENCE_URL)
+
+    def test_stand_list(self):
+        """Test the stand list is served by indexes"""
+        self.assertIndexedQueries(STAND_URL)
+
+    def test_plot_list(self):
+        """Test the plot list is served by indexes"""
+        self.assertIndexedQueries(PLOT_URL)
+
+    def test_tree_list(self):
+        """Test the tree list is served by indexes"""
+        self.assertIndexedQueries(TREE_URL)
+
+    def test_tree_list_later_page(self):
+        """Test later tree pages seek by index"""
+        res = self.client.get(TREE_URL, {'page_size': 2})
+        self.assertIndexedQueries(res.data['next'])
+
+    def test_project_stands(self):
+        """Test the stands of a project are served by indexes"""
+        self.assertIndexedQueries(project_stands_url(self.project.id))
+
+    def test_stand_plots(self):
+        """Test the plots of a stand are served by indexes"""
+        self.assertIndexedQueries(stand_plots_url(self.stand.id))
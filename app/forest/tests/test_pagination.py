@@ -0,0 +1,106 @@
+import json
+from base64 import b64encode
+
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tree
+
+from forest.tests.test_projects_api import TREE_URL, project_stands_url, \
+    stand_plots_url, sample_project, sample_stand, sample_plot, \
+    sample_tree, sample_tree_reference
+
+
+def walk(client, url, **params):
+    """Return the pages reached by following next links"""
+    pages = []
+    res = client.get(url, params)
+    while True:
+        pages.append(res.data['results'])
+        if res.data['next'] is None:
+            return pages, res
+        res = client.get(res.data['next'])
+
+
+class KeysetPaginationTest(TestCase):
+    """Test keyset pagination of list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = sample_project()
+        self.stand = sample_stand(self.project)
+        plots = [sample_plot(self.stand) for i in range(2)]
+        symbols = [sample_tree_reference() for i in range(2)]
+        for plot in plots:
+            for symbol in symbols:
+                for i in range(3):
+                    sample_tree(plot, symbol)
+
+    def test_tree_pages_follow_ordering(self):
+        """Test pages cover every tree once in plot, symbol, id order"""
+        pages, res = walk(self.client, TREE_URL, page_size=5)
+
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        ids = [tree['id'] for page in pages for tree in page]
+        expected = list(Tree.objects.order_by('-plot', '-symbol', '-id')
+                        .values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_previous_link(self):
+        """Test previous links return the earlier page"""
+        first = self.client.get(TREE_URL, {'page_size': 5})
+        second = self.client.get(first.data['next'])
+
+        res = self.client.get(second.data['previous'])
+
+        self.assertIsNone(first.data['previous'])
+        self.assertEqual(res.data['results'], first.data['results'])
+        self.assertIsNone(res.data['previous'])
+
+    def test_deep_page_query_count(self):
+        """Test later pages need the same queries as the first"""
+        pages = []
+        res = self.client.get(TREE_URL, {'page_size': 2})
+        while res.data['next'] is not None:
+            pages.append(res.data['next'])
+            res = self.client.get(res.data['next'])
+
+        with self.assertNumQueries(1):
+            self.client.get(pages[-1])
+
+    def test_max_page_size(self):
+        """Test requested page sizes are capped"""
+        res = self.client.get(TREE_URL, {'page_size': 100000})
+
+        self.assertEqual(len(res.data['results']), 12)
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is rejected"""
+        res = self.client.get(TREE_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_values_wrong_type(self):
+        """Test cursors with values of the wrong type are rejected"""
+        for position in (['x', 1, 1], [[1], 1, 1], [1, None, 1],
+                         [1, 1, {'id': 1}]):
+            cursor = b64encode(json.dumps(
+                {'r': 0, 'p': position}).encode('utf-8')).decode('ascii')
+
+            res = self.client.get(TREE_URL, {'cursor': cursor})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_nested_routes_paginate(self):
+        """Test project stands and stand plots are paginated"""
+        sample_stand(self.project)
+
+        stands, _ = walk(self.client, project_stands_url(self.project.id),
+                         page_size=1)
+        plots, _ = walk(self.client, stand_plots_url(self.stand.id),
+                        page_size=1)
+
+        self.assertEqual(len(stands), 2)
+        self.assertEqual(len(plots), 2)
@@ -0,0 +1,172 @@
+from unittest import mock
+
+import numpy as np
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Job, Projection, ProjectionResult
+
+from forest import projection
+from forest.tests.test_projects_api import sample_project, sample_stand, \
+    sample_plot, sample_tree, sample_tree_reference, sample_sample_design
+
+
+def project_projections_url(project_id):
+    """Return the URL starting projections of a project"""
+    return reverse('forest:project-projections', args=[project_id])
+
+
+def projection_detail_url(projection_id):
+    """Return a projection detail URL"""
+    return reverse('forest:projection-detail', args=[projection_id])
+
+
+def sample_inputs(count=200, per_area=2.0, max_density=1100.0):
+    """Return projection inputs of a young even aged stand"""
+    rng = np.random.RandomState(0)
+    dbh = rng.uniform(10, 30, count)
+    return {
+        'dbh': dbh,
+        'height': 1.37 + dbh * 0.8,
+        'crown': np.full(count, 60.0),
+        'per_area': np.full(count, per_area),
+        'max_density': max_density
+    }
+
+
+class GrowthModelTest(TestCase):
+    """Test the vectorized growth, height and mortality steps"""
+
+    def test_trees_grow_and_die(self):
+        """Test diameter and height increase while density decreases"""
+        rows = projection.project_stand(sample_inputs(), 10, 5, 'metric')
+
+        self.assertEqual([row['year'] for row in rows],
+                         list(range(0, 55, 5)))
+        for before, after in zip(rows, rows[1:]):
+            self.assertGreater(after['qmd'], before['qmd'])
+            self.assertGreater(after['mean_height'], before['mean_height'])
+            self.assertLess(after['trees_per_area'], before['trees_per_area'])
+            self.assertAlmostEqual(
+                before['trees_per_area'] - after['trees_per_area'],
+                after['mortality'])
+
+    def test_density_capped_by_max_sdi(self):
+        """Test self thinning keeps an overstocked stand below its maximum"""
+        inputs = sample_inputs(per_area=20.0, max_density=800.0)
+
+        rows = projection.project_stand(inputs, 10, 5, 'metric')
+
+        self.assertGreater(rows[0]['sdi'], 800)
+        for row in rows[1:]:
+            # Reported SDI uses the quadratic mean diameter and runs a
+            # little above the summed SDI the thinning limits
+            self.assertLessEqual(row['sdi'],
+                                 800 * projection.THINNING_LIMIT * 1.02)
+
+    def test_english_units(self):
+        """Test english stands are projected in their own units"""
+        metric = projection.project_stand(sample_inputs(), 2, 5, 'metric')
+        inputs = sample_inputs(per_area=2.0 / 2.47105)
+        inputs['dbh'] = inputs['dbh'] / 2.54
+        inputs['height'] = inputs['height'] / 0.3048
+        english = projection.project_stand(inputs, 2, 5, 'english')
+
+        self.assertAlmostEqual(english[2]['qmd'] * 2.54, metric[2]['qmd'])
+        self.assertAlmostEqual(english[2]['trees_per_area'] * 2.47105,
+                               metric[2]['trees_per_area'])
+
+
+class ProjectionApiTest(TestCase):
+    """Test starting growth projections and reading their results"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = sample_project(measurement_system='english')
+        sample_sample_design(self.project, sample_type='FRQ', factor=20,
+                             var='DBH', minv=0, maxv=100)
+        fir = sample_tree_reference(symbol='PSME', max_density_index=595)
+        self.stands = [sample_stand(self.project) for i in range(2)]
+        for stand in self.stands:
+            plot = sample_plot(stand)
+            for dbh in (6, 10, 14):
+                sample_tree(plot, fir, count=2, dbh=dbh, height=dbh * 6,
+                            live_crown_ratio=50)
+
+    def test_start_projection(self):
+        """Test a projection is accepted and run after commit"""
+        with mock.patch.object(projection, 'start') as start:
+            res = self.client.post(project_projections_url(self.project.id),
+                                   {'periods': 4, 'period_length': 10})
+
+        self.assertEqual(res.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(res.data['status'], Projection.PENDING)
+        run = Projection.objects.get(pk=res.data['id'])
+        self.assertEqual((run.periods, run.period_length), (4, 10))
+        start.assert_called_once_with(run, user=None)
+
+    def test_projection_queued_as_job(self):
+        """Test a started projection is run by a job worker"""
+        res = self.client.post(project_projections_url(self.project.id),
+                               {'periods': 2})
+        run = Projection.objects.get(pk=res.data['id'])
+        self.assertEqual(res.data['job'], run.job_id)
+        self.assertEqual(run.job.status, Job.QUEUED)
+
+        self.assertEqual(jobs.work('worker', burst=True), 1)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, Projection.DONE)
+        self.assertEqual(run.results.count(), 2 * 3)
+        self.assertEqual((run.job.status, run.job.progress, run.job.result),
+                         (Job.DONE, 1, {'projection': run.id}))
+
+    def test_invalid_projection(self):
+        """Test out of range periods are rejected"""
+        res = self.client.post(project_projections_url(self.project.id),
+                               {'periods': projection.MAX_PERIODS + 1})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Projection.objects.exists())
+
+    @override_settings(PROJECTION_WORKERS=2)
+    def test_run_projection_in_process_pool(self):
+        """Test stands are projected by worker processes and stored"""
+        run = Projection.objects.create(project=self.project, periods=3,
+                                        period_length=5)
+
+        projection.run(run)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, Projection.DONE)
+        self.assertEqual(ProjectionResult.objects.filter(
+            projection=run).count(), 2 * 4)
+
+        res = self.client.get(projection_detail_url(run.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        first = res.data['results'][0]
+        self.assertEqual((first['stand'], first['period']),
+                         (self.stands[0].id, 0))
+        self.assertAlmostEqual(first['trees_per_area'], 20 * 6)
+
+    def test_failed_projection(self):
+        """Test errors are recorded on the projection"""
+        run = Projection.objects.create(project=self.project)
+
+        with mock.patch.object(projection, 'project_stand',
+                               side_effect=ValueError('boom')):
+            with self.assertRaises(ValueError), \
+                    self.assertLogs('forest.projection', 'ERROR') as logs:
+                projection.run(run)
+
+        run.refresh_from_db()
+        self.assertEqual(run.status, Projection.FAILED)
+        self.assertEqual(run.error, 'ValueError: boom')
+        self.assertIn('Traceback', logs.output[0])
+        res = self.client.get(projection_detail_url(run.id))
+        self.assertEqual(res.data['error'], 'ValueError: boom')
@@ -12,7 +12,8 @@ from datetime import datetime
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Project, Stand, Plot, Tree, TreeReference
+from core.models import Project, Stand, Plot, Tree, TreeReference, \
+    SampleDesign
 
 from forest.serializers import ProjectSerializer, StandSerializer, \
     ProjectDetailSerializer
@@ -106,6 +107,48 @@ def sample_tree_reference(**params):
     return TreeReference.objects.create(**defaults)
 
 
+def sample_tree(plot, symbol, **params):
+    """Create and return a sample tree"""
+    defaults = {
+        'plot': plot,
+        'symbol': symbol,
+        'count': 10,
+        'dbh': 20,
+        'height': 70,
+        'live_crown_ratio': 40
+    }
+    defaults.update(params)
+
+    return Tree.objects.create(**defaults)
+
+
+def sample_sample_design(project, **params):
+    """Create and return a sample sample design"""
+    defaults = {
+        'project': project,
+        'sample_type': 'BAF',
+        'factor': 20,
+        'var': 'DBH',
+        'minv': 5,
+        'maxv': 40
+    }
+    defaults.update(params)
+
+    return SampleDesign.objects.create(**defaults)
+
+
+def sample_cruise(project, stands=2, plots=2, trees=2):
+    """Populate a project with stands, plots and trees"""
+    tree_reference = sample_tree_reference()
+    sample_sample_design(project)
+    for _ in range(stands):
+        stand = sample_stand(project)
+        for _ in range(plots):
+            plot = sample_plot(stand)
+            for _ in range(trees):
+                sample_tree(plot, tree_reference)
+
+
 class PublicProjectsApiTest(TestCase):
     """Test publicly available project API"""
 
@@ -162,6 +205,40 @@ class PublicProjectsApiTest(TestCase):
         serializer = ProjectSerializer(project)
         self.assertEqual(res.data, serializer.data)
 
+    def test_view_project_detail_nested(self):
+        """Test project detail includes stands, plots and trees"""
+        project = sample_project()
+        sample_cruise(project)
+
+        res = self.client.get(project_detail_url(project.id))
+
+        serializer = ProjectDetailSerializer(project)
+        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['stands']), 2)
+        self.assertEqual(len(res.data['stands'][0]['plots']), 2)
+        self.assertEqual(len(res.data['stands'][0]['plots'][0]['trees']), 2)
+        self.assertEqual(len(res.data['sample_design']), 1)
+
+    def test_project_detail_query_count_constant(self):
+        """Test project detail query count does not grow with its size"""
+        small = sample_project()
+        sample_cruise(small, stands=1, plots=1, trees=1)
+        large = sample_project()
+        sample_cruise(large, stands=4, plots=3, trees=5)
+
+        with self.assertNumQueries(6):
+            self.client.get(project_detail_url(small.id))
+        with self.assertNumQueries(6):
+            self.client.get(project_detail_url(large.id))
+
+    def test_project_list_query_count_constant(self):
+        """Test project list query count does not grow with projects"""
+        for _ in range(3):
+            sample_cruise(sample_project(), stands=2, plots=1, trees=1)
+
+        with self.assertNumQueries(3):
+            self.client.get(PROJECTS_URL)
+
     def test_view_project_stands(self):
         """Test viewing stands for a single project"""
         project = sample_project()
@@ -173,7 +250,7 @@ class PublicProjectsApiTest(TestCase):
         url = project_stands_url(project.id)
         res = self.client.get(url)
 
-        self.assertEqual(len(res.data), 2)
+        self.assertEqual(len(res.data['results']), 2)
 
 
 class PublicStandsApiTest(TestCase):
@@ -218,6 +295,27 @@ class PublicStandsApiTest(TestCase):
 
         self.assertEqual(res.data, stand_data)
 
+    def test_view_stand_detail_sample_design(self):
+        """Test stand detail only loads its project's sample design"""
+        project = sample_project(measurement_system='metric')
+        sample_cruise(project, stands=3, plots=3, trees=3)
+        sample_sample_design(project, sample_type='FRQ', factor=10)
+        stand = project.stands.first()
+
+        with self.assertNumQueries(4):
+            res = self.client.get(stand_detail_url(stand.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['sample_design']), 2)
+        self.assertEqual(len(res.data['plots']), 3)
+        self.assertEqual(res.data['measurement_system'], 'metric')
+
+    def test_view_stand_detail_not_found(self):
+        """Test viewing a stand that does not exist"""
+        res = self.client.get(stand_detail_url(999999))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_view_stand_plots(self):
         """Test viewing plots for a single stand"""
         project = sample_project()
@@ -228,7 +326,7 @@ class PublicStandsApiTest(TestCase):
 
         url = stand_plots_url(stand.id)
         res = self.client.get(url)
-        self.assertEqual(len(res.data), 3)
+        self.assertEqual(len(res.data['results']), 3)
 
 
 class PublicPlotsApiTest(TestCase):
@@ -0,0 +1,130 @@
+import json
+import random
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import geohash
+from core.models import Plot
+
+from forest import spatial
+from forest.tests.test_indexes import plan_nodes
+from forest.tests.test_projects_api import PLOT_URL, sample_project, \
+    sample_stand, sample_plot
+
+
+class GeohashTest(TestCase):
+    """Test cell numbers and the ranges covering bounding boxes"""
+
+    def test_cover_contains_points(self):
+        """Test every point inside a box falls in one of its ranges"""
+        rng = random.Random(0)
+        for size in (0.001, 0.1, 5, 60):
+            south, west = rng.uniform(-80, 0), rng.uniform(-170, 0)
+            north, east = south + size, west + size
+            ranges = geohash.cover(south, west, north, east)
+            self.assertLessEqual(len(ranges), geohash.MAX_CELLS)
+            for i in range(100):
+                cell = geohash.encode(rng.uniform(south, north),
+                                      rng.uniform(west, east))
+                self.assertTrue(any(low <= cell < high
+                                    for low, high in ranges))
+
+    def test_nearby_points_share_prefix(self):
+        """Test close points get close cells and far points do not"""
+        portland = geohash.encode(45.52, -122.68)
+        nearby = geohash.encode(45.5201, -122.6801)
+        boston = geohash.encode(42.36, -71.06)
+
+        self.assertLess(abs(portland - nearby), 1 << 20)
+        self.assertGreater(abs(portland - boston), 1 << 40)
+
+
+class PlotSpatialFilterTest(TestCase):
+    """Test the bbox and near filters of the plot list"""
+
+    def setUp(self):
+        self.client = APIClient()
+        stand = sample_stand(sample_project())
+        self.portland = sample_plot(stand, latitude=45.52, longitude=-122.68)
+        self.salem = sample_plot(stand, latitude=44.94, longitude=-123.04)
+        self.bend = sample_plot(stand, latitude=44.06, longitude=-121.31)
+        self.fiji = sample_plot(stand, latitude=-17.8, longitude=179.9)
+
+    def ids(self, params):
+        res = self.client.get(PLOT_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return sorted(plot['id'] for plot in res.data['results'])
+
+    def test_cells_maintained(self):
+        """Test saves, bulk creates and updates keep cells current"""
+        self.assertEqual(self.portland.geocell, geohash.encode(45.52, -122.68))
+
+        plot, = Plot.objects.bulk_create([Plot(
+            stand=self.portland.stand, number=999, latitude=1, longitude=2,
+            slope=0, aspect='north')])
+        self.assertEqual(plot.geocell, geohash.encode(1, 2))
+
+        Plot.objects.filter(pk=self.salem.pk).update(latitude=10)
+        self.salem.refresh_from_db()
+        self.assertEqual(self.salem.geocell, geohash.encode(10, -123.04))
+
+    def test_bbox(self):
+        """Test listing the plots inside a bounding box"""
+        ids = self.ids({'bbox': '-123.5,44.5,-122,46'})
+
+        self.assertEqual(ids, sorted([self.portland.id, self.salem.id]))
+
+    def test_bbox_across_antimeridian(self):
+        """Test a box whose west edge is east of its east edge"""
+        ids = self.ids({'bbox': '179,-20,-179,-15'})
+
+        self.assertEqual(ids, [self.fiji.id])
+
+    def test_near(self):
+        """Test listing the plots within a radius of a point"""
+        self.assertEqual(self.ids({'near': '45.5,-122.7', 'radius': 5000}),
+                         [self.portland.id])
+        self.assertEqual(
+            self.ids({'near': '45.5,-122.7', 'radius': 80000}),
+            sorted([self.portland.id, self.salem.id]))
+
+    def test_near_across_antimeridian(self):
+        """Test distances wrap around the antimeridian"""
+        ids = self.ids({'near': '-17.8,-179.95', 'radius': 20000})
+        self.assertEqual(ids, [self.fiji.id])
+
+        ids = self.ids({'near': '-17.8,-179.95', 'radius': 10000})
+        self.assertEqual(ids, [])
+
+    def test_invalid_parameters(self):
+        """Test malformed spatial parameters are rejected"""
+        for params in ({'bbox': '1,2,3'}, {'bbox': '0,10,1,5'},
+                       {'bbox': 'a,b,c,d'}, {'near': '45,-122'},
+                       {'near': '95,0', 'radius': 10},
+                       {'near': '45,-122', 'radius': -1}):
+            res = self.client.get(PLOT_URL, params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST,
+                             params)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Requires PostgreSQL')
+    def test_geocell_index_used(self):
+        """Test box queries select candidates through the geocell index"""
+        queryset = Plot.objects.filter(
+            spatial.in_box(44.5, -123.5, 46, -122))
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+            cursor.execute('SET LOCAL enable_seqscan = on')
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        indexes = {node.get('Index Name')
+                   for node in plan_nodes(plan[0]['Plan'])}
+        self.assertIn('plot_geocell_idx', indexes)
@@ -0,0 +1,67 @@
+import json
+
+from django.test import TestCase
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from forest.tests.test_projects_api import TREE_URL, project_detail_url, \
+    sample_project, sample_cruise
+
+
+def sort_by_id(items, nested=None):
+    """Return items sorted by id, sorting their nested lists as well"""
+    items = sorted(items, key=lambda item: item['id'])
+    if nested:
+        key, rest = nested[0], nested[1:]
+        for item in items:
+            item[key] = sort_by_id(item[key], rest)
+
+    return items
+
+
+class StreamingApiTest(TestCase):
+    """Test streaming responses for large forest resources"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = sample_project()
+        sample_cruise(self.project, stands=3, plots=2, trees=3)
+        sample_cruise(sample_project(), stands=1, plots=1, trees=1)
+
+    def test_stream_project_detail(self):
+        """Test streamed project detail matches the regular response"""
+        url = project_detail_url(self.project.id)
+        expected = json.loads(self.client.get(url).content)
+
+        res = self.client.get(url, {'format': 'stream'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        streamed = json.loads(b''.join(res.streaming_content))
+        self.assertEqual(sort_by_id(streamed['stands'], ['plots', 'trees']),
+                         sort_by_id(expected['stands'], ['plots', 'trees']))
+        streamed.pop('stands')
+        expected.pop('stands')
+        self.assertEqual(streamed, expected)
+
+    def test_stream_project_detail_empty(self):
+        """Test streaming a project without stands"""
+        project = sample_project()
+
+        res = self.client.get(project_detail_url(project.id),
+                              HTTP_ACCEPT='application/stream+json')
+
+        streamed = json.loads(b''.join(res.streaming_content))
+        self.assertEqual(streamed['stands'], [])
+        self.assertEqual(streamed['sample_design'], [])
+
+    def test_stream_tree_list(self):
+        """Test streamed tree list matches the regular response"""
+        expected = json.loads(self.client.get(TREE_URL).content)['results']
+
+        res = self.client.get(TREE_URL, HTTP_ACCEPT='application/stream+json')
+
+        self.assertTrue(res.streaming)
+        streamed = json.loads(b''.join(res.streaming_content))
+        self.assertEqual(sort_by_id(streamed), sort_by_id(expected))
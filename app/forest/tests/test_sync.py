@@ -0,0 +1,222 @@
+import threading
+from io import StringIO
+
+from django.db import connections, transaction
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Plot, Project, Tombstone, Tree
+
+from forest import sync
+from forest.tally import TallyImporter
+from forest.tests.test_projects_api import sample_project, sample_stand, \
+    sample_plot, sample_tree, sample_tree_reference, sample_sample_design
+
+
+def project_changes_url(project_id, since=None):
+    """Return a project changes URL"""
+    url = reverse('forest:project-changes', args=[project_id])
+    if since is not None:
+        url += '?since=' + sync.encode_cursor(since)
+    return url
+
+
+class ProjectChangesTest(TransactionTestCase):
+    """Test the project delta sync endpoint
+
+    Change ids are transaction ids, so writes must commit separately.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.project = sample_project()
+        self.design = sample_sample_design(self.project)
+        self.stand = sample_stand(self.project)
+        self.plot = sample_plot(self.stand)
+        self.reference = sample_tree_reference()
+        self.tree = sample_tree(self.plot, self.reference)
+        self.since = sync.current_cursor()
+
+    def changes(self, since=None, project=None):
+        res = self.client.get(project_changes_url(
+            (project or self.project).id, since))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_full_snapshot(self):
+        """Test a request without a cursor returns the whole project"""
+        data = self.changes()
+
+        self.assertEqual(data['project']['id'], self.project.id)
+        self.assertNotIn('stands', data['project'])
+        self.assertEqual([d['id'] for d in data['sample_designs']],
+                         [self.design.id])
+        self.assertEqual([s['id'] for s in data['stands']], [self.stand.id])
+        self.assertNotIn('plots', data['stands'][0])
+        self.assertEqual([p['id'] for p in data['plots']], [self.plot.id])
+        self.assertEqual(data['trees'][0]['dbh'], self.tree.dbh)
+        self.assertEqual(data['deleted']['trees'], [])
+        self.assertGreaterEqual(sync.decode_cursor(data['cursor']),
+                                self.since)
+
+    def test_no_changes(self):
+        """Test a cursor after the last write returns nothing"""
+        data = self.changes(self.since)
+
+        self.assertIsNone(data['project'])
+        for name in ('sample_designs', 'stands', 'plots', 'trees'):
+            self.assertEqual(data[name], [])
+            self.assertEqual(data['deleted'][name], [])
+
+    def test_updates_since_cursor(self):
+        """Test saves and queryset updates after the cursor are returned"""
+        other = sample_tree(self.plot, self.reference)
+        self.plot.slope = 10
+        self.plot.save()
+        Tree.objects.filter(pk=self.tree.pk).update(height=99)
+
+        data = self.changes(self.since)
+
+        self.assertEqual(data['stands'], [])
+        self.assertEqual([p['id'] for p in data['plots']], [self.plot.id])
+        self.assertEqual([t['id'] for t in data['trees']],
+                         [self.tree.id, other.id])
+        self.assertEqual(data['trees'][0]['height'], 99)
+
+    def test_write_committed_after_cursor(self):
+        """Test a write committing after a cursor was issued is returned"""
+        written, release = threading.Event(), threading.Event()
+
+        def write():
+            try:
+                with transaction.atomic():
+                    Tree.objects.filter(pk=self.tree.pk).update(height=77)
+                    written.set()
+                    release.wait(10)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        self.assertTrue(written.wait(10))
+        cursor = sync.decode_cursor(self.changes(self.since)['cursor'])
+        release.set()
+        thread.join()
+
+        data = self.changes(cursor)
+
+        self.assertEqual([t['id'] for t in data['trees']], [self.tree.id])
+        self.assertEqual(data['trees'][0]['height'], 77)
+
+    def test_deletes_since_cursor(self):
+        """Test instance and queryset deletes leave tombstones"""
+        tree = sample_tree(sample_plot(self.stand), self.reference)
+        plot_id, design_id = tree.plot_id, self.design.id
+        Tree.objects.filter(pk=self.tree.pk).delete()
+        tree.plot.delete()
+        self.design.delete()
+
+        data = self.changes(self.since)
+
+        self.assertEqual(data['deleted']['trees'], [self.tree.id])
+        self.assertEqual(data['deleted']['plots'], [plot_id])
+        self.assertEqual(data['deleted']['sample_designs'], [design_id])
+        self.assertEqual(data['plots'], [])
+
+    def test_moved_objects(self):
+        """Test objects moved between projects are deleted from the old
+        project and updated in the new one"""
+        project = sample_project()
+        stand = sample_stand(project)
+        plot = sample_plot(stand)
+        self.stand.project_id = project
+        self.stand.save()
+        Plot.objects.filter(pk=plot.pk).update(stand=self.stand)
+        moved = sample_tree(sample_plot(stand), self.reference)
+        self.tree.plot = moved.plot
+        self.tree.save()
+
+        old = self.changes(self.since)
+        new = self.changes(self.since, project)
+
+        self.assertEqual(old['deleted']['stands'], [self.stand.id])
+        self.assertEqual(new['deleted']['stands'], [])
+        self.assertEqual(new['deleted']['plots'], [])
+        self.assertIn(self.stand.id, [s['id'] for s in new['stands']])
+        self.assertIn(self.tree.id, [t['id'] for t in new['trees']])
+
+    def test_moved_subtrees(self):
+        """Test the children of moved stands and plots follow them"""
+        project = sample_project()
+        stand = sample_stand(project)
+        plot = sample_plot(self.stand)
+        tree = sample_tree(plot, self.reference)
+        since = sync.current_cursor()
+
+        self.stand.project_id = project
+        self.stand.save()
+        old = self.changes(since)
+        new = self.changes(since, project)
+
+        self.assertEqual([p['id'] for p in new['plots']],
+                         [self.plot.id, plot.id])
+        self.assertEqual([t['id'] for t in new['trees']],
+                         [self.tree.id, tree.id])
+        self.assertEqual(old['deleted']['plots'], [self.plot.id, plot.id])
+        self.assertEqual(old['deleted']['trees'], [self.tree.id, tree.id])
+
+        since = sync.current_cursor()
+        plot.stand = stand
+        plot.save()
+        Plot.objects.filter(pk=self.plot.pk).update(stand=stand)
+        new = self.changes(since, project)
+
+        self.assertEqual([t['id'] for t in new['trees']],
+                         [self.tree.id, tree.id])
+        self.assertEqual(new['deleted']['trees'], [])
+
+    def test_tally_import_stamps_change_id(self):
+        """Test trees written with COPY are picked up by the cursor"""
+        sheet = ('project,plot,symbol,count,dbh,height,live_crown_ratio\n'
+                 '%s,%s,%s,1,12,50,40\n' % (self.project.id, self.plot.number,
+                                            self.reference.symbol))
+        TallyImporter().run(StringIO(sheet))
+
+        data = self.changes(self.since)
+
+        self.assertEqual(len(data['trees']), 1)
+        self.assertEqual(data['trees'][0]['dbh'], 12)
+
+    def test_not_modified(self):
+        """Test an unchanged project answers 304 for the same cursor"""
+        url = project_changes_url(self.project.id, self.since)
+        etag = self.client.get(url)['ETag']
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_invalid_cursor(self):
+        """Test an invalid cursor is rejected"""
+        url = reverse('forest:project-changes', args=[self.project.id])
+
+        res = self.client.get(url, {'since': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('since', res.data)
+
+    def test_deleted_project(self):
+        """Test a deleted project answers 410 and an unknown one 404"""
+        project_id = self.project.id
+        Project.objects.filter(pk=project_id).delete()
+
+        res = self.client.get(project_changes_url(project_id, self.since))
+        self.assertEqual(res.status_code, status.HTTP_410_GONE)
+        self.assertTrue(Tombstone.objects.filter(
+            model='project', object_id=project_id).exists())
+
+        res = self.client.get(project_changes_url(project_id + 1000))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
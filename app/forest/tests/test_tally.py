@@ -0,0 +1,142 @@
+import os
+import tempfile
+
+from io import StringIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tree, StandAggregate
+
+from forest.tally import TallyImporter
+from forest.tests.test_projects_api import sample_project, sample_stand, \
+    sample_plot, sample_tree_reference
+
+
+HEADER = 'project,stand,plot,symbol,count,dbh,height,live_crown_ratio\n'
+
+
+def project_tally_url(project_id):
+    """Return a project tally upload URL"""
+    return reverse('forest:project-tally', args=[project_id])
+
+
+class TallyImportTest(TestCase):
+    """Test importing CSV tally sheets"""
+
+    def setUp(self):
+        self.project = sample_project()
+        self.stand = sample_stand(self.project)
+        self.plot = sample_plot(self.stand)
+        self.fir = sample_tree_reference(symbol='PSME')
+
+    def tally(self, *rows):
+        """Return tally sheet text for the given rows"""
+        return HEADER + ''.join(
+            '%s,%s,%s,%s\n' % (self.project.id, self.stand.identification,
+                               self.plot.number, row)
+            for row in rows
+        )
+
+    def test_import_tally(self):
+        """Test importing rows with COPY and updating aggregates"""
+        sheet = self.tally('PSME,2,10.5,60,40', 'PSME,1,20,80,35')
+
+        report = TallyImporter().run(StringIO(sheet))
+
+        self.assertEqual(report['created'], 2)
+        self.assertEqual(report['error_count'], 0)
+        self.assertEqual(self.plot.trees.count(), 2)
+        self.assertEqual(StandAggregate.objects.get(stand=self.stand)
+                         .tree_count, 3)
+
+    def test_import_tally_bulk_create_fallback(self):
+        """Test importing without COPY support"""
+        sheet = self.tally('PSME,2,10.5,60,40')
+
+        with mock.patch('forest.copy.use_copy', return_value=False):
+            report = TallyImporter(batch_size=1).run(StringIO(sheet))
+
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(StandAggregate.objects.get(stand=self.stand)
+                         .tree_count, 2)
+
+    def test_import_tally_reports_invalid_rows(self):
+        """Test invalid rows are skipped and reported by line"""
+        sheet = self.tally('PSME,2,10.5,60,40', 'ABCO,1,20,80,35',
+                           'PSME,x,20,80,35')
+        sheet += '%s,%s,999999,PSME,1,1,1,1\n' % (
+            self.project.id, self.stand.identification)
+
+        report = TallyImporter().run(StringIO(sheet))
+
+        self.assertEqual(report['created'], 1)
+        self.assertEqual(report['error_count'], 3)
+        self.assertEqual([error['line'] for error in report['errors']],
+                         [3, 4, 5])
+
+    def test_import_tally_ragged_rows(self):
+        """Test short rows are reported instead of failing the import"""
+        sheet = self.tally('PSME,2,10.5,60,40', 'PSME,2')
+        sheet += '%s,S1,%s\n' % (self.project.id, self.plot.number)
+
+        report = TallyImporter().run(StringIO(sheet))
+
+        self.assertEqual(report['created'], 1)
+        self.assertEqual([error['line'] for error in report['errors']],
+                         [3, 4])
+        self.assertIn('missing values', report['errors'][0]['error'])
+
+        upload = SimpleUploadedFile('tally.csv', sheet.encode('utf-8'),
+                                    content_type='text/csv')
+        res = APIClient().post(project_tally_url(self.project.id),
+                               {'file': upload}, format='multipart')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['error_count'], 2)
+
+    def test_import_tally_missing_columns(self):
+        """Test a sheet without the tree columns is rejected"""
+        with self.assertRaises(ValueError):
+            TallyImporter().run(StringIO('plot,symbol\n1,PSME\n'))
+
+    def test_import_tally_command(self):
+        """Test importing a tally sheet file with the command"""
+        handle, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(handle, 'w') as sheet:
+            sheet.write(self.tally('PSME,2,10.5,60,40'))
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+
+        call_command('import_tally', path, stdout=out, stderr=StringIO())
+
+        self.assertIn('Imported 1 of 1 rows', out.getvalue())
+        self.assertEqual(Tree.objects.count(), 1)
+
+    def test_import_tally_command_missing_file(self):
+        """Test the command fails for a missing file"""
+        with self.assertRaises(CommandError):
+            call_command('import_tally', '/nonexistent/tally.csv')
+
+    def test_upload_tally(self):
+        """Test uploading a tally sheet to a project"""
+        other_project = sample_project()
+        sheet = self.tally('PSME,2,10.5,60,40')
+        sheet += '%s,,%s,PSME,1,1,1,1\n' % (other_project.id,
+                                            self.plot.number)
+        upload = SimpleUploadedFile('tally.csv', sheet.encode('utf-8'),
+                                    content_type='text/csv')
+
+        res = APIClient().post(project_tally_url(self.project.id),
+                               {'file': upload}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 1)
+        self.assertEqual(res.data['error_count'], 1)
+        self.assertIn('rows_per_second', res.data)
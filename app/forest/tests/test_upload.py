@@ -0,0 +1,168 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Project, SampleDesign, Stand, Plot, Tree, \
+    StandAggregate
+
+from forest.tests.test_projects_api import STAND_URL, sample_project, \
+    sample_stand, sample_tree_reference
+
+
+UPLOAD_URL = reverse('forest:project-upload')
+
+
+def project_document(stands=2, plots=3, trees=4, symbol='PSME', start=1):
+    """Return a nested project document"""
+    number = iter(range(start * 1000, start * 1000 + stands * plots))
+    return {
+        'name': 'Uploaded Project',
+        'land_owner': 'Owner',
+        'measurement_system': 'english',
+        'sample_design': [{'sample_type': 'BAF', 'factor': 20, 'var': 'DBH',
+                           'minv': 5, 'maxv': 40}],
+        'stands': [{
+            'identification': start * 100 + s,
+            'location': 'County',
+            'origin_year': 1950,
+            'size': 20,
+            'plots': [{
+                'number': next(number),
+                'latitude': 45.5,
+                'longitude': -122.6,
+                'slope': 5,
+                'aspect': 'north',
+                'trees': [{
+                    'symbol': symbol,
+                    'count': 1,
+                    'dbh': 10 + t,
+                    'height': 60,
+                    'live_crown_ratio': 40
+                } for t in range(trees)]
+            } for p in range(plots)]
+        } for s in range(stands)]
+    }
+
+
+class ProjectUploadApiTest(TestCase):
+    """Test creating a whole project from one nested document"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.fir = sample_tree_reference(symbol='PSME')
+
+    def test_upload_project(self):
+        """Test every level is created and wired to its parents"""
+        document = project_document(stands=3, plots=4, trees=25)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.post(UPLOAD_URL, document, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], {
+            'sample_design': 1, 'stands': 3, 'plots': 12, 'trees': 300})
+        self.assertLess(len(queries), 20)
+
+        project = Project.objects.get(pk=res.data['id'])
+        self.assertEqual(project.measurement_system, 'english')
+        self.assertEqual(SampleDesign.objects.filter(
+            project=project).count(), 1)
+        stands = Stand.objects.filter(project_id=project).order_by(
+            'identification')
+        self.assertEqual([s.identification for s in stands],
+                         [100, 101, 102])
+        plots = Plot.objects.filter(stand=stands[1]).order_by('number')
+        self.assertEqual([p.number for p in plots],
+                         [1004, 1005, 1006, 1007])
+        self.assertEqual(Tree.objects.filter(
+            plot=plots[0], symbol=self.fir).count(), 25)
+        aggregate = StandAggregate.objects.get(stand=stands[2])
+        self.assertEqual(aggregate.records, 100)
+
+    def test_upload_without_copy(self):
+        """Test trees are bulk created where COPY is not supported"""
+        document = project_document(stands=1, plots=2, trees=3)
+
+        with mock.patch('forest.copy.use_copy', return_value=False):
+            res = self.client.post(UPLOAD_URL, document, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        stand = Stand.objects.get(project_id=res.data['id'])
+        self.assertEqual(Tree.objects.filter(plot__stand=stand).count(), 6)
+        self.assertEqual(StandAggregate.objects.get(stand=stand).records, 6)
+
+    def test_invalid_rows_create_nothing(self):
+        """Test errors are located by path and nothing is created"""
+        document = project_document()
+        document['stands'][0]['plots'][1]['trees'][2]['dbh'] = 'wide'
+        document['stands'][1]['plots'][0]['trees'][0]['symbol'] = 'NOPE'
+        document['stands'][1]['location'] = ''
+
+        res = self.client.post(UPLOAD_URL, document, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        paths = sorted(error['path'] for error in res.data['errors'])
+        self.assertEqual(paths, [
+            '/stands/0/plots/1/trees/2', '/stands/1',
+            '/stands/1/plots/0/trees/0'
+        ])
+        self.assertFalse(Project.objects.filter(
+            name='Uploaded Project').exists())
+        self.assertFalse(Tree.objects.exists())
+
+    def test_duplicate_identifiers(self):
+        """Test identifiers repeated or already taken are rejected"""
+        sample_stand(sample_project(), identification=100)
+        document = project_document(stands=2, plots=1, trees=1)
+        document['stands'][1]['plots'][0]['number'] = \
+            document['stands'][0]['plots'][0]['number']
+
+        res = self.client.post(UPLOAD_URL, document, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = {error['path']: error['errors']
+                  for error in res.data['errors']}
+        self.assertIn('identification', errors['/stands/0'])
+        self.assertIn('number', errors['/stands/1/plots/0'])
+        self.assertEqual(len(errors), 2)
+
+    def test_identifiers_taken_concurrently(self):
+        """Test identifiers taken after validation answer 409"""
+        sample_stand(sample_project(), identification=100)
+        document = project_document(stands=1, plots=1, trees=1)
+
+        with mock.patch('forest.upload.check_unique'):
+            res = self.client.post(UPLOAD_URL, document, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Project.objects.filter(
+            name='Uploaded Project').exists())
+
+    def test_malformed_document(self):
+        """Test non object documents and non list children are rejected"""
+        res = self.client.post(UPLOAD_URL, [], format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        document = project_document()
+        document['stands'][0]['plots'] = {'number': 1}
+        res = self.client.post(UPLOAD_URL, document, format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data['errors'][0]['path'], '/stands/0/plots')
+
+    def test_create_stand_from_json(self):
+        """Test stands are created from JSON bodies without a parent get"""
+        project = sample_project()
+        payload = {'project_id': project.id, 'identification': 7,
+                   'location': 'County', 'origin_year': 1990, 'size': 3}
+
+        res = self.client.post(STAND_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Stand.objects.get(pk=res.data['id']).project_id,
+                         project)
@@ -0,0 +1,220 @@
+from django.db import IntegrityError, transaction
+
+from rest_framework import serializers, status
+from rest_framework.response import Response
+
+from core import aggregates
+from core.models import Project, SampleDesign, Stand, Plot
+
+from forest import bulk, copy
+from forest.serializers import SampleDesignSerializer, StandSerializer, \
+    PlotSerializer, TreeSerializer
+
+
+class ProjectUploadSerializer(serializers.ModelSerializer):
+    """Serializer for the project fields of an uploaded project document"""
+
+    class Meta:
+        model = Project
+        fields = ('name', 'land_owner', 'measurement_system', 'equation_set')
+
+
+class SampleDesignUploadSerializer(serializers.ModelSerializer):
+    """Serializer for a sample design of an uploaded project document"""
+
+    class Meta:
+        model = SampleDesign
+        fields = tuple(name for name in SampleDesignSerializer.Meta.fields
+                       if name not in ('id', 'project'))
+
+
+class StandUploadSerializer(serializers.ModelSerializer):
+    """Serializer for a stand of an uploaded project document
+
+    Uniqueness of identifications is checked for the whole document at
+    once rather than by a query per stand.
+    """
+    identification = serializers.IntegerField()
+
+    class Meta:
+        model = Stand
+        fields = tuple(name for name in StandSerializer.Meta.fields
+                       if name not in ('id', 'project_id', 'plots'))
+
+
+class PlotUploadSerializer(serializers.ModelSerializer):
+    """Serializer for a plot of an uploaded project document
+
+    Uniqueness of numbers is checked for the whole document at once.
+    """
+    number = serializers.IntegerField()
+
+    class Meta:
+        model = Plot
+        fields = tuple(name for name in PlotSerializer.Meta.fields
+                       if name not in ('id', 'stand', 'trees'))
+
+
+class TreeUploadSerializer(bulk.TreeBulkSerializer):
+    """Serializer for a tree of an uploaded project document"""
+    plot = None
+
+    class Meta(bulk.TreeBulkSerializer.Meta):
+        fields = tuple(name for name in TreeSerializer.Meta.fields
+                       if name not in ('id', 'plot'))
+
+    def validate(self, attrs):
+        return attrs
+
+
+def children(row, name, path, errors):
+    """Return the list of child rows under a name of a document row"""
+    value = row.get(name, []) if isinstance(row, dict) else []
+    if not isinstance(value, list):
+        errors.append({'path': '%s/%s' % (path, name),
+                       'errors': {name: ['Expected a list.']}})
+        return []
+
+    return value
+
+
+def validate_row(serializer, row, path, errors):
+    """Return the validated data of a document row or None when invalid
+
+    One serializer validates every row of a level, like the child of a
+    list serializer, so its fields are built once.
+    """
+    try:
+        return serializer.run_validation(row)
+    except serializers.ValidationError as error:
+        errors.append({'path': path or '/',
+                       'errors': serializers.as_serializer_error(error)})
+        return None
+
+
+def check_unique(model, field, values, paths, errors):
+    """Record errors for values repeated in the document or already used"""
+    taken = set(model.objects.filter(**{field + '__in': set(values)})
+                .values_list(field, flat=True))
+    seen = set()
+    for value, path in zip(values, paths):
+        if value in taken or value in seen:
+            errors.append({'path': path, 'errors': {field: [
+                '%s with this %s already exists.' % (
+                    model._meta.verbose_name, field)]}})
+        seen.add(value)
+
+
+def validate_document(document):
+    """Validate a nested project document in one pass
+
+    Returns the validated project fields and the sample designs, stands,
+    plots and trees as lists of (parent index, validated data), along
+    with a list of errors located by JSON pointer.
+    """
+    errors = []
+    project = validate_row(ProjectUploadSerializer(), document, '', errors)
+    designs, stands, plots, trees = [], [], [], []
+    stand_paths, plot_paths = [], []
+
+    serializer = SampleDesignUploadSerializer()
+    rows = children(document, 'sample_design', '', errors)
+    for index, row in enumerate(rows):
+        data = validate_row(serializer, row, '/sample_design/%d' % index,
+                            errors)
+        designs.append((0, data))
+
+    stand_serializer = StandUploadSerializer()
+    plot_serializer = PlotUploadSerializer()
+    tree_rows = []
+    for stand_index, stand in enumerate(children(document, 'stands', '',
+                                                 errors)):
+        path = '/stands/%d' % stand_index
+        stands.append((0, validate_row(stand_serializer, stand, path,
+                                       errors)))
+        stand_paths.append(path)
+        for plot_index, plot in enumerate(children(stand, 'plots', path,
+                                                   errors)):
+            plot_path = '%s/plots/%d' % (path, plot_index)
+            plots.append((stand_index, validate_row(
+                plot_serializer, plot, plot_path, errors)))
+            plot_paths.append(plot_path)
+            for tree_index, tree in enumerate(children(plot, 'trees',
+                                                       plot_path, errors)):
+                tree_rows.append((len(plots) - 1, tree, '%s/trees/%d' % (
+                    plot_path, tree_index)))
+
+    tree_serializer = TreeUploadSerializer(context={
+        'symbols': bulk.load_symbols([row for _, row, _ in tree_rows])
+    })
+    for plot_index, row, path in tree_rows:
+        trees.append((plot_index, validate_row(
+            tree_serializer, row, path, errors)))
+
+    for model, field, rows, paths in (
+            (Stand, 'identification', stands, stand_paths),
+            (Plot, 'number', plots, plot_paths)):
+        valid = [(data[field], path) for (_, data), path in zip(rows, paths)
+                 if data is not None]
+        if valid:
+            check_unique(model, field, *zip(*valid), errors)
+
+    return project, designs, stands, plots, trees, errors
+
+
+def create_document(project, designs, stands, plots, trees):
+    """Create a validated project document level by level
+
+    Each level is inserted with one bulk_create and its rows are wired to
+    the ids their parents received from the level above. Trees, the bulk
+    of a cruise, are written like tally imports, with COPY where the
+    database supports it.
+    """
+    with transaction.atomic():
+        project = Project.objects.create(**project)
+        SampleDesign.objects.bulk_create(
+            [SampleDesign(project=project, **data) for _, data in designs],
+            batch_size=bulk.BATCH_SIZE)
+        stands = Stand.objects.bulk_create(
+            [Stand(project_id=project, **data) for _, data in stands],
+            batch_size=bulk.BATCH_SIZE)
+        plots = Plot.objects.bulk_create(
+            [Plot(stand_id=stands[parent].id, **data)
+             for parent, data in plots],
+            batch_size=bulk.BATCH_SIZE)
+        rows = [
+            (plots[parent].id, data['symbol'].id, data['count'], data['dbh'],
+             data['height'], data['live_crown_ratio'])
+            for parent, data in trees
+        ]
+        aggregates.apply(copy.write_trees(rows))
+
+    return project
+
+
+def upload_response(request):
+    """Return the response to a nested project upload request"""
+    if not isinstance(request.data, dict):
+        return Response({'detail': 'Expected a project document.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    *levels, errors = validate_document(request.data)
+    if errors:
+        return Response({'errors': errors},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        project = create_document(*levels)
+    except IntegrityError:
+        return Response({'detail': 'Stand identifications or plot numbers '
+                                   'were taken while uploading.'},
+                        status=status.HTTP_409_CONFLICT)
+
+    counts = {
+        'sample_design': len(levels[1]),
+        'stands': len(levels[2]),
+        'plots': len(levels[3]),
+        'trees': len(levels[4])
+    }
+    return Response({'id': project.id, 'created': counts},
+                    status=status.HTTP_201_CREATED)
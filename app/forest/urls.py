@@ -16,9 +16,11 @@ router.register('plots', views.PlotViewSet)
 router.register('tree-references', views.TreeReferenceViewSet)
 router.register('trees', views.TreeViewSet)
 router.register('sample-designs', views.SampleDesignViewSet)
+router.register('projections', views.ProjectionViewSet)
 
 app_name = 'forest'
 
 urlpatterns = [
+    path('cache-stats/', views.CacheStatsView.as_view(), name='cache-stats'),
     path('', include(router.urls))
 ]
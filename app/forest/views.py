@@ -1,20 +1,47 @@
-from rest_framework import viewsets
+import io
+
+from django.db.models import Prefetch
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from core import aggregates
+from core.authentication import AUTHENTICATION_CLASSES
 from core.models import Project, Stand, Plot, Tree, TreeReference, \
-    SampleDesign
+    SampleDesign, Tombstone, Projection, ProjectionResult
 
-from forest import serializers
+from forest import bulk, cache, cruise, projection, serializers, spatial, \
+    streaming, sync, upload
+from forest.mixins import FastListMixin, FieldPlanMixin, \
+    ProjectVersionMixin
+from forest.pagination import KeysetPagination
+from forest.parsers import PARSER_CLASSES
+from forest.renderers import RENDERER_CLASSES, StreamingJSONRenderer
+from forest.tally import TallyImporter
 
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(FieldPlanMixin, ProjectVersionMixin,
+                     viewsets.ModelViewSet):
     """Manage projects in the database"""
     queryset = Project.objects.all()
     serializer_class = serializers.ProjectSerializer
+    renderer_classes = RENDERER_CLASSES + [StreamingJSONRenderer]
+    parser_classes = PARSER_CLASSES
+    authentication_classes = AUTHENTICATION_CLASSES
+    cache_actions = ('retrieve', 'summary', 'stand_table')
 
     def get_queryset(self):
         """Return objects ordered by name"""
-        return self.queryset.order_by('-name')
+        queryset = self.queryset.order_by('-name')
+        if streaming.is_streaming(self.request):
+            return queryset
+
+        return self.setup_eager_loading(queryset)
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -23,98 +50,353 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
         return self.serializer_class
 
-
-class ProjectStandsViewSet(viewsets.ModelViewSet):
+    def retrieve(self, request, *args, **kwargs):
+        """Return project detail, streamed when requested"""
+        if streaming.is_streaming(request):
+            return self.conditional(self.stream_retrieve, request, *args,
+                                    **kwargs)
+
+        return super().retrieve(request, *args, **kwargs)
+
+    def stream_retrieve(self, request, *args, **kwargs):
+        """Return a streaming response for project detail"""
+        return streaming.stream_project(self.get_object(),
+                                        request.accepted_renderer)
+
+    @action(detail=False, methods=['post'])
+    def upload(self, request):
+        """Create a project with its designs, stands, plots and trees"""
+        return upload.upload_response(request)
+
+    @action(detail=True, methods=['post'], parser_classes=[MultiPartParser])
+    def tally(self, request, pk=None):
+        """Import trees from an uploaded CSV tally sheet"""
+        project = get_object_or_404(Project, pk=pk)
+        sheet = request.FILES.get('file')
+        if sheet is None:
+            return Response({'file': ['This field is required.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        stream = io.TextIOWrapper(sheet.file, encoding='utf-8-sig',
+                                  newline='')
+        try:
+            report = TallyImporter(project_id=project.id).run(stream)
+        except (UnicodeDecodeError, ValueError) as error:
+            return Response({'detail': str(error)},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(report, status=status.HTTP_201_CREATED)
+
+    @action(detail=True)
+    def changes(self, request, pk=None):
+        """Return the project's changes since the since cursor"""
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = sync.decode_cursor(since)
+            except ValueError as error:
+                return Response({'since': [str(error)]},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        return self.conditional(self.get_changes, request, since or None)
+
+    def get_changes(self, request, since):
+        """Return the changes of an existing or deleted project"""
+        project = Project.objects.filter(pk=self.kwargs['pk']).first()
+        if project is None:
+            if Tombstone.objects.filter(model='project',
+                                        object_id=self.kwargs['pk']).exists():
+                return Response({'detail': 'Project was deleted.'},
+                                status=status.HTTP_410_GONE)
+            raise Http404
+
+        return Response(sync.project_changes(project, since))
+
+    @action(detail=True)
+    def summary(self, request, pk=None):
+        """Return cruise statistics for the project"""
+        return self.conditional(self.get_summary, request, pk=pk)
+
+    def get_summary(self, request, pk=None):
+        """Return the response to a project summary request"""
+        project = get_object_or_404(
+            Project.objects.select_related('equation_set'), pk=pk)
+        return Response(cruise.project_summary(project))
+
+    @action(detail=True, methods=['post'])
+    def projections(self, request, pk=None):
+        """Start a growth projection of every stand of the project"""
+        project = get_object_or_404(Project, pk=pk)
+        serializer = serializers.ProjectionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        run = serializer.save(project=project)
+        projection.start(run, user=request.user
+                         if request.user.is_authenticated else None)
+
+        return Response(serializers.ProjectionSerializer(run).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, url_path='stand-table')
+    def stand_table(self, request, pk=None):
+        """Return stand and stock tables by diameter class for the project"""
+        return self.conditional(self.get_stand_table, request, pk=pk)
+
+    def get_stand_table(self, request, pk=None):
+        """Return the response to a project stand table request"""
+        project = get_object_or_404(
+            Project.objects.select_related('equation_set'), pk=pk)
+        return Response(cruise.project_table(project))
+
+
+class ProjectStandsViewSet(FieldPlanMixin, ProjectVersionMixin,
+                           viewsets.ModelViewSet):
     """Manage stands associated with a given project"""
     queryset = Stand.objects.all()
     serializer_class = serializers.StandSerializer
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+    authentication_classes = AUTHENTICATION_CLASSES
+    version_lookup = 'stands'
+    version_list_kwarg = 'project_id'
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         project_id = self.kwargs['project_id']
-        return self.queryset.filter(project_id=project_id)
+        queryset = self.queryset.filter(project_id=project_id) \
+            .order_by('identification')
+        return self.setup_eager_loading(queryset)
 
 
-class StandViewSet(viewsets.ModelViewSet):
+class StandViewSet(FieldPlanMixin, ProjectVersionMixin,
+                   viewsets.ModelViewSet):
     """Manage stands in the database"""
     queryset = Stand.objects.all()
     serializer_class = serializers.StandSerializer
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+    authentication_classes = AUTHENTICATION_CLASSES
+    version_lookup = 'stands'
+    cache_actions = ('retrieve', 'summary', 'stand_table')
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         """Return stands ordered by project_id"""
-        return self.queryset.order_by('-project_id')
+        queryset = self.queryset.order_by('-project_id')
+        return self.setup_eager_loading(queryset)
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
         if self.action == 'retrieve':
-            return serializers.StandDetailSerializer
+            return serializers.StandSampleDesignSerializer
 
         return self.serializer_class
 
-    def perform_create(self, serializer):
-        """Save stand object"""
-        project_id = self.request.POST['project_id']
-        project = Project.objects.get(pk=project_id)
-        serializer.save(project_id=project)
-
-    def retrieve(self, request, pk=None):
-        stand = Stand.objects.get(pk=pk)
-        project_data = serializers.ProjectDetailSerializer(
-            stand.project_id).data
-        stand_data = self.serializer_class(stand).data
-        stand_data['sample_design'] = project_data['sample_design']
-        stand_data['measurement_system'] = project_data['measurement_system']
-        return Response(stand_data)
-
-
-class StandPlotsViewSet(viewsets.ModelViewSet):
+    @action(detail=True)
+    def summary(self, request, pk=None):
+        """Return cruise statistics for the stand"""
+        return self.conditional(self.get_summary, request, pk=pk)
+
+    def get_summary(self, request, pk=None):
+        """Return the response to a stand summary request"""
+        stand = get_object_or_404(
+            Stand.objects.select_related('project_id__equation_set'), pk=pk)
+        return Response(cruise.stand_summary(stand))
+
+    @action(detail=True, url_path='stand-table')
+    def stand_table(self, request, pk=None):
+        """Return stand and stock tables by diameter class for the stand"""
+        return self.conditional(self.get_stand_table, request, pk=pk)
+
+    def get_stand_table(self, request, pk=None):
+        """Return the response to a stand table request"""
+        stand = get_object_or_404(
+            Stand.objects.select_related('project_id__equation_set'), pk=pk)
+        return Response(cruise.stand_table(stand))
+
+    @action(detail=True)
+    def aggregates(self, request, pk=None):
+        """Return the maintained per species tree totals of the stand"""
+        return self.conditional(self.get_aggregates, request, pk=pk)
+
+    def get_aggregates(self, request, pk=None):
+        """Return the response to a stand aggregates request"""
+        stand = get_object_or_404(Stand.objects.select_related('project_id'),
+                                  pk=pk)
+        return Response(aggregates.species_totals(
+            stand.aggregates.all(), stand.project_id.measurement_system))
+
+
+class StandPlotsViewSet(FieldPlanMixin, ProjectVersionMixin, FastListMixin,
+                        viewsets.ModelViewSet):
     """Manage plots associated with a given stand"""
     queryset = Plot.objects.all()
     serializer_class = serializers.PlotSerializer
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+    authentication_classes = AUTHENTICATION_CLASSES
+    version_lookup = 'stands__plots'
+    version_list_kwarg = 'stand_id'
+    version_list_lookup = 'stands'
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         stand_id = self.kwargs['stand_id']
-        return self.queryset.filter(stand=stand_id)
+        queryset = self.queryset.filter(stand=stand_id).order_by('number')
+        return self.setup_eager_loading(queryset)
 
 
-class PlotViewSet(viewsets.ModelViewSet):
+class PlotViewSet(FieldPlanMixin, ProjectVersionMixin, FastListMixin,
+                  viewsets.ModelViewSet):
     """Manage plots in the database"""
     queryset = Plot.objects.all()
     serializer_class = serializers.PlotSerializer
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+    authentication_classes = AUTHENTICATION_CLASSES
+    version_lookup = 'stands__plots'
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        """Return plots ordered by stand"""
-        return self.queryset.order_by('-stand')
-
-    def perform_create(self, serializer):
-        """Save plot object"""
-        stand_id = self.request.POST['stand']
-        stand = Stand.objects.get(pk=stand_id)
-        serializer.save(stand=stand)
-
-
-class TreeReferenceViewSet(viewsets.ModelViewSet):
+        """Return plots ordered by stand, filtered by bbox or near"""
+        queryset = self.queryset.order_by('-stand')
+        if self.action == 'list':
+            queryset = spatial.filter_queryset(queryset,
+                                               self.request.query_params)
+        return self.setup_eager_loading(queryset)
+
+    @action(detail=True)
+    def aggregates(self, request, pk=None):
+        """Return the maintained per species tree totals of the plot"""
+        return self.conditional(self.get_aggregates, request, pk=pk)
+
+    def get_aggregates(self, request, pk=None):
+        """Return the response to a plot aggregates request"""
+        plot = get_object_or_404(
+            Plot.objects.select_related('stand__project_id'), pk=pk)
+        return Response(aggregates.species_totals(
+            plot.aggregates.all(), plot.stand.project_id.measurement_system))
+
+    @action(detail=True, methods=['post'], url_path='trees/bulk')
+    def bulk_trees(self, request, pk=None):
+        """Create many trees on the plot in a single transaction"""
+        plot = get_object_or_404(Plot, pk=pk)
+        return bulk.ingest_response(request, plot=plot)
+
+    @action(detail=False, methods=['patch'])
+    def bulk(self, request):
+        """Change many plots by id or by filter in a few statements"""
+        return bulk.update_response(request, Plot.objects.all(),
+                                    bulk.plot_changes_serializer,
+                                    bulk.PLOT_FILTERS, located=True)
+
+    @bulk.mapping.delete
+    def bulk_delete(self, request):
+        """Delete the plots selected by the query parameters"""
+        return bulk.delete_response(request, Plot.objects.all(),
+                                    bulk.PLOT_FILTERS, located=True)
+
+
+class TreeReferenceViewSet(FieldPlanMixin, viewsets.ModelViewSet):
     """Manage tree references in the database"""
     queryset = TreeReference.objects.all()
     serializer_class = serializers.TreeReferenceSerializer
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+    authentication_classes = AUTHENTICATION_CLASSES
 
     def get_queryset(self):
         """Return tree references ordered by scientific name"""
-        return self.queryset.order_by('-scientific_name')
+        return self.setup_eager_loading(
+            self.queryset.order_by('-scientific_name'))
 
 
-class TreeViewSet(viewsets.ModelViewSet):
+class TreeViewSet(FieldPlanMixin, ProjectVersionMixin, FastListMixin,
+                  viewsets.ModelViewSet):
     """Manage trees in the database"""
     queryset = Tree.objects.all()
     serializer_class = serializers.TreeSerializer
+    version_lookup = 'stands__plots__trees'
+    renderer_classes = RENDERER_CLASSES + [StreamingJSONRenderer]
+    parser_classes = PARSER_CLASSES
+    authentication_classes = AUTHENTICATION_CLASSES
+    pagination_class = KeysetPagination
+    columnar_list = True
 
     def get_queryset(self):
         """Return trees ordered by plot and symbol"""
-        return self.queryset.order_by('-plot', '-symbol')
-
-
-class SampleDesignViewSet(viewsets.ModelViewSet):
+        return self.setup_eager_loading(
+            self.queryset.order_by('-plot', '-symbol'))
+
+    def list(self, request, *args, **kwargs):
+        """Return trees, streamed when requested"""
+        if streaming.is_streaming(request):
+            queryset = self.filter_queryset(self.get_queryset())
+            return streaming.stream_list(queryset, self.get_serializer(),
+                                         request.accepted_renderer)
+
+        return super().list(request, *args, **kwargs)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Create many trees in a single transaction"""
+        return bulk.ingest_response(request)
+
+    @bulk.mapping.patch
+    def bulk_update(self, request):
+        """Change many trees by id or by filter in a few statements"""
+        return bulk.update_response(request, Tree.objects.all(),
+                                    bulk.tree_changes_serializer,
+                                    bulk.TREE_FILTERS)
+
+    @bulk.mapping.delete
+    def bulk_delete(self, request):
+        """Delete the trees selected by the query parameters"""
+        return bulk.delete_response(request, Tree.objects.all(),
+                                    bulk.TREE_FILTERS)
+
+
+class SampleDesignViewSet(FieldPlanMixin, ProjectVersionMixin,
+                          viewsets.ModelViewSet):
     queryset = SampleDesign.objects.all()
     serializer_class = serializers.SampleDesignSerializer
+    renderer_classes = RENDERER_CLASSES
+    parser_classes = PARSER_CLASSES
+    authentication_classes = AUTHENTICATION_CLASSES
+    version_lookup = 'sample_design'
+
+    def get_queryset(self):
+        return self.setup_eager_loading(self.queryset.order_by('-project'))
+
+
+class ProjectionViewSet(viewsets.ReadOnlyModelViewSet):
+    """Follow growth projections and read their results"""
+    queryset = Projection.objects.all()
+    serializer_class = serializers.ProjectionSerializer
+    renderer_classes = RENDERER_CLASSES
+    authentication_classes = AUTHENTICATION_CLASSES
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
-        return self.queryset.order_by('-project')
+        """Return projections, newest first"""
+        queryset = self.queryset.order_by('-id')
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(Prefetch(
+                'results', ProjectionResult.objects.order_by('stand', 'period')
+            ))
+        return queryset
+
+    def get_serializer_class(self):
+        """Return appropriate serializer class"""
+        if self.action == 'retrieve':
+            return serializers.ProjectionDetailSerializer
+
+        return self.serializer_class
+
+
+class CacheStatsView(APIView):
+    """Report hit and miss counters of the forest response cache"""
+    renderer_classes = RENDERER_CLASSES
+    authentication_classes = AUTHENTICATION_CLASSES
+
+    def get(self, request):
+        return Response(cache.stats())